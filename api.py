@@ -0,0 +1,212 @@
+import hashlib
+import json
+import math
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request, url_for
+
+from extensions import db
+from models import Artist, Show, Venue, available_venues_statement, near_venues_statement
+from routing import replica_router
+from suggest import suggestions
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+
+# ----------------------------------------------------------------------------#
+# Serialization.
+# ----------------------------------------------------------------------------#
+
+def dumps(payload):
+    # orjson when installed, the standard library otherwise. Datetimes are written as ISO 8601
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=lambda value: value.isoformat(), separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    # Strong ETag over the serialized body, a matching If-None-Match gets an empty 304
+    body = dumps(payload)
+    response = Response(body, status=status, mimetype='application/json')
+    if status == 200:
+        response.set_etag(hashlib.sha1(body).hexdigest())
+        response.make_conditional(request)
+    return response
+
+
+def not_found():
+    return json_response({'error': 'not found'}, 404)
+
+
+def bad_request(message):
+    return json_response({'error': message}, 400)
+
+
+def page_size():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+def after_id():
+    # ?after= of the collections paged by id, raises ValueError when it is not an id
+    after = request.args.get('after')
+    return int(after) if after else None
+
+
+def next_page_url(endpoint, **cursor):
+    next_args = request.args.to_dict()
+    next_args.update(cursor)
+    return url_for(endpoint, **next_args)
+
+
+# ----------------------------------------------------------------------------#
+# Endpoints.
+# ----------------------------------------------------------------------------#
+
+@api.route('/venues')
+@replica_router.reads
+def venues():
+    try:
+        after = after_id()
+    except ValueError:
+        return bad_request('malformed after')
+
+    rows, has_next = Venue.page(after_id=after, per_page=page_size())
+    return json_response({
+        'data': [{
+            'id': venue.id,
+            'name': venue.name,
+            'city': venue.city,
+            'state': venue.state,
+            'num_upcoming_shows': venue.num_upcoming_shows,
+        } for venue in rows],
+        'next': next_page_url('api.venues', after=rows[-1].id) if has_next else None,
+    })
+
+
+@api.route('/venues/<int:venue_id>')
+@replica_router.reads
+def venue(venue_id):
+    venue = Venue.live(venue_id)
+    if venue is None:
+        return not_found()
+    return json_response(venue.detail())
+
+
+@api.route('/venues/available')
+@replica_router.reads
+def available_venues():
+    # Venues of ?state= (and ?city=) free between ?start= and ?end=, ISO 8601 local times
+    try:
+        start_time = datetime.fromisoformat(request.args['start'])
+        end_time = datetime.fromisoformat(request.args['end'])
+    except (KeyError, ValueError):
+        return bad_request('malformed or missing start or end')
+    if not request.args.get('state') or end_time <= start_time:
+        return bad_request('a state and a start before the end are required')
+
+    rows = db.session.execute(available_venues_statement(request.args['state'], start_time, end_time,
+                                                         city=request.args.get('city')))
+    return json_response({
+        'data': [{
+            'id': venue.id,
+            'name': venue.name,
+            'city': venue.city,
+            'state': venue.state,
+            'address': venue.address,
+        } for venue in rows],
+    })
+
+
+@api.route('/venues/near')
+@replica_router.reads
+def venues_near():
+    # Venues within ?radius= miles of ?lat=&lon=, nearest first, with their distance in miles
+    try:
+        filters = Venue.near_filters(request.args, current_app.config['VENUES_NEAR_RADIUS'],
+                                     current_app.config['VENUES_NEAR_MAX_RADIUS'])
+    except ValueError:
+        return bad_request('malformed or missing lat, lon or radius')
+
+    rows = db.session.execute(near_venues_statement(limit=page_size(), **filters))
+    return json_response({
+        'data': [{
+            'id': venue.id,
+            'name': venue.name,
+            'city': venue.city,
+            'state': venue.state,
+            'address': venue.address,
+            'latitude': venue.latitude,
+            'longitude': venue.longitude,
+            'distance': round(math.sqrt(venue.distance_squared), 2),
+            'num_upcoming_shows': venue.num_upcoming_shows,
+        } for venue in rows],
+    })
+
+
+@api.route('/suggest')
+def suggest():
+    # Typeahead over venue, artist and city names, answered from the in-memory index of this process
+    limit = max(1, min(request.args.get('limit', current_app.config['SUGGEST_LIMIT'], type=int),
+                       current_app.config['SUGGEST_MAX_LIMIT']))
+    return json_response({'data': suggestions.suggest(request.args.get('q', ''), limit)})
+
+
+@api.route('/artists')
+@replica_router.reads
+def artists():
+    try:
+        after = after_id()
+    except ValueError:
+        return bad_request('malformed after')
+
+    rows, has_next = Artist.page(after_id=after, per_page=page_size())
+    return json_response({
+        'data': [{
+            'id': artist.id,
+            'name': artist.name,
+            'city': artist.city,
+            'state': artist.state,
+            'num_upcoming_shows': artist.num_upcoming_shows,
+        } for artist in rows],
+        'next': next_page_url('api.artists', after=rows[-1].id) if has_next else None,
+    })
+
+
+@api.route('/artists/<int:artist_id>')
+@replica_router.reads
+def artist(artist_id):
+    artist = Artist.live(artist_id)
+    if artist is None:
+        return not_found()
+    return json_response(artist.detail())
+
+
+@api.route('/shows')
+@replica_router.reads
+def shows():
+    # Same filters and (start_time, id) cursor as the /shows page
+    try:
+        filters = Show.listing_filters(request.args)
+        after = Show.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return bad_request('malformed date or cursor')
+
+    rows, has_next = Show.listing_page(after=after, per_page=page_size(), **filters)
+    return json_response({
+        'data': [{
+            'id': show.id,
+            'venue_id': show.venue_id,
+            'venue_name': show.venue_name,
+            'artist_id': show.artist_id,
+            'artist_name': show.artist_name,
+            'artist_image_link': show.artist_image_link,
+            'start_time': show.start_time,
+        } for show in rows],
+        'next': next_page_url('api.shows', cursor=Show.encode_cursor(rows[-1])) if has_next else None,
+    })
@@ -0,0 +1,254 @@
+import sys
+
+from flask import Blueprint, abort, flash, redirect, render_template, request, url_for
+
+from cache import response_cache
+from calendars import feed_response, render_calendar, render_feed
+from extensions import db
+from models import Artist, Deletion, Genre, Show
+from pages import render_search
+from routing import replica_router
+from suggest import suggestions
+
+artists = Blueprint('artists', __name__)
+
+
+# ----------------------------------------------------------------------------#
+# Cache invalidation.
+# ----------------------------------------------------------------------------#
+
+def invalidate_artist_pages(artist_id):
+    # The artist listing, the artist page and the pages of venues listing the artist in their shows
+    venue_ids = [row.venue_id for row in db.session.query(Show.venue_id).filter_by(artist_id=artist_id).distinct()]
+    response_cache.invalidate('artists', 'artist:{}'.format(artist_id),
+                              *['venue:{}'.format(venue_id) for venue_id in venue_ids])
+
+
+# ----------------------------------------------------------------------------#
+# Page rendering.
+# ----------------------------------------------------------------------------#
+
+def render_artists(artist_rows):
+    data = []
+    for artist in artist_rows:
+        data.append({
+            'id': artist.id,
+            'name': artist.name
+        })
+
+    return render_template('pages/artists.html', artists=data)
+
+
+def render_artist(artist, future_shows, past_shows):
+    data = []
+    if artist:
+        data = artist.detail_from(future_shows, past_shows)
+        # The cached page goes stale when its first upcoming show becomes a past show
+        if data['upcoming_shows']:
+            response_cache.expire_at(data['upcoming_shows'][0]['start_time'])
+    return render_template('pages/show_artist.html', artist=data)
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+@artists.route('/artists')
+@replica_router.reads
+@response_cache.cached('artists')
+def index():
+    # TODO: replace with real data returned from querying the database
+    return render_artists(Artist.listing(genre=request.args.get('genre')))
+
+
+@artists.route('/artists/search', methods=['POST'])
+@replica_router.reads
+def search():
+    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+    artists_by_name = request.form.get('search_term', '')
+    # Ranked matches from the name search index with their stored upcoming show counts
+    return render_search('pages/search_artists.html', Artist.search(artists_by_name))
+
+
+@artists.route('/artists/<int:artist_id>')
+@replica_router.reads
+@response_cache.cached('artist:{artist_id}')
+def detail(artist_id):
+    # shows the artist page with the given artist_id
+    # TODO: replace with real artist data from the artist table, using artist_id
+    artist = Artist.live(artist_id)
+    if not artist:
+        return render_artist(None, [], [])
+    return render_artist(artist, artist.future_shows_with_join(), artist.past_shows_with_join())
+
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+@artists.route('/artists/<int:artist_id>/calendar')
+@replica_router.reads
+@response_cache.cached('artist:{artist_id}', variant='calendar')
+def calendar(artist_id):
+    # bookings per day of ?month=YYYY-MM
+    artist = Artist.live(artist_id)
+    if not artist:
+        abort(404)
+    return render_calendar(Show.artist_id, artist_id, artist.name, url_for('artists.detail', artist_id=artist_id),
+                           url_for('artists.calendar_feed', artist_id=artist_id))
+
+
+@artists.route('/artists/<int:artist_id>/calendar.ics')
+@replica_router.reads
+def calendar_feed(artist_id):
+    return feed_response(artist_feed(artist_id=artist_id))
+
+
+@response_cache.cached('artist:{artist_id}', variant='ics')
+def artist_feed(artist_id):
+    artist = Artist.live(artist_id)
+    if not artist:
+        abort(404)
+    return render_feed(Show.artist_id, artist_id, artist.name)
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@artists.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit(artist_id):
+    from forms import ArtistForm
+
+    artist = Artist.live(artist_id)
+    if not artist:
+        abort(404)
+    form = ArtistForm(obj=artist)
+    form.genres.data = artist.genre_names
+    # TODO: populate form with fields from artist with ID <artist_id>
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@artists.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_submission(artist_id):
+    from forms import ArtistForm
+
+    # TODO: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+    form = ArtistForm(request.form)
+    # if bool(re.fullmatch('[A-Za-z]{2,25}( [A-Za-z]{2,25})?', form.name.data)):
+    try:
+        artist = Artist.live(artist_id)
+        artist.name = form.name.data
+        artist.genres = Genre.from_names(form.genres.data)
+        artist.city = form.city.data
+        artist.state = form.state.data
+        artist.phone = form.phone.data
+        artist.facebook_link = form.facebook_link.data
+        artist.image_link = form.image_link.data
+        artist.website_link = form.website_link.data
+        artist.seeking_description = form.seeking_description.data
+        artist.is_looking_venues = form.seeking_venue.data
+        db.session.commit()
+        invalidate_artist_pages(artist_id)
+        suggestions.put('artist', artist_id, artist.name, artist.city, artist.state)
+        flash('Artist ' + request.form['name'] + ' was successfully updated!')
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated!')
+    finally:
+        db.session.close()
+    # else:
+    #     flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+    #     flash('An error occurred. Name Format is not Correct')
+
+    return redirect(url_for('artists.detail', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@artists.route('/artists/create', methods=['GET'])
+def create_form():
+    from forms import ArtistForm
+
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@artists.route('/artists/create', methods=['POST'])
+def create_submission():
+    from forms import ArtistForm
+
+    # called upon submitting the new artist listing form
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    form = ArtistForm(request.form)
+    if form.validate():
+        #if bool(re.fullmatch('[A-Za-z]{2,25}( [A-Za-z]{2,25})?', form.name.data)):
+        try:
+            artist = Artist(
+                name=form.name.data,
+                genres=Genre.from_names(form.genres.data),
+                city=form.city.data,
+                state=form.state.data,
+                phone=form.phone.data,
+                facebook_link=form.facebook_link.data,
+                image_link=form.image_link.data,
+                website_link=form.website_link.data,
+                is_looking_venues=form.seeking_venue.data,
+                seeking_description=form.seeking_description.data)
+
+            db.session.add(artist)
+            db.session.commit()
+            invalidate_artist_pages(artist.id)
+            suggestions.put('artist', artist.id, artist.name, artist.city, artist.state)
+            # on successful db insert, flash success
+            flash('Artist ' + request.form['name'] + ' was successfully listed!')
+        except:
+            db.session.rollback()
+            flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+       # else:
+        #    flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+        #    flash('An error occurred. Name Format is not Correct')
+        return render_template('pages/home.html')
+    else:
+        return render_template('forms/new_artist.html', form=form)
+
+    # on successful db insert, flash success
+
+    # TODO: on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+
+
+#  Delete Artist
+#  ----------------------------------------------------------------
+
+@artists.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete(artist_id):
+    # Soft delete, like venues: the artist leaves every page at once, its shows are removed in small
+    # batches by `flask deletions purge`
+    artist = Artist.live(artist_id)
+    if not artist:
+        abort(404)
+    name = artist.name
+    try:
+        Deletion.request('artist', artist)
+        db.session.commit()
+        # The venues listing shows the counts recounted by the deletion
+        invalidate_artist_pages(artist_id)
+        response_cache.invalidate('venues')
+        suggestions.remove('artist', artist_id)
+        flash('Artist ' + name + ' was successfully Deleted!')
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash('An error occurred. Artist ' + name + ' could not be Deleted.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('pages.index'), code=303)
@@ -0,0 +1,254 @@
+"""Async ASGI entry point for Fyyur.
+
+Serves the read-only pages (/venues, /artists, /shows, the venue and artist pages and both searches)
+with coroutine views on an async SQLAlchemy engine, so a worker keeps serving other requests while
+their queries wait on the database. Every other route is handed to the unchanged sync Flask app.
+
+    pip install asgiref greenlet asyncpg uvicorn    # aiosqlite instead of asyncpg for SQLite
+    uvicorn asgi:application --workers 4
+"""
+import asyncio
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import g, request, request_started
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from artists import render_artist, render_artists
+from cache import response_cache
+from extensions import db
+from models import Artist, Show, Venue, owner_shows_statement, search_statement
+from pages import render_search
+from routing import REPLICA_BIND, replica_router
+from shows import render_shows, shows_listing_args
+from venues import render_venue, render_venues
+
+# Async driver of each dialect the sync app supports
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+app = create_app()
+
+
+# ----------------------------------------------------------------------------#
+# Async engines.
+# ----------------------------------------------------------------------------#
+
+def create_engine_like(sync_engine, options):
+    # Async twin of one of the app's engines: same database and pool settings, async driver. The statement
+    # timeout is passed as an asyncpg server setting instead of a libpq option
+    url = sync_engine.url.set(drivername=ASYNC_DRIVERS[sync_engine.url.get_backend_name()])
+    options = {name: value for name, value in options.items() if name not in ('url', 'connect_args')}
+    if url.get_backend_name() == 'postgresql' and app.config.get('DATABASE_STATEMENT_TIMEOUT_MS'):
+        options['connect_args'] = {
+            'server_settings': {'statement_timeout': str(app.config['DATABASE_STATEMENT_TIMEOUT_MS'])}}
+    return create_async_engine(url, **options)
+
+
+with app.app_context():
+    engines = {None: create_engine_like(db.engines[None], app.config['SQLALCHEMY_ENGINE_OPTIONS'])}
+    if REPLICA_BIND in db.engines:
+        engines[REPLICA_BIND] = create_engine_like(db.engines[REPLICA_BIND],
+                                                   app.config['SQLALCHEMY_BINDS'][REPLICA_BIND])
+
+
+def current_engine():
+    # The replica for the views replica_router.reads routes to it, the primary otherwise
+    if g.get('read_replica') and REPLICA_BIND in engines:
+        return engines[REPLICA_BIND]
+    return engines[None]
+
+
+# Each statement gets its own session and connection, so statements gathered together run concurrently
+
+async def fetch_rows(statement):
+    async with AsyncSession(current_engine()) as session:
+        return (await session.execute(statement)).all()
+
+
+async def fetch_objects(statement):
+    async with AsyncSession(current_engine()) as session:
+        return (await session.scalars(statement)).all()
+
+
+async def fetch_object(statement):
+    async with AsyncSession(current_engine()) as session:
+        return (await session.scalars(statement)).first()
+
+
+# ----------------------------------------------------------------------------#
+# Async views.
+# ----------------------------------------------------------------------------#
+
+# Same endpoints, decorators and rendering helpers as the sync blueprint views, only the queries differ
+
+@replica_router.reads
+@response_cache.cached('venues')
+async def venues():
+    return render_venues(await fetch_rows(Venue.listing_statement(genre=request.args.get('genre'))))
+
+
+@replica_router.reads
+async def search_venues():
+    search_rows = await fetch_rows(search_statement(Venue, request.form.get('search_term', '')))
+    return render_search('pages/search_venues.html', search_rows)
+
+
+@replica_router.reads
+@response_cache.cached('venue:{venue_id}')
+async def show_venue(venue_id):
+    # The venue, its upcoming shows and its past shows are independent queries, run concurrently
+    venue, future_shows, past_shows = await asyncio.gather(
+        fetch_object(Venue.detail_statement(venue_id)),
+        fetch_objects(owner_shows_statement(Show.venue_id, Show.artist, venue_id, upcoming=True)),
+        fetch_objects(owner_shows_statement(Show.venue_id, Show.artist, venue_id, upcoming=False)))
+    return render_venue(venue, future_shows, past_shows)
+
+
+@replica_router.reads
+@response_cache.cached('artists')
+async def artists():
+    return render_artists(await fetch_rows(Artist.listing_statement(genre=request.args.get('genre'))))
+
+
+@replica_router.reads
+async def search_artists():
+    search_rows = await fetch_rows(search_statement(Artist, request.form.get('search_term', '')))
+    return render_search('pages/search_artists.html', search_rows)
+
+
+@replica_router.reads
+@response_cache.cached('artist:{artist_id}')
+async def show_artist(artist_id):
+    artist, future_shows, past_shows = await asyncio.gather(
+        fetch_object(Artist.detail_statement(artist_id)),
+        fetch_objects(owner_shows_statement(Show.artist_id, Show.venue, artist_id, upcoming=True)),
+        fetch_objects(owner_shows_statement(Show.artist_id, Show.venue, artist_id, upcoming=False)))
+    return render_artist(artist, future_shows, past_shows)
+
+
+@replica_router.reads
+async def shows():
+    filters, after = shows_listing_args()
+    per_page = app.config['SHOWS_PER_PAGE']
+    rows = await fetch_rows(Show.listing_page_statement(after=after, per_page=per_page, **filters))
+    return render_shows(rows[:per_page], len(rows) > per_page)
+
+
+ASYNC_VIEWS = {
+    ('venues.index', 'GET'): venues,
+    ('venues.search', 'POST'): search_venues,
+    ('venues.detail', 'GET'): show_venue,
+    ('artists.index', 'GET'): artists,
+    ('artists.search', 'POST'): search_artists,
+    ('artists.detail', 'GET'): show_artist,
+    ('shows.index', 'GET'): shows,
+}
+
+
+# ----------------------------------------------------------------------------#
+# ASGI application.
+# ----------------------------------------------------------------------------#
+
+sync_application = WsgiToAsgi(app)
+
+
+def match_async_view(scope):
+    # The async view of the app route the request matches, None for every other route
+    try:
+        endpoint = app.url_map.bind('localhost').match(request_path(scope), scope['method'])[0]
+    except HTTPException:
+        return None
+    return ASYNC_VIEWS.get((endpoint, scope['method']))
+
+
+def request_path(scope):
+    # ASGI paths include the root path the app is mounted at, WSGI splits it into SCRIPT_NAME
+    root_path = scope.get('root_path', '')
+    return scope['path'][len(root_path):] if scope['path'].startswith(root_path) else scope['path']
+
+
+def wsgi_environ(scope, body):
+    # PEP 3333 environ of an ASGI HTTP request, for Flask's request context
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': request_path(scope).encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+async def dispatch(view, environ):
+    # Flask's full_dispatch_request around an awaited view, so before/after request hooks, error handlers
+    # and teardown callbacks run exactly as for the sync views
+    with app.request_context(environ):
+        try:
+            try:
+                request_started.send(app)
+                response = app.preprocess_request()
+                if response is None:
+                    response = await view(**request.view_args)
+            except Exception as error:
+                response = app.handle_user_exception(error)
+            return app.finalize_request(response)
+        except Exception as error:
+            return app.handle_exception(error)
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for engine in engines.values():
+                await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    view = match_async_view(scope) if scope['type'] == 'http' else None
+    if view is None:
+        return await sync_application(scope, receive, send)
+
+    response = await dispatch(view, wsgi_environ(scope, await read_body(receive)))
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in response.headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': response.get_data()})
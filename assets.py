@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import Response, abort, current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+assets_command = AppGroup('assets', help='Build the bundled static assets.')
+
+# Bundles served from /static/dist, each built from these files of static/ in this order
+BUNDLES = {
+    'main.css': ('css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css',
+                 'css/main.quickfix.css'),
+    'head.js': ('js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'),
+    'main.js': ('js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'),
+    'jquery.js': ('js/libs/jquery-1.11.1.min.js',),
+    'respond.js': ('js/libs/respond-1.4.2.min.js',),
+}
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+# Precompressed siblings, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)(.*?)\1\s*\)')
+
+# Source map references of minified sources. The maps are not copied into static/dist, and a reference in the
+# middle of a bundle would apply to the whole file
+SOURCE_MAP_COMMENT = re.compile(r'^[ \t]*(?://[#@][ \t]*sourceMappingURL=[^\r\n]*|/\*[#@][ \t]*sourceMappingURL=.*?\*/)'
+                                r'[ \t]*\r?$\n?', re.M)
+
+
+# ----------------------------------------------------------------------------#
+# Bundling.
+# ----------------------------------------------------------------------------#
+
+def rebase_css_urls(css, source):
+    # Relative url()s of a stylesheet point next to its source file, the bundle lives in static/dist
+    def rebase(match):
+        quote, target = match.groups()
+        if not target or target.startswith(('/', '#', 'data:')) or '//' in target:
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+        return 'url({0}{1}{0})'.format(quote, posixpath.relpath(target, DIST_DIR))
+
+    return CSS_URL.sub(rebase, css)
+
+
+def minify_css(css):
+    # Whitespace and comment stripping only, /*! license comments are kept
+    css = re.sub(r'/\*(?!!).*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    # Most sources are shipped minified already, the rest is minified when rjsmin is installed
+    return rjsmin.jsmin(js, keep_bang_comments=True) if rjsmin is not None else js
+
+
+def bundle(static_folder, name, minify=False):
+    parts = []
+    for source in BUNDLES[name]:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as source_file:
+            text = SOURCE_MAP_COMMENT.sub('', source_file.read())
+        if name.endswith('.css'):
+            parts.append(minify_css(rebase_css_urls(text, source)) if minify else rebase_css_urls(text, source))
+        else:
+            parts.append(minify_js(text) if minify else text)
+    # A script without a trailing semicolon must not run into the next one
+    return ('\n' if name.endswith('.css') else ';\n').join(parts).encode('utf-8')
+
+
+def hashed_name(name, content):
+    stem, extension = os.path.splitext(name)
+    return '{}.{}{}'.format(stem, hashlib.sha256(content).hexdigest()[:12], extension)
+
+
+# ----------------------------------------------------------------------------#
+# Serving.
+# ----------------------------------------------------------------------------#
+
+class Assets(object):
+    # Serves /static/dist: the hashed bundles of the last `flask assets build` with far-future immutable
+    # cache headers, precompressed when the client accepts it. Before a build, the bundle names are served
+    # from the unminified sources instead, so the templates work unchanged during development
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.max_age = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_age = app.config.get('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        manifest_path = os.path.join(app.static_folder, DIST_DIR, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+
+        app.add_url_rule(app.static_url_path + '/' + DIST_DIR + '/<path:filename>', 'assets', self.send_asset)
+        app.add_template_global(self.asset_url)
+
+    def asset_url(self, name):
+        # URL of a bundle, its hashed file once `flask assets build` has run
+        return url_for('assets', filename=self.manifest.get(name, name))
+
+    def send_asset(self, filename):
+        dist = os.path.join(current_app.static_folder, DIST_DIR)
+        if filename in self.manifest.values():
+            return self.send_hashed(dist, filename)
+        if filename in BUNDLES:
+            response = Response(bundle(current_app.static_folder, filename),
+                                mimetype=mimetypes.guess_type(filename)[0])
+            response.cache_control.no_cache = True
+            return response
+        abort(404)
+
+    def send_hashed(self, dist, filename):
+        encoding, path = None, filename
+        for name, suffix in ENCODINGS:
+            if request.accept_encodings[name] and os.path.exists(os.path.join(dist, filename + suffix)):
+                encoding, path = name, filename + suffix
+                break
+
+        response = send_from_directory(dist, path, mimetype=mimetypes.guess_type(filename)[0],
+                                       download_name=filename, max_age=self.max_age)
+        if encoding is not None:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
+
+
+# ----------------------------------------------------------------------------#
+# Build command.
+# ----------------------------------------------------------------------------#
+
+@assets_command.command('build')
+@click.option('--minify/--no-minify', default=True, show_default=True, help='Minify the bundles.')
+def build_command(minify):
+    """Bundle, minify and fingerprint the static assets into static/dist.
+
+    Writes gzip and brotli siblings of every bundle and the manifest the asset_url template helper reads on
+    startup. Files of earlier builds are kept, so pages rendered before a deploy still find their assets.
+    """
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    if brotli is None:
+        click.echo('brotli is not installed, writing gzip siblings only.', err=True)
+
+    manifest = {}
+    for name in BUNDLES:
+        content = bundle(current_app.static_folder, name, minify)
+        manifest[name] = hashed_name(name, content)
+        outputs = [('', content), ('.gz', gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            outputs.append(('.br', brotli.compress(content)))
+        for suffix, data in outputs:
+            with open(os.path.join(dist, manifest[name] + suffix), 'wb') as output:
+                output.write(data)
+        click.echo('{} -> {} ({} bytes, {} gzipped)'.format(name, manifest[name], len(content),
+                                                           len(outputs[1][1])), err=True)
+
+    # The manifest is replaced last, so a running build never points the app at a missing file
+    manifest_path = os.path.join(dist, MANIFEST)
+    with open(manifest_path + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
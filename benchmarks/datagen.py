@@ -0,0 +1,170 @@
+"""Seeded synthetic catalog for the benchmarks.
+
+Loads venues, artists, genres and shows into the database of DATABASE_URL (SQLite or a local
+PostgreSQL). The same seed and volumes always produce the same rows.
+
+    python -m benchmarks.datagen --database-url sqlite:///bench.db --scale 100k
+    python -m benchmarks.datagen --database-url postgresql://localhost/fyyur_bench --shows 250000
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+# (venues, artists, shows) per named scale
+SCALES = {
+    '10k': (500, 1000, 10000),
+    '100k': (2000, 5000, 100000),
+    '1M': (5000, 20000, 1000000),
+}
+
+BATCH_SIZE = 10000
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'vo', 'zu', 'bel', 'dor', 'fen', 'gar', 'hus', 'jin', 'mor', 'nel', 'pax']
+
+
+def word(rng, syllables=3):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+
+def batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(db, venues, artists, shows, seed=0, cities=200, now=None):
+    # Inserts the catalog in batches through the app's models. Must run inside an app context on an
+    # empty schema, ids are assigned from 1 in insertion order
+    from sqlalchemy import insert
+
+    from forms import GENRE_CHOICES, VenueForm
+    from models import Artist, Genre, Show, Venue, artist_genre, refresh_upcoming_shows_counts, venue_genre
+
+    rng = random.Random(seed)
+    now = now or datetime.now().replace(minute=0, second=0, microsecond=0)
+    states = [state for state, label in VenueForm.state.kwargs['choices']]
+    areas = [(word(rng) + ' ' + word(rng, 2), rng.choice(states)) for _ in range(cities)]
+    # Each area is centered somewhere in the contiguous US and its venues lie within a few miles of the
+    # center. Drawn from a generator of their own, the rest of the catalog of a seed stays the same
+    places = random.Random(seed + 1)
+    centers = {area: (places.uniform(25, 49), places.uniform(-124, -67)) for area in areas}
+
+    db.session.execute(insert(Genre), [{'id': genre_id, 'name': name}
+                                       for genre_id, (name, label) in enumerate(GENRE_CHOICES, 1)])
+
+    def venue_rows():
+        for venue_id in range(1, venues + 1):
+            city, state = rng.choice(areas)
+            yield {
+                'id': venue_id,
+                'name': 'The {} {} {}'.format(word(rng), rng.choice(['Hall', 'Room', 'Club', 'Stage']), venue_id),
+                'city': city,
+                'state': state,
+                'address': '{} {} Street'.format(rng.randint(1, 9999), word(rng, 2)),
+                'latitude': centers[city, state][0] + places.uniform(-0.05, 0.05),
+                'longitude': centers[city, state][1] + places.uniform(-0.05, 0.05),
+                'phone': '1{:010d}'.format(venue_id),
+                'image_link': 'https://images.example.com/venues/{}.jpg'.format(venue_id),
+                'facebook_link': 'https://www.facebook.com/venue{}'.format(venue_id),
+                'website_link': 'https://venue{}.example.com'.format(venue_id),
+                'is_looking_talent': rng.random() < 0.3,
+                'seeking_description': 'Looking for local acts',
+            }
+
+    def artist_rows():
+        for artist_id in range(1, artists + 1):
+            city, state = rng.choice(areas)
+            yield {
+                'id': artist_id,
+                'name': '{} {} {}'.format(word(rng), word(rng, 2), artist_id),
+                'city': city,
+                'state': state,
+                'phone': '2{:010d}'.format(artist_id),
+                'image_link': 'https://images.example.com/artists/{}.jpg'.format(artist_id),
+                'facebook_link': 'https://www.facebook.com/artist{}'.format(artist_id),
+                'website_link': 'https://artist{}.example.com'.format(artist_id),
+                'is_looking_venues': rng.random() < 0.3,
+                'seeking_description': 'Looking for venues',
+            }
+
+    def genre_links(owner_column, count):
+        for owner_id in range(1, count + 1):
+            for genre_id in rng.sample(range(1, len(GENRE_CHOICES) + 1), rng.randint(1, 3)):
+                yield {owner_column: owner_id, 'genre_id': genre_id}
+
+    def show_rows():
+        # Two years of history and one year of upcoming shows, on half-hour slots, lasting two hours (four
+        # slots) and never double booking a venue or an artist
+        booked = {}
+        for show_id in range(1, shows + 1):
+            while True:
+                artist_id, venue_id = rng.randint(1, artists), rng.randint(1, venues)
+                slot = rng.randint(-2 * 365 * 48, 365 * 48)
+                owners = [booked.setdefault(('artist', artist_id), set()), booked.setdefault(('venue', venue_id), set())]
+                if not any(slot + offset in slots for slots in owners for offset in range(-3, 4)):
+                    break
+            for slots in owners:
+                slots.add(slot)
+            start_time = now + timedelta(minutes=30 * slot)
+            yield {
+                'id': show_id,
+                'artist_id': artist_id,
+                'venue_id': venue_id,
+                'start_time': start_time,
+                'end_time': start_time + timedelta(hours=2),
+            }
+
+    for statement, rows in ((insert(Venue), venue_rows()),
+                            (insert(Artist), artist_rows()),
+                            (venue_genre.insert(), genre_links('venue_id', venues)),
+                            (artist_genre.insert(), genre_links('artist_id', artists)),
+                            (insert(Show), show_rows())):
+        for batch in batches(rows):
+            db.session.execute(statement, batch)
+            db.session.commit()
+
+    db.session.execute(refresh_upcoming_shows_counts(Venue, Show.venue_id))
+    db.session.execute(refresh_upcoming_shows_counts(Artist, Show.artist_id))
+    db.session.commit()
+
+    if db.engine.dialect.name == 'postgresql':
+        for table_name in ('genre', 'venue', 'artist', 'show'):
+            db.session.execute(db.text("SELECT setval('{0}_id_seq', (SELECT max(id) FROM \"{0}\"))"
+                                       .format(table_name)))
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'sqlite:///bench.db'))
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k')
+    parser.add_argument('--venues', type=int)
+    parser.add_argument('--artists', type=int)
+    parser.add_argument('--shows', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--drop', action='store_true', help='drop and recreate the schema first')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    venues, artists, shows = SCALES[args.scale]
+    with app.app_context():
+        if args.drop:
+            db.drop_all()
+        db.create_all()
+        generate(db, args.venues or venues, args.artists or artists, args.shows or shows, seed=args.seed)
+    print('Loaded {} venues, {} artists, {} shows into {}'.format(
+        args.venues or venues, args.artists or artists, args.shows or shows, args.database_url))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Micro-benchmark of the `datetime` Jinja filter.
+
+Compares the per-item cost of the previous pipeline (str() in the view, dateutil parse and
+babel.dates.format_datetime in the filter) with the current one (native datetime, compiled pattern,
+memoized result), over unique timestamps and over a listing where timestamps repeat.
+
+    python -m benchmarks.datetime_filter [--items 20000]
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from filters import DATETIME_FORMATS, format_datetime
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS[format], locale='en')
+
+
+def per_item_microseconds(render, values):
+    seconds = min(timeit.repeat(lambda: [render(value) for value in values], number=1, repeat=3))
+    return seconds / len(values) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    start = datetime(2026, 1, 1, 18, 0)
+    unique = [start + timedelta(minutes=30 * i) for i in range(args.items)]
+    # A listing of shows sharing a few hundred distinct start times, as evening slots do
+    repeated = [random.choice(unique[:300]) for _ in range(args.items)]
+
+    cases = [
+        ('legacy, str() + parse', lambda value: legacy_format_datetime(str(value), 'full')),
+        ('datetime, no memo', lambda value: format_datetime.__wrapped__(value, 'full')),
+        ('datetime, memoized', lambda value: format_datetime(value, 'full')),
+    ]
+    print('{:<26}{:>16}{:>16}'.format('pipeline', 'unique us/item', 'repeat us/item'))
+    for name, render in cases:
+        format_datetime.cache_clear()
+        unique_cost = per_item_microseconds(render, unique)
+        format_datetime.cache_clear()
+        repeated_cost = per_item_microseconds(render, repeated)
+        print('{:<26}{:>16.2f}{:>16.2f}'.format(name, unique_cost, repeated_cost))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Latency, SQL query count and peak memory of every Fyyur route.
+
+Drives each route of the app through the Flask test client against the database of DATABASE_URL
+and writes one JSON document per run, so runs of different commits can be compared.
+
+    python -m benchmarks.datagen --database-url sqlite:///bench.db --scale 100k
+    python -m benchmarks.routes --database-url sqlite:///bench.db --output benchmarks/results/after.json
+    python -m benchmarks.routes --database-url sqlite:///bench.db --baseline benchmarks/results/before.json
+
+The response cache is disabled unless --cache is given, so every request measures the full path.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+
+def read_routes(venue_id, artist_id):
+    # (name, method, path, form data). The DELETE routes are not measured, they would hide the venue and the
+    # artist the other routes read
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues_by_genre', 'GET', '/venues?genre=Jazz', None),
+        ('venues_near', 'GET', '/venues/near?lat=39.8&lon=-98.6&radius=250', None),
+        ('search_venues', 'POST', '/venues/search', {'search_term': 'Hall'}),
+        ('search_venues_short', 'POST', '/venues/search', {'search_term': 'Ka'}),
+        ('show_venue', 'GET', '/venues/{}'.format(venue_id), None),
+        ('create_venue_form', 'GET', '/venues/create', None),
+        ('edit_venue', 'GET', '/venues/{}/edit'.format(venue_id), None),
+        ('venue_calendar', 'GET', '/venues/{}/calendar'.format(venue_id), None),
+        ('venue_calendar_feed', 'GET', '/venues/{}/calendar.ics'.format(venue_id), None),
+        ('artists', 'GET', '/artists', None),
+        ('artists_by_genre', 'GET', '/artists?genre=Jazz', None),
+        ('search_artists', 'POST', '/artists/search', {'search_term': 'Mor'}),
+        ('show_artist', 'GET', '/artists/{}'.format(artist_id), None),
+        ('create_artist_form', 'GET', '/artists/create', None),
+        ('edit_artist', 'GET', '/artists/{}/edit'.format(artist_id), None),
+        ('artist_calendar', 'GET', '/artists/{}/calendar'.format(artist_id), None),
+        ('artist_calendar_feed', 'GET', '/artists/{}/calendar.ics'.format(artist_id), None),
+        ('shows', 'GET', '/shows', None),
+        ('shows_upcoming', 'GET', '/shows?upcoming=1', None),
+        ('create_shows', 'GET', '/shows/create', None),
+    ]
+
+
+def write_routes(venue_id, artist_id, iteration):
+    # Each iteration writes distinct rows, the name rules of the forms only allow letters
+    suffix = ''.join(chr(ord('a') + int(digit)) for digit in '{:06d}'.format(iteration))
+    venue = {
+        'name': 'Bench Venue' + suffix, 'city': 'Bench City', 'state': 'NY', 'address': '1 Bench Street',
+        'phone': '555-{:03d}-{:04d}'.format(iteration // 10000, iteration % 10000), 'genres': ['Jazz'],
+        'image_link': 'https://example.com/v.jpg', 'facebook_link': 'https://facebook.com/v',
+        'website_link': 'https://example.com', 'seeking_description': '',
+    }
+    artist = dict(venue, name='Bench Artist' + suffix,
+                  phone='556-{:03d}-{:04d}'.format(iteration // 10000, iteration % 10000))
+    artist.pop('address')
+    edited_venue = dict(venue, name='Bench Hall', phone='557' + venue['phone'][3:])
+    edited_artist = dict(artist, name='Bench Band', phone='558' + venue['phone'][3:])
+    # One show a day, the same venue and artist are booked by every iteration
+    show = {'artist_id': str(artist_id), 'venue_id': str(venue_id),
+            'start_time': (datetime(2040, 1, 1, 20) + timedelta(days=iteration)).strftime('%Y-%m-%d %H:%M:%S')}
+    return [
+        ('create_venue_submission', 'POST', '/venues/create', venue),
+        ('create_artist_submission', 'POST', '/artists/create', artist),
+        ('create_show_submission', 'POST', '/shows/create', show),
+        ('edit_venue_submission', 'POST', '/venues/{}/edit'.format(venue_id), edited_venue),
+        ('edit_artist_submission', 'POST', '/artists/{}/edit'.format(artist_id), edited_artist),
+    ]
+
+
+def request(client, method, path, data):
+    if method == 'GET':
+        return client.get(path)
+    return client.post(path, data=data)
+
+
+def measure(client, counter, routes_for_iteration, iterations):
+    timings = {}
+    queries = {}
+    statuses = {}
+    for iteration in range(iterations):
+        for name, method, path, data in routes_for_iteration(iteration):
+            counter['queries'] = 0
+            started = time.perf_counter()
+            response = request(client, method, path, data)
+            timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+            queries[name] = counter['queries']
+            statuses[name] = response.status_code
+
+    # One extra traced pass for peak memory, tracing slows requests down too much to time them
+    peaks = {}
+    tracemalloc.start()
+    for name, method, path, data in routes_for_iteration(iterations):
+        tracemalloc.reset_peak()
+        request(client, method, path, data)
+        peaks[name] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    results = {}
+    for name, samples in timings.items():
+        samples.sort()
+        results[name] = {
+            'status': statuses[name],
+            'median_ms': round(statistics.median(samples), 3),
+            'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+            'queries': queries[name],
+            'peak_kib': round(peaks[name] / 1024, 1),
+        }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print('{:<28}{:>8}{:>12}{:>12}{:>9}{:>12}{:>10}'.format(
+        'route', 'status', 'median ms', 'p95 ms', 'queries', 'peak KiB', 'vs base'))
+    for name, result in results.items():
+        change = ''
+        if baseline and name in baseline and baseline[name]['median_ms']:
+            change = '{:+.0%}'.format(result['median_ms'] / baseline[name]['median_ms'] - 1)
+        print('{:<28}{:>8}{:>12.2f}{:>12.2f}{:>9}{:>12.1f}{:>10}'.format(
+            name, result['status'], result['median_ms'], result['p95_ms'], result['queries'], result['peak_kib'],
+            change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'sqlite:///bench.db'))
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--venue-id', type=int, default=1)
+    parser.add_argument('--artist-id', type=int, default=1)
+    parser.add_argument('--writes', action='store_true', help='also measure the create and edit submissions')
+    parser.add_argument('--cache', action='store_true', help='keep the rendered page cache enabled')
+    parser.add_argument('--output', help='JSON file for the results, default benchmarks/results/<revision>.json')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    from sqlalchemy import event
+
+    from app import create_app
+    from cache import response_cache
+    from extensions import db
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    response_cache.enabled = args.cache
+    client = app.test_client()
+    counter = {'queries': 0}
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *arguments: counter.update(queries=counter['queries'] + 1))
+        catalog = {
+            'venues': db.session.execute(db.text('SELECT count(*) FROM venue')).scalar(),
+            'artists': db.session.execute(db.text('SELECT count(*) FROM artist')).scalar(),
+            'shows': db.session.execute(db.text('SELECT count(*) FROM show')).scalar(),
+        }
+        dialect = db.engine.dialect.name
+
+    # Warm up templates, pools and caches before timing
+    for name, method, path, data in read_routes(args.venue_id, args.artist_id):
+        request(client, method, path, data)
+
+    results = measure(client, counter, lambda iteration: read_routes(args.venue_id, args.artist_id), args.iterations)
+    if args.writes:
+        results.update(measure(client, counter,
+                               lambda iteration: write_routes(args.venue_id, args.artist_id, iteration),
+                               args.iterations))
+
+    report = {
+        'revision': git_revision(),
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'dialect': dialect,
+        'catalog': catalog,
+        'iterations': args.iterations,
+        'cache': args.cache,
+        'routes': results,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['routes']
+    print_results(results, baseline)
+
+    output = args.output or os.path.join('benchmarks', 'results', '{}.json'.format(report['revision'] or 'run'))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print('Results written to {}'.format(output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Startup time of the app and of a CLI command, checked against a budget.
+
+Starts fresh interpreters that import the app and call create_app(), and that run `flask routes`, and
+reports the median wall time of each. The budget applies to the time spent above a baseline interpreter
+that only imports the libraries the app starts with (Flask, Flask-SQLAlchemy, SQLAlchemy ...), measured
+in alternation with each scenario, so that it holds on slower or busier machines. Exits with status 1
+when a median exceeds the budget or when one of the modules the app defers to first use (forms, babel,
+dateutil, alembic) is imported at startup.
+
+    python -m benchmarks.startup --database-url sqlite:///bench.db
+    python -m benchmarks.startup --budget-ms 300 --runs 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules only imported once a form, a date, or `flask db` is used
+DEFERRED_MODULES = ('forms', 'wtforms', 'flask_wtf', 'babel', 'dateutil', 'alembic', 'flask_migrate')
+
+REPORT_MODULES = 'import sys; print(json.dumps(sorted(set(sys.modules) & set({!r}))))'.format(DEFERRED_MODULES)
+
+# Third-party imports create_app() cannot avoid, the baseline the budget is measured from
+BASELINE = [sys.executable, '-c', 'import flask, flask_moment, flask_sqlalchemy, orjson, sqlalchemy.orm']
+
+SCENARIOS = {
+    'create_app': [sys.executable, '-c', 'from app import create_app; create_app()'],
+    'flask routes': [sys.executable, '-m', 'flask', '--app', 'app', 'routes'],
+}
+
+
+def elapsed_ms(command):
+    started = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - started) * 1000
+
+
+def median_ms(command, runs):
+    return statistics.median(elapsed_ms(command) for run in range(runs))
+
+
+def median_overhead_ms(command, runs):
+    # Median time of command and median of its excess over the baseline run just before it
+    samples, overheads = [], []
+    for run in range(runs):
+        baseline = elapsed_ms(BASELINE)
+        samples.append(elapsed_ms(command))
+        overheads.append(samples[-1] - baseline)
+    return statistics.median(samples), statistics.median(overheads)
+
+
+def loaded_deferred_modules():
+    output = subprocess.check_output(
+        [sys.executable, '-c', 'import json; from app import create_app; create_app(); ' + REPORT_MODULES],
+        text=True)
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'sqlite:///bench.db'))
+    parser.add_argument('--runs', type=int, default=9)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 400)),
+                        help='largest acceptable median startup time above the baseline imports, '
+                             'STARTUP_BUDGET_MS by default')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    failed = False
+    interpreter = median_ms([sys.executable, '-c', 'pass'], args.runs)
+    baseline = median_ms(BASELINE, args.runs)
+    print('{:<16}{:>12}{:>14}{:>12}'.format('scenario', 'median ms', 'over base ms', 'budget ms'))
+    print('{:<16}{:>12.0f}'.format('interpreter', interpreter))
+    print('{:<16}{:>12.0f}'.format('baseline', baseline))
+    for name, command in SCENARIOS.items():
+        elapsed, overhead = median_overhead_ms(command, args.runs)
+        failed = failed or overhead > args.budget_ms
+        print('{:<16}{:>12.0f}{:>14.0f}{:>12.0f}{}'.format(name, elapsed, overhead, args.budget_ms,
+                                                          '  OVER BUDGET' if overhead > args.budget_ms else ''))
+
+    deferred = loaded_deferred_modules()
+    if deferred:
+        failed = True
+        print('Imported at startup although deferred: {}'.format(', '.join(deferred)))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Latency and memory of the /api/suggest typeahead index.
+
+Builds the index of suggest.py from a synthetic catalog of --names venue and artist names in the vocabulary
+of benchmarks.datagen (no database needed), or loads it from the database of --database-url, and times
+lookups of random prefixes of 1 to 6 characters taken from the indexed names. Reports the build time, the
+memory the index adds to the name strings, and the median, p95 and p99 latency of the lookups alone and of
+whole /api/suggest requests. With --database-url the name search of the search pages is timed on the same
+prefixes for comparison.
+
+    python -m benchmarks.suggest --names 200000
+    python -m benchmarks.suggest --database-url sqlite:///bench.db
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.datagen import word
+
+
+def synthetic_rows(count, seed, cities=2000):
+    rng = random.Random(seed)
+    areas = [(word(rng) + ' ' + word(rng, 2), 'NY') for _ in range(cities)]
+    for entry_id in range(1, count + 1):
+        city, state = rng.choice(areas)
+        if entry_id % 4:
+            yield 'artist', entry_id, '{} {} {}'.format(word(rng), word(rng, 2), entry_id), city, state, \
+                rng.randint(0, 20)
+        else:
+            name = 'The {} {} {}'.format(word(rng), rng.choice(['Hall', 'Room', 'Club', 'Stage']), entry_id)
+            yield 'venue', entry_id, name, city, state, rng.randint(0, 20)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        'median': statistics.median(samples),
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def timed(function, prefixes):
+    samples = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        function(prefix)
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=100000, help='synthetic venue and artist names to index')
+    parser.add_argument('--database-url', help='load the index from this database instead')
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite://'
+    import config
+    from app import create_app
+    from suggest import SuggestIndex, suggestions
+
+    # The index is built below, where it is timed
+    config.SUGGEST_PRELOAD = False
+    app = create_app()
+    app.config['SUGGEST_RELOAD_SECONDS'] = float('inf')
+    app.config['SUGGEST_MAX_NAMES'] = max(args.names, app.config['SUGGEST_MAX_NAMES'])
+    suggestions.init_app(app)
+
+    if args.database_url:
+        with app.app_context():
+            rows = list(suggestions.rows())
+    else:
+        rows = list(synthetic_rows(args.names, args.seed))
+    started = time.perf_counter()
+    suggestions.build(rows)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # A second, traced build into a fresh index, tracing slows the build down too much to time it
+    tracemalloc.start()
+    traced = SuggestIndex(app)
+    traced.build(rows)
+    index_mib = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+
+    rng = random.Random(args.seed)
+    names = [entry[2] for kind in suggestions.names for entry in suggestions.names[kind].values()]
+    prefixes = []
+    for _ in range(args.lookups):
+        name = rng.choice(names).split()
+        prefixes.append(rng.choice(name)[:rng.randint(1, 6)])
+
+    print('{} names, {} cities, {} keys; built in {:.0f} ms, {:.1f} MiB'.format(
+        len(suggestions), len(suggestions.cities), len(suggestions.keys), build_ms, index_mib))
+    print('{:<24}{:>12}{:>12}{:>12}'.format('lookup', 'median ms', 'p95 ms', 'p99 ms'))
+    client = app.test_client()
+    scenarios = [
+        ('index', lambda prefix: suggestions.suggest(prefix, args.limit)),
+        ('GET /api/suggest', lambda prefix: client.get('/api/suggest', query_string={'q': prefix,
+                                                                                    'limit': args.limit})),
+    ]
+    if args.database_url:
+        from models import Venue
+        scenarios.append(('Venue.search (database)', lambda prefix: Venue.search(prefix)))
+    with app.app_context():
+        for name, function in scenarios:
+            lookups = prefixes if name != 'Venue.search (database)' else prefixes[:500]
+            result = timed(function, lookups)
+            print('{:<24}{:>12.4f}{:>12.4f}{:>12.4f}'.format(name, result['median'], result['p95'], result['p99']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request, session
+
+
+# ----------------------------------------------------------------------------#
+# Backends.
+# ----------------------------------------------------------------------------#
+
+class MemoryBackend(object):
+    # Per-process LRU store of (value, expires_at) entries, bounded to max_entries
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskBackend(object):
+    # SQLite file store shared by every worker process on the host, evicting the least recently read entries
+
+    def __init__(self, max_entries, directory):
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'responses.sqlite')
+        self.local = threading.local()
+        with self.connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS response (key TEXT PRIMARY KEY, value TEXT, '
+                               'expires_at REAL, accessed_at REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_response_accessed_at ON response (accessed_at)')
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self.local.connection = connection
+        return connection
+
+    def get(self, key):
+        now = time.time()
+        connection = self.connection()
+        row = connection.execute('SELECT value, expires_at FROM response WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            connection.execute('DELETE FROM response WHERE key = ?', (key,))
+            return None
+        connection.execute('UPDATE response SET accessed_at = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key, value, expires_at):
+        connection = self.connection()
+        connection.execute('INSERT OR REPLACE INTO response (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                           (key, value, expires_at, time.time()))
+        connection.execute('DELETE FROM response WHERE key IN (SELECT key FROM response ORDER BY accessed_at DESC '
+                           'LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def delete_prefix(self, prefix):
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        self.connection().execute("DELETE FROM response WHERE key LIKE ? ESCAPE '\\'", (escaped + '%',))
+
+    def clear(self):
+        self.connection().execute('DELETE FROM response')
+
+
+class InvalidationJournal(object):
+    # SQLite file of the page key prefixes invalidated on the host, so invalidations made in one process (a
+    # worker, a flask CLI command) reach the memory backends of the others. Each process applies the entries
+    # it has not seen yet, looking at most every poll_seconds. Entries older than ttl are pruned, the pages
+    # they invalidated have expired by then
+
+    def __init__(self, directory, poll_seconds, ttl):
+        self.poll_seconds = poll_seconds
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'invalidations.sqlite')
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        connection = self.connection()
+        connection.execute('CREATE TABLE IF NOT EXISTS invalidation (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                           'prefix TEXT, created_at REAL)')
+        # Pages cached from now on are newer than every invalidation so far
+        self.last_id = connection.execute('SELECT coalesce(max(id), 0) FROM invalidation').fetchone()[0]
+        self.next_poll = time.time() + poll_seconds
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self.local.connection = connection
+        return connection
+
+    def publish(self, prefixes):
+        now = time.time()
+        connection = self.connection()
+        connection.executemany('INSERT INTO invalidation (prefix, created_at) VALUES (?, ?)',
+                               [(prefix, now) for prefix in prefixes])
+        connection.execute('DELETE FROM invalidation WHERE created_at < ?', (now - self.ttl,))
+
+    def poll(self):
+        # The prefixes invalidated since the last poll, none while the poll interval has not elapsed
+        now = time.time()
+        with self.lock:
+            if now < self.next_poll:
+                return []
+            self.next_poll = now + self.poll_seconds
+            rows = self.connection().execute('SELECT id, prefix FROM invalidation WHERE id > ? ORDER BY id',
+                                             (self.last_id,)).fetchall()
+            if rows:
+                self.last_id = rows[-1][0]
+        return [prefix for row_id, prefix in rows]
+
+
+# ----------------------------------------------------------------------------#
+# Response cache.
+# ----------------------------------------------------------------------------#
+
+class ResponseCache(object):
+    # Cache of rendered pages for the read-only GET views. Entries are stored under a page key such as
+    # 'venue:3' followed by the query string, so invalidating a page key drops every filtered variant of it.
+    # Other renderings of the same data (the venue calendar) are named variants of its page key
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.journal = None
+        self.enabled = False
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', False)
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 300)
+        max_entries = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        if app.config.get('RESPONSE_CACHE_BACKEND', 'memory') == 'disk':
+            self.backend = DiskBackend(max_entries, app.config['RESPONSE_CACHE_DIR'])
+        else:
+            self.backend = MemoryBackend(max_entries)
+            self.journal = InvalidationJournal(app.config['RESPONSE_CACHE_DIR'],
+                                               app.config.get('RESPONSE_CACHE_POLL_SECONDS', 1), self.ttl)
+
+    def cached(self, key_format, variant=''):
+        # Also wraps the coroutine views of asgi.py, with the same keys and entries
+        def decorator(view):
+            if inspect.iscoroutinefunction(view):
+                @wraps(view)
+                async def async_wrapper(**kwargs):
+                    key = self.page_key(key_format, kwargs, variant)
+                    if key is None:
+                        return await view(**kwargs)
+                    page = self.backend.get(key)
+                    if page is None:
+                        self.start_fill()
+                        page = self.store(key, await view(**kwargs))
+                    return page
+
+                return async_wrapper
+
+            @wraps(view)
+            def wrapper(**kwargs):
+                key = self.page_key(key_format, kwargs, variant)
+                if key is None:
+                    return view(**kwargs)
+                page = self.backend.get(key)
+                if page is None:
+                    self.start_fill()
+                    page = self.store(key, view(**kwargs))
+                return page
+
+            return wrapper
+
+        return decorator
+
+    def page_key(self, key_format, kwargs, variant=''):
+        # Pages rendering pending flash messages are personal to the visitor, never serve or store them
+        if not self.enabled or session.get('_flashes'):
+            return None
+        self.sync()
+        return key_format.format(**kwargs) + '|' + (variant + '?' if variant else '') + request.query_string.decode()
+
+    @staticmethod
+    def start_fill():
+        # Entries outlive the invalidation that preceded them, so they are rendered from the primary
+        # even for views that otherwise read from a (possibly lagging) replica
+        g.read_replica = False
+
+    def store(self, key, page):
+        if isinstance(page, str):
+            expires_at = time.time() + self.ttl
+            rollover = g.pop('cache_rollover', None)
+            if rollover is not None:
+                expires_at = min(expires_at, rollover.timestamp())
+            self.backend.set(key, page, expires_at)
+        return page
+
+    def expire_at(self, moment):
+        # Called by a view while rendering to end its entry early, e.g. when the next upcoming show it
+        # counts becomes a past show. The earliest moment wins when called more than once
+        if moment is not None and (g.get('cache_rollover') is None or moment < g.cache_rollover):
+            g.cache_rollover = moment
+
+    def sync(self):
+        # Applies the invalidations published by the other processes
+        if self.journal is not None:
+            for prefix in self.journal.poll():
+                self.backend.delete_prefix(prefix)
+
+    def invalidate(self, *page_keys):
+        if self.backend is None:
+            return
+        prefixes = [page_key + '|' for page_key in page_keys]
+        for prefix in prefixes:
+            self.backend.delete_prefix(prefix)
+        if self.journal is not None:
+            self.journal.publish(prefixes)
+
+    def clear(self):
+        # The empty prefix matches every entry
+        if self.backend is not None:
+            self.backend.clear()
+        if self.journal is not None:
+            self.journal.publish([''])
+
+
+response_cache = ResponseCache()
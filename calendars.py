@@ -0,0 +1,111 @@
+import calendar
+import hashlib
+from datetime import date, datetime, time, timedelta, timezone
+
+from flask import Response, abort, current_app, render_template, request, url_for
+
+from extensions import db
+from models import calendar_days_statement, calendar_events_statement
+
+
+# ----------------------------------------------------------------------------#
+# Month calendars.
+# ----------------------------------------------------------------------------#
+
+def requested_month():
+    # First day of ?month=YYYY-MM, the current month by default. A malformed month is a 400, as are the
+    # months of years 1 and 9999, whose calendars run into the days before date.min or after date.max
+    if not request.args.get('month'):
+        return date.today().replace(day=1)
+    try:
+        month = datetime.strptime(request.args['month'], '%Y-%m').date()
+    except ValueError:
+        abort(400)
+    if not date.min.year < month.year < date.max.year:
+        abort(400)
+    return month
+
+
+def render_calendar(show_fk, owner_id, owner_name, owner_url, feed_url):
+    # One month of bookings, weeks starting on Sunday, from a single per-day aggregate query
+    first_day = requested_month()
+    next_month = (first_day + timedelta(days=31)).replace(day=1)
+    previous_month = (first_day - timedelta(days=1)).replace(day=1)
+    days = {row.day: row for row in db.session.execute(calendar_days_statement(
+        show_fk, owner_id, datetime.combine(first_day, time()), datetime.combine(next_month, time())))}
+
+    weeks = []
+    for week in calendar.Calendar(firstweekday=6).monthdatescalendar(first_day.year, first_day.month):
+        weeks.append([{
+            'day': day,
+            'in_month': day.month == first_day.month,
+            'shows_count': days[day].shows_count if day in days else 0,
+            'first_start_time': days[day].first_start_time if day in days else None,
+        } for day in week])
+
+    return render_template('pages/calendar.html', name=owner_name, owner_url=owner_url, feed_url=feed_url,
+                           month=first_day, weeks=weeks,
+                           previous_url=url_for(request.endpoint, month=previous_month.strftime('%Y-%m'),
+                                                **request.view_args),
+                           next_url=url_for(request.endpoint, month=next_month.strftime('%Y-%m'), **request.view_args))
+
+
+# ----------------------------------------------------------------------------#
+# iCalendar feeds.
+# ----------------------------------------------------------------------------#
+
+def ics_text(value):
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ics_line(line):
+    # Content lines are folded at 75 octets, continuation lines start with a space
+    folded, size = '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            folded, size = folded + '\r\n ', 1
+        folded, size = folded + char, size + width
+    return folded + '\r\n'
+
+
+def ics_datetime(moment):
+    # Show times are naive local times, written as floating times
+    return moment.strftime('%Y%m%dT%H%M%S')
+
+
+def render_feed(show_fk, owner_id, owner_name):
+    # The shows of a venue or artist from CALENDAR_FEED_PAST_DAYS ago to CALENDAR_FEED_FUTURE_DAYS ahead.
+    # DTSTAMP is the time the feed was generated, in UTC
+    generated_at = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    today = datetime.combine(date.today(), time())
+    rows = db.session.execute(calendar_events_statement(
+        show_fk, owner_id, today - timedelta(days=current_app.config['CALENDAR_FEED_PAST_DAYS']),
+        today + timedelta(days=current_app.config['CALENDAR_FEED_FUTURE_DAYS'])))
+
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Fyyur//Show calendar//EN', 'CALSCALE:GREGORIAN',
+             'X-WR-CALNAME:' + ics_text(owner_name)]
+    for show in rows:
+        location = ', '.join(part for part in (show.venue_name, show.address, show.city, show.state) if part)
+        lines += [
+            'BEGIN:VEVENT',
+            'UID:show-{}@fyyur'.format(show.id),
+            'DTSTAMP:' + generated_at,
+            'DTSTART:' + ics_datetime(show.start_time),
+            'DTEND:' + ics_datetime(show.end_time),
+            'SUMMARY:' + ics_text('{} at {}'.format(show.artist_name, show.venue_name)),
+            'LOCATION:' + ics_text(location),
+            'URL:' + url_for('venues.detail', venue_id=show.venue_id, _external=True),
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return ''.join(ics_line(line) for line in lines)
+
+
+def feed_response(feed):
+    # Strong ETag over the feed without its DTSTAMP lines, a matching If-None-Match gets an empty 304. The
+    # window moves by whole days, so the tag only changes with the shows and pollers keep getting 304s
+    events = ''.join(line for line in feed.splitlines(True) if not line.startswith('DTSTAMP:'))
+    response = Response(feed, mimetype='text/calendar')
+    response.set_etag(hashlib.sha1(events.encode('utf-8')).hexdigest())
+    return response.make_conditional(request)
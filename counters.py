@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+
+from extensions import db
+from cache import response_cache
+from models import Artist, Show, Venue, refresh_upcoming_shows_counts, upcoming_shows_counts_since
+
+counters_command = AppGroup('counters', help='Maintain the upcoming show counters of venues and artists.')
+
+# (model, show foreign key) of every table with an upcoming_shows_count column
+COUNTED = (('venue', Venue, Show.venue_id), ('artist', Artist, Show.artist_id))
+
+
+@counters_command.command('refresh')
+@click.option('--window', default=60, show_default=True,
+              help='Recount the owners of shows that started within this many minutes. Runs scheduled more '
+                   'often than the window overlap, so a missed run is caught up by the next one.')
+@click.option('--all', 'refresh_all', is_flag=True, help='Recount every venue and artist.')
+def refresh_command(window, refresh_all):
+    """Roll over the counts of shows that have become past shows.
+
+    Meant to run from a scheduler every few minutes, e.g. */5 * * * * flask counters refresh
+    """
+    now = datetime.now()
+    for name, model, show_fk in COUNTED:
+        ids = None
+        if not refresh_all:
+            ids = [owner_id for owner_id, in db.session.query(show_fk).distinct()
+                   .filter(Show.start_time > now - timedelta(minutes=window), Show.start_time <= now)]
+        if ids is None or ids:
+            db.session.execute(refresh_upcoming_shows_counts(model, show_fk, ids))
+        click.echo('Recounted every {}.'.format(name) if ids is None else
+                   'Recounted {} {}s.'.format(len(ids), name), err=True)
+    db.session.commit()
+    response_cache.invalidate('venues')
+
+
+@counters_command.command('check')
+@click.option('--window', default=60, show_default=True,
+              help='Minutes since the last refresh run. Shows started within the window may still be counted.')
+@click.option('--fix', is_flag=True, help='Recount the rows whose stored count is wrong.')
+def check_command(window, fix):
+    """Recompute the upcoming show counts from the show table and report the stored ones that differ.
+
+    Shows that started within --window minutes are rolled over by the next refresh, so a stored count
+    still including them is not a difference. Exits with status 1 when a difference is found and --fix
+    is not given.
+    """
+    now = datetime.now()
+    differences = 0
+    for name, model, show_fk in COUNTED:
+        wrong_ids = []
+        for owner_id, stored, counted_since, actual in upcoming_shows_counts_since(
+                model, show_fk, now - timedelta(minutes=window), now):
+            if not actual <= stored <= counted_since:
+                click.echo('{} {}: stored {}, actual {}'.format(name, owner_id, stored, actual))
+                wrong_ids.append(owner_id)
+        if fix and wrong_ids:
+            db.session.execute(refresh_upcoming_shows_counts(model, show_fk, wrong_ids))
+        differences += len(wrong_ids)
+
+    if fix:
+        db.session.commit()
+        response_cache.invalidate('venues')
+    click.echo('{} counters differ.'.format(differences), err=True)
+    if differences and not fix:
+        raise SystemExit(1)
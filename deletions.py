@@ -0,0 +1,90 @@
+import time
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, select
+
+from cache import response_cache
+from extensions import db
+from models import Artist, Deletion, Show, Venue, artist_genre, refresh_upcoming_shows_counts, venue_genre
+
+deletions_command = AppGroup('deletions', help='Purge the venues and artists deleted from the site.')
+
+# kind -> (model, genre association column, show foreign key, counterpart model, counterpart foreign key)
+OWNERS = {
+    'venue': (Venue, venue_genre.c.venue_id, Show.venue_id, Artist, Show.artist_id),
+    'artist': (Artist, artist_genre.c.artist_id, Show.artist_id, Venue, Show.venue_id),
+}
+
+
+def purge(deletion, batch_size, pause):
+    # Deletes the shows of a soft-deleted venue or artist batch_size at a time, one short transaction per batch
+    # so that bookings and page views are never held up behind one long delete, then the row itself. The
+    # counterparts of each batch are recounted in its transaction and the progress is committed with it, an
+    # interrupted purge resumes where it stopped
+    model, genre_fk, show_fk, counterpart, counterpart_fk = OWNERS[deletion.kind]
+    if deletion.started_at is None:
+        deletion.started_at = datetime.now()
+        deletion.shows_total = db.session.scalar(select(func.count()).where(show_fk == deletion.owner_id))
+        db.session.commit()
+
+    while True:
+        # A range scan of the (owner, start_time) index
+        batch = db.session.execute(select(Show.id, counterpart_fk).where(show_fk == deletion.owner_id)
+                                   .limit(batch_size)).all()
+        if not batch:
+            break
+        # Core deletes skip the Show events, the counterparts are recounted once per batch instead
+        purged = db.session.execute(delete(Show).where(Show.id.in_([show_id for show_id, _ in batch]))).rowcount
+        db.session.execute(refresh_upcoming_shows_counts(counterpart, counterpart_fk,
+                                                         {counterpart_id for _, counterpart_id in batch}))
+        deletion.shows_purged += purged
+        db.session.commit()
+        click.echo('{} {}: {}/{} shows purged.'.format(deletion.kind, deletion.owner_id, deletion.shows_purged,
+                                                        deletion.shows_total), err=True)
+        if pause:
+            time.sleep(pause)
+
+    db.session.execute(delete(genre_fk.table).where(genre_fk == deletion.owner_id))
+    db.session.execute(delete(model).where(model.id == deletion.owner_id))
+    deletion.finished_at = datetime.now()
+    db.session.commit()
+
+
+@deletions_command.command('purge')
+@click.option('--batch-size', default=500, show_default=True, help='Shows deleted per transaction.')
+@click.option('--pause', default=0.0, show_default=True,
+              help='Seconds to wait between batches, to leave room to other writers.')
+def purge_command(batch_size, pause):
+    """Remove the deleted venues and artists, with their shows, in small batched transactions.
+
+    Meant to run from a scheduler, e.g. */5 * * * * flask deletions purge. A run resumes the purges
+    an earlier run left unfinished.
+    """
+    pending = Deletion.query.filter(Deletion.finished_at.is_(None)).order_by(Deletion.id).all()
+    for deletion in pending:
+        purge(deletion, batch_size, pause)
+        click.echo('Purged {} {} ({}).'.format(deletion.kind, deletion.owner_id, deletion.name), err=True)
+    if pending:
+        # The /venues listing shows the counts recounted above
+        response_cache.invalidate('venues')
+    click.echo('{} deletions purged.'.format(len(pending)), err=True)
+
+
+@deletions_command.command('status')
+@click.option('--all', 'show_all', is_flag=True, help='Include the finished purges.')
+def status_command(show_all):
+    """List the pending purges and their progress."""
+    query = Deletion.query.order_by(Deletion.id)
+    if not show_all:
+        query = query.filter(Deletion.finished_at.is_(None))
+    for deletion in query:
+        if deletion.finished_at is not None:
+            progress = 'finished {:%Y-%m-%d %H:%M}'.format(deletion.finished_at)
+        elif deletion.started_at is not None:
+            progress = '{}/{} shows purged'.format(deletion.shows_purged, deletion.shows_total)
+        else:
+            progress = 'waiting'
+        click.echo('{} {} ({}), deleted {:%Y-%m-%d %H:%M}: {}'.format(
+            deletion.kind, deletion.owner_id, deletion.name, deletion.requested_at, progress))
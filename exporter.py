@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Artist, Genre, Show, Venue, artist_genre, venue_genre
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rows fetched per round trip. With yield_per PostgreSQL streams through a server-side cursor, so only
+# this many rows are held in memory at once
+EXPORT_BATCH_SIZE = 1000
+
+# Column order of the exported files, the names are the ones the import command reads back
+SHOW_COLUMNS = ('id', 'start_time', 'duration', 'venue_id', 'venue_name', 'artist_id', 'artist_name',
+                'artist_image_link')
+
+# Exported columns computed from the selected ones: the show length in minutes, as ShowForm reads it
+DERIVED_COLUMNS = {
+    'duration': lambda row: (row.end_time - row.start_time) // timedelta(minutes=1),
+}
+VENUE_COLUMNS = ('id', 'name', 'city', 'state', 'address', 'latitude', 'longitude', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website_link', 'seeking_talent', 'seeking_description')
+ARTIST_COLUMNS = ('id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link', 'website_link',
+                  'seeking_venue', 'seeking_description')
+
+MIMETYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+def catalog_statement(model, association, owner_column, columns, city=None, state=None):
+    # The given columns plus the comma-joined genre names of each row, aggregated in SQL so that no row
+    # needs a query of its own
+    if db.engine.dialect.name == 'postgresql':
+        genres = func.string_agg(Genre.name, ',')
+    else:
+        genres = func.group_concat(Genre.name, ',')
+
+    statement = select(*columns, genres.label('genres')) \
+        .outerjoin(association, owner_column == model.id) \
+        .outerjoin(Genre, Genre.id == association.c.genre_id) \
+        .where(model.deleted_at.is_(None)) \
+        .group_by(model.id)
+    if city:
+        statement = statement.where(model.city == city)
+    if state:
+        statement = statement.where(model.state == state)
+
+    return statement.order_by(model.id)
+
+
+def venues_statement(city=None, state=None):
+    return catalog_statement(Venue, venue_genre, venue_genre.c.venue_id, (
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.latitude, Venue.longitude, Venue.phone,
+        Venue.image_link, Venue.facebook_link, Venue.website_link, Venue.is_looking_talent.label('seeking_talent'),
+        Venue.seeking_description), city, state)
+
+
+def artists_statement(city=None, state=None):
+    return catalog_statement(Artist, artist_genre, artist_genre.c.artist_id, (
+        Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone, Artist.image_link, Artist.facebook_link,
+        Artist.website_link, Artist.is_looking_venues.label('seeking_venue'), Artist.seeking_description),
+        city, state)
+
+
+# ----------------------------------------------------------------------------#
+# Writing.
+# ----------------------------------------------------------------------------#
+
+def value(row, column):
+    # Datetimes as 'YYYY-MM-DD HH:MM:SS', the format ShowForm parses on import
+    field = DERIVED_COLUMNS[column](row) if column in DERIVED_COLUMNS else getattr(row, column)
+    if isinstance(field, datetime):
+        return field.isoformat(sep=' ')
+    return field
+
+
+def dumps(record):
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, separators=(',', ':')).encode('utf-8')
+
+
+def export_lines(statement, columns, file_format):
+    # Streams the rows of statement as UTF-8 CSV (with a header line) or JSONL, one chunk per
+    # EXPORT_BATCH_SIZE rows. Only the current chunk is held in memory
+    rows = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for count, row in enumerate(rows, 1):
+            writer.writerow([value(row, column) for column in columns])
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+    else:
+        chunk = []
+        for row in rows:
+            chunk.append(dumps({column: value(row, column) for column in columns}) + b'\n')
+            if len(chunk) == EXPORT_BATCH_SIZE:
+                yield b''.join(chunk)
+                chunk = []
+        yield b''.join(chunk)
+
+
+# ----------------------------------------------------------------------------#
+# Command.
+# ----------------------------------------------------------------------------#
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--output', type=click.File('wb'), default='-', help='Destination file, stdout by default.')
+@click.option('--city', help='Only rows in this city (the venue city for shows).')
+@click.option('--state', help='Only rows in this state (the venue state for shows).')
+@click.option('--from', 'start_date', help='Shows only: first day, YYYY-MM-DD.')
+@click.option('--to', 'end_date', help='Shows only: last day (inclusive), YYYY-MM-DD.')
+@click.option('--upcoming', is_flag=True, help='Shows only: upcoming shows only.')
+@with_appcontext
+def export_command(kind, file_format, output, city, state, start_date, end_date, upcoming):
+    """Stream venues, artists or the show history to a CSV or JSONL file.
+
+    The files use the columns the import command reads, so an export can be loaded into another
+    database with flask import.
+    """
+    if kind == 'shows':
+        try:
+            filters = Show.listing_filters({'upcoming': '1' if upcoming else None, 'city': city, 'state': state,
+                                            'from': start_date, 'to': end_date})
+        except ValueError:
+            raise click.BadParameter('dates must be YYYY-MM-DD', param_hint='--from/--to')
+        statement, columns = Show.listing_statement(**filters), SHOW_COLUMNS
+    elif kind == 'venues':
+        statement, columns = venues_statement(city, state), VENUE_COLUMNS
+    else:
+        statement, columns = artists_statement(city, state), ARTIST_COLUMNS
+
+    for chunk in export_lines(statement, columns, file_format):
+        output.write(chunk)
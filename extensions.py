@@ -0,0 +1,33 @@
+import click
+from flask.cli import ScriptInfo
+from flask_moment import Moment
+from flask_sqlalchemy import SQLAlchemy
+
+from routing import RoutingSession
+
+# ----------------------------------------------------------------------------#
+# Extensions.
+# ----------------------------------------------------------------------------#
+
+# Created unbound and attached to the app by create_app, so models and commands import them from here
+# instead of from the app module
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+moment = Moment()
+
+
+class MigrateGroup(click.Group):
+    # `flask db`. Flask-Migrate pulls in alembic, which costs every worker and command a third of its
+    # startup, so it is imported and bound to the app only when `flask db` runs. The context made here
+    # belongs to Flask-Migrate's own group, with its options, callback and subcommands
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as migrate_group
+
+        app = parent.ensure_object(ScriptInfo).load_app()
+        if 'migrate' not in app.extensions:
+            Migrate(app, db)
+        return migrate_group.make_context(info_name, args, parent=parent, **extra)
+
+
+migrate_command = MigrateGroup('db', help='Perform database migrations.')
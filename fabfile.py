@@ -13,6 +13,12 @@ def test():
         abort("Aborted at user request.")
 
 
+def bench(scale='10k'):
+    # Route benchmarks against a fresh synthetic SQLite catalog, results in benchmarks/results/
+    local("python -m benchmarks.datagen --database-url sqlite:///bench.db --scale {} --drop".format(scale))
+    local("python -m benchmarks.routes --database-url sqlite:///bench.db --writes")
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,38 @@
+from datetime import datetime
+from functools import lru_cache
+
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+    # Babel pattern compiled once per format, named formats or any raw pattern string. Babel and dateutil
+    # are imported when the first date is rendered rather than at startup
+    import babel.dates
+
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+
+@lru_cache(maxsize=None)
+def datetime_locale(locale):
+    import babel
+
+    return babel.Locale.parse(locale)
+
+
+@lru_cache(maxsize=4096)
+def format_datetime(value, format='medium', locale='en'):
+    # Accepts datetime objects as well as the strings the views used to pass. The same show times are
+    # rendered over and over across listings, so results are memoized in a bounded LRU cache
+    if not isinstance(value, datetime):
+        import dateutil.parser
+
+        value = dateutil.parser.parse(value)
+    return datetime_pattern(format).apply(value, datetime_locale(locale))
@@ -1,7 +1,34 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Regexp
+from wtforms import (StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, DateField,
+                     FloatField)
+from wtforms.validators import DataRequired, AnyOf, URL, Regexp, NumberRange, Optional, ValidationError
+
+from models import DEFAULT_SHOW_DURATION, MAX_OCCURRENCES, MAX_SHOW_DURATION, recurrence
+
+
+# Genre vocabulary shared by the venue and artist forms, and the source of the genre table rows
+GENRE_CHOICES = [
+    ('Alternative', 'Alternative'),
+    ('Blues', 'Blues'),
+    ('Classical', 'Classical'),
+    ('Country', 'Country'),
+    ('Electronic', 'Electronic'),
+    ('Folk', 'Folk'),
+    ('Funk', 'Funk'),
+    ('Hip-Hop', 'Hip-Hop'),
+    ('Heavy Metal', 'Heavy Metal'),
+    ('Instrumental', 'Instrumental'),
+    ('Jazz', 'Jazz'),
+    ('Musical Theatre', 'Musical Theatre'),
+    ('Pop', 'Pop'),
+    ('Punk', 'Punk'),
+    ('R&B', 'R&B'),
+    ('Reggae', 'Reggae'),
+    ('Rock n Roll', 'Rock n Roll'),
+    ('Soul', 'Soul'),
+    ('Other', 'Other'),
+]
 
 
 class ShowForm(Form):
@@ -14,8 +41,39 @@ class ShowForm(Form):
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default=datetime.today()
+        default=datetime.today
+    )
+    # Minutes
+    duration = IntegerField(
+        'duration',
+        validators=[DataRequired(), NumberRange(min=1, max=MAX_SHOW_DURATION // timedelta(minutes=1))],
+        default=DEFAULT_SHOW_DURATION // timedelta(minutes=1)
     )
+    # Recurring bookings, a number of shows or an end date
+    repeat = SelectField(
+        'repeat',
+        choices=[('', 'Does not repeat'), ('weekly', 'Weekly'), ('monthly', 'Monthly')],
+        default=''
+    )
+    repeat_count = IntegerField(
+        'repeat_count', validators=[Optional(), NumberRange(min=1, max=MAX_OCCURRENCES)]
+    )
+    repeat_until = DateField(
+        'repeat_until', validators=[Optional()]
+    )
+    skip_conflicts = BooleanField('skip_conflicts')
+
+    def validate_repeat(self, field):
+        if not field.data:
+            return
+        if not self.repeat_count.data and not self.repeat_until.data:
+            raise ValidationError('Give the number of shows or the date of the last one.')
+        if self.repeat_until.data and self.start_time.data and not self.repeat_count.data:
+            starts = recurrence(self.start_time.data, field.data, MAX_OCCURRENCES + 1, self.repeat_until.data)
+            if not starts:
+                raise ValidationError('The last date is before the first show.')
+            if len(starts) > MAX_OCCURRENCES:
+                raise ValidationError('At most {} shows can be listed at once.'.format(MAX_OCCURRENCES))
 
 
 class VenueForm(Form):
@@ -85,6 +143,13 @@ class VenueForm(Form):
     address = StringField(
         'address', validators=[DataRequired()]
     )
+    # Optional, venues without coordinates can be geocoded from their city with `flask geocode`
+    latitude = FloatField(
+        'latitude', validators=[Optional(), NumberRange(min=-90, max=90)]
+    )
+    longitude = FloatField(
+        'longitude', validators=[Optional(), NumberRange(min=-180, max=180)]
+    )
     phone = StringField(
         'phone',
         validators=[Regexp('^\d{3}-\d{3}-\d{4}$', message='Please respect the phone number format: ' + 'xxx-xxx-xxxx')]
@@ -93,29 +158,8 @@ class VenueForm(Form):
         'image_link', validators=[URL(message="Enter a valid link")]
     )
     genres = SelectMultipleField(
-        # TODO implement enum restriction
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=GENRE_CHOICES
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL(message="Enter a valid link")]
@@ -206,27 +250,7 @@ class ArtistForm(Form):
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=GENRE_CHOICES
     )
     facebook_link = StringField(
         # TODO implement enum restriction
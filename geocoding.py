@@ -0,0 +1,84 @@
+import csv
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, or_, select, tuple_, update
+
+from cache import response_cache
+from extensions import db
+from models import Venue
+
+# Venues updated per executemany round trip
+GEOCODE_BATCH_SIZE = 1000
+
+
+def place_key(city, state):
+    return ' '.join((city or '').casefold().split()), (state or '').strip().upper()
+
+
+def read_places(places):
+    # (city, state) -> (latitude, longitude) from a CSV file with city, state, latitude and longitude columns.
+    # Returns the table and the number of lines skipped for a missing or malformed value
+    table, skipped = {}, 0
+    for row in csv.DictReader(places):
+        try:
+            latitude, longitude = float(row['latitude']), float(row['longitude'])
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+            continue
+        if not row.get('city') or not row.get('state') or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            skipped += 1
+            continue
+        table[place_key(row['city'], row['state'])] = (latitude, longitude)
+    return table, skipped
+
+
+@click.command('geocode')
+@click.argument('places', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--overwrite', is_flag=True, help='Also replace the coordinates venues already have.')
+@with_appcontext
+def geocode_command(places, overwrite):
+    """Fill in venue coordinates from a local table of places, without a geocoding service.
+
+    PLACES is a CSV file with city, state, latitude and longitude columns, e.g. an extract of the
+    US Census gazetteer or of GeoNames. Each venue gets the coordinates of its city, matched without
+    regard to case; venues with coordinates are left alone unless --overwrite is given.
+    """
+    table, skipped = read_places(places)
+    if skipped:
+        click.echo('Skipped {} place lines with a missing or malformed value.'.format(skipped), err=True)
+
+    # One row per (city, state) of the venues to update, then one UPDATE per city, sent in executemany batches
+    venue = Venue.__table__
+    missing = or_(venue.c.latitude.is_(None), venue.c.longitude.is_(None))
+    areas = select(venue.c.city, venue.c.state, func.count().label('venues')).group_by(venue.c.city, venue.c.state)
+    if not overwrite:
+        areas = areas.where(missing)
+    updates, geocoded, unknown = [], 0, 0
+    for area in db.session.execute(areas):
+        point = table.get(place_key(area.city, area.state))
+        if point is None:
+            unknown += 1
+            continue
+        updates.append({'b_city': area.city, 'b_state': area.state, 'b_latitude': point[0], 'b_longitude': point[1]})
+        geocoded += area.venues
+
+    # The venues about to change, their cached pages are invalidated once the coordinates are committed
+    venue_ids = []
+    for start in range(0, len(updates), GEOCODE_BATCH_SIZE):
+        touched = select(venue.c.id).where(tuple_(venue.c.city, venue.c.state).in_(
+            [(place['b_city'], place['b_state']) for place in updates[start:start + GEOCODE_BATCH_SIZE]]))
+        if not overwrite:
+            touched = touched.where(missing)
+        venue_ids += db.session.scalars(touched).all()
+
+    statement = update(venue).where(venue.c.city == bindparam('b_city'), venue.c.state == bindparam('b_state')) \
+        .values(latitude=bindparam('b_latitude'), longitude=bindparam('b_longitude'))
+    if not overwrite:
+        statement = statement.where(missing)
+    for start in range(0, len(updates), GEOCODE_BATCH_SIZE):
+        db.session.execute(statement, updates[start:start + GEOCODE_BATCH_SIZE])
+    db.session.commit()
+    response_cache.invalidate(*['venue:{}'.format(venue_id) for venue_id in venue_ids])
+    click.echo('Geocoded {} venues in {} cities, {} cities not found.'.format(geocoded, len(updates), unknown),
+               err=True)
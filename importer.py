@@ -0,0 +1,355 @@
+import csv
+import io
+import json
+import os
+from datetime import timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+
+from extensions import db
+from cache import response_cache
+from models import (DEFAULT_SHOW_DURATION, Artist, Bookings, Genre, Show, Venue, artist_genre,
+                    refresh_upcoming_shows_counts, venue_genre)
+
+
+# ----------------------------------------------------------------------------#
+# Reading.
+# ----------------------------------------------------------------------------#
+
+def read_rows(path, file_format):
+    # Streams (line number, row dict, error) from a CSV file with a header line or from a JSONL file
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for line, text in enumerate(source, 1):
+                if text.strip():
+                    try:
+                        yield line, json.loads(text), None
+                    except ValueError as error:
+                        yield line, None, 'invalid JSON: {}'.format(error)
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+FALSE_VALUES = ('', '0', 'false', 'no', 'n', 'none')
+
+
+def form_data(row):
+    # Form data in the shape the HTML forms post: genres as a list, either a JSON list or a comma-joined string
+    data = MultiDict()
+    for key, value in row.items():
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',') if genre.strip()]
+        if key in BOOLEAN_FIELDS and str(value).strip().lower() in FALSE_VALUES:
+            continue
+        if isinstance(value, list):
+            data.setlist(key, [str(item) for item in value])
+        elif isinstance(value, bool):
+            data[key] = 'y' if value else ''
+        elif value is not None:
+            data[key] = str(value)
+    return data
+
+
+def with_default_duration(row):
+    # Shows without a duration last DEFAULT_SHOW_DURATION, as on the new show form
+    if str(row.get('duration') or '').strip():
+        return row
+    return dict(row, duration=DEFAULT_SHOW_DURATION // timedelta(minutes=1))
+
+
+def validate(form_class, row):
+    # The same validation rules as the submission views, returns (form, errors)
+    form = form_class(formdata=form_data(row), meta={'csrf': False})
+    if form.validate():
+        return form, None
+    return form, form.errors
+
+
+# ----------------------------------------------------------------------------#
+# Importer.
+# ----------------------------------------------------------------------------#
+
+class Importer(object):
+    # Validates rows and inserts them in batches. Invalid or conflicting rows are reported and skipped, the
+    # rest of their batch is still inserted
+
+    def __init__(self, batch_size, rejects):
+        self.batch_size = batch_size
+        self.rejects = rejects
+        self.inserted = 0
+        self.rejected = 0
+        self.genre_ids = {}
+
+    def reject(self, line, row, errors):
+        self.rejected += 1
+        self.rejects.write(json.dumps({'line': line, 'errors': errors, 'row': row}, default=str) + '\n')
+
+    def load_genres(self):
+        from forms import GENRE_CHOICES
+
+        Genre.from_names([name for name, label in GENRE_CHOICES])
+        db.session.commit()
+        self.genre_ids = {genre.name: genre.id for genre in Genre.query.all()}
+
+    def run(self, kind, rows):
+        import_batch = {
+            'venues': self.import_venues,
+            'artists': self.import_artists,
+            'shows': self.import_shows,
+        }[kind]
+        if kind != 'shows':
+            self.load_genres()
+        for batch in batches(rows, self.batch_size):
+            valid = []
+            for line, row, error in batch:
+                if error:
+                    self.reject(line, row, {'row': [error]})
+                else:
+                    valid.append((line, row))
+            import_batch(valid)
+            db.session.commit()
+            click.echo('{} inserted, {} rejected'.format(self.inserted, self.rejected), err=True)
+
+    def unique_rows(self, model, batch, fields):
+        # Drops rows whose unique fields repeat within the batch or already exist in the table, with one
+        # query per field
+        kept = []
+        seen = {field: set() for field in fields}
+        for field in fields:
+            values = [getattr(form, field).data for line, row, form in batch if getattr(form, field).data]
+            column = getattr(model, field)
+            seen[field].update(value for value, in db.session.query(column).filter(column.in_(values)))
+        for line, row, form in batch:
+            duplicates = [field for field in fields if getattr(form, field).data in seen[field]]
+            if duplicates:
+                self.reject(line, row, {field: ['already exists'] for field in duplicates})
+                continue
+            for field in fields:
+                if getattr(form, field).data:
+                    seen[field].add(getattr(form, field).data)
+            kept.append((line, row, form))
+        return kept
+
+    def import_entities(self, model, form_class, association, owner_column, batch, columns):
+        validated = []
+        for line, row in batch:
+            form, errors = validate(form_class, row)
+            if errors:
+                self.reject(line, row, errors)
+            else:
+                validated.append((line, row, form))
+        validated = self.unique_rows(model, validated, ('name', 'phone'))
+        if not validated:
+            return
+
+        records = [{column: field(form) for column, field in columns.items()} for line, row, form in validated]
+        ids = db.session.execute(insert(model).returning(model.id, sort_by_parameter_order=True), records).scalars()
+        links = [{owner_column: owner_id, 'genre_id': self.genre_ids[name]}
+                 for owner_id, (line, row, form) in zip(ids, validated) for name in set(form.genres.data)]
+        if links:
+            db.session.execute(association.insert(), links)
+        self.inserted += len(records)
+
+    def import_venues(self, batch):
+        from forms import VenueForm
+
+        self.import_entities(Venue, VenueForm, venue_genre, 'venue_id', batch, {
+            'name': lambda form: form.name.data,
+            'city': lambda form: form.city.data,
+            'state': lambda form: form.state.data,
+            'address': lambda form: form.address.data,
+            'latitude': lambda form: form.latitude.data,
+            'longitude': lambda form: form.longitude.data,
+            'phone': lambda form: form.phone.data,
+            'image_link': lambda form: form.image_link.data,
+            'facebook_link': lambda form: form.facebook_link.data,
+            'website_link': lambda form: form.website_link.data,
+            'is_looking_talent': lambda form: form.seeking_talent.data,
+            'seeking_description': lambda form: form.seeking_description.data,
+        })
+
+    def import_artists(self, batch):
+        from forms import ArtistForm
+
+        self.import_entities(Artist, ArtistForm, artist_genre, 'artist_id', batch, {
+            'name': lambda form: form.name.data,
+            'city': lambda form: form.city.data,
+            'state': lambda form: form.state.data,
+            'phone': lambda form: form.phone.data,
+            'image_link': lambda form: form.image_link.data,
+            'facebook_link': lambda form: form.facebook_link.data,
+            'website_link': lambda form: form.website_link.data,
+            'is_looking_venues': lambda form: form.seeking_venue.data,
+            'seeking_description': lambda form: form.seeking_description.data,
+        })
+
+    @staticmethod
+    def resolve(model, batch, key):
+        # Maps the <key>_name / <key>_id references of a batch to existing ids with one query each. Names are
+        # unique and survive an export into another database where ids do not, so a name wins over an id.
+        # Deleted venues and artists are unknown references
+        ids = {int(row[key + '_id']) for line, row, form in batch
+               if not row.get(key + '_name') and str(row.get(key + '_id') or '').isdigit()}
+        names = {row[key + '_name'] for line, row, form in batch if row.get(key + '_name')}
+        live = model.deleted_at.is_(None)
+        by_id = {row_id for row_id, in db.session.query(model.id).filter(model.id.in_(ids), live)} if ids else set()
+        by_name = dict(db.session.query(model.name, model.id).filter(model.name.in_(names), live)) if names else {}
+
+        def reference(row):
+            if row.get(key + '_name'):
+                return by_name.get(row[key + '_name'])
+            if str(row.get(key + '_id') or '').isdigit():
+                return int(row[key + '_id']) if int(row[key + '_id']) in by_id else None
+            return None
+
+        return reference
+
+    def import_shows(self, batch):
+        from forms import ShowForm
+
+        validated = []
+        for line, row in batch:
+            form, errors = validate(ShowForm, with_default_duration(row))
+            if errors:
+                self.reject(line, row, errors)
+            else:
+                validated.append((line, row, form))
+
+        artist_reference = self.resolve(Artist, validated, 'artist')
+        venue_reference = self.resolve(Venue, validated, 'venue')
+        resolved = []
+        for line, row, form in validated:
+            artist_id, venue_id = artist_reference(row), venue_reference(row)
+            if artist_id is None or venue_id is None:
+                errors = {}
+                if artist_id is None:
+                    errors['artist'] = ['unknown artist']
+                if venue_id is None:
+                    errors['venue'] = ['unknown venue']
+                self.reject(line, row, errors)
+                continue
+            start_time = form.start_time.data
+            resolved.append((line, row, {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time,
+                                         'end_time': start_time + timedelta(minutes=form.duration.data)}))
+        if not resolved:
+            return
+
+        # Double bookings, against the stored shows and between rows of the file, with one query per batch
+        bookings = Bookings({record['venue_id'] for line, row, record in resolved},
+                            {record['artist_id'] for line, row, record in resolved},
+                            min(record['start_time'] for line, row, record in resolved),
+                            max(record['end_time'] for line, row, record in resolved))
+        booked_rows = []
+        for line, row, record in resolved:
+            booked = bookings.conflicts(**record)
+            if booked:
+                self.reject(line, row, {owner: ['already booked at that time'] for owner in booked})
+                continue
+            bookings.add(**record)
+            booked_rows.append((line, row, record))
+        records = self.insert_shows(booked_rows)
+        if not records:
+            return
+
+        # Bulk inserts skip the Show events, recount the venues and artists of the batch at once
+        venue_ids = {record['venue_id'] for record in records}
+        artist_ids = {record['artist_id'] for record in records}
+        db.session.execute(refresh_upcoming_shows_counts(Venue, Show.venue_id, venue_ids))
+        db.session.execute(refresh_upcoming_shows_counts(Artist, Show.artist_id, artist_ids))
+        self.inserted += len(records)
+
+    def insert_shows(self, batch):
+        # The whole batch in one statement. A show booked by someone else since the batch was checked makes the
+        # database reject the batch, which is then inserted row by row to reject only the rows clashing with it.
+        # Returns the inserted records
+        records = [record for line, row, record in batch]
+        if not records:
+            return records
+        try:
+            with db.session.begin_nested():
+                if db.engine.dialect.name == 'postgresql':
+                    copy_shows(records)
+                else:
+                    db.session.execute(insert(Show), records)
+            return records
+        except (IntegrityError, db.engine.dialect.loaded_dbapi.IntegrityError):
+            pass
+
+        inserted = []
+        for line, row, record in batch:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(Show), [record])
+            except IntegrityError:
+                booked = Bookings({record['venue_id']}, {record['artist_id']}, record['start_time'],
+                                  record['end_time']).conflicts(**record)
+                self.reject(line, row, {owner: ['already booked at that time'] for owner in booked or ('show',)})
+                continue
+            inserted.append(record)
+        return inserted
+
+
+def copy_shows(records):
+    # COPY FROM STDIN on the session's connection, in the same transaction as the rest of the batch, through the
+    # COPY API of psycopg2 or psycopg 3. Other drivers get the same multi-row INSERT as SQLite
+    statement = 'COPY "show" (artist_id, venue_id, start_time, end_time) FROM STDIN'
+    driver = db.engine.dialect.driver
+    if driver == 'psycopg2':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in records:
+            writer.writerow((record['artist_id'], record['venue_id'], record['start_time'].isoformat(sep=' '),
+                             record['end_time'].isoformat(sep=' ')))
+        buffer.seek(0)
+        with db.session.connection().connection.cursor() as cursor:
+            cursor.copy_expert(statement + ' WITH (FORMAT csv)', buffer)
+    elif driver == 'psycopg':
+        with db.session.connection().connection.cursor() as cursor, cursor.copy(statement) as copy:
+            for record in records:
+                copy.write_row((record['artist_id'], record['venue_id'], record['start_time'], record['end_time']))
+    else:
+        db.session.execute(insert(Show), records)
+
+
+# ----------------------------------------------------------------------------#
+# Command.
+# ----------------------------------------------------------------------------#
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='File format, guessed from the extension by default.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows validated and inserted per transaction.')
+@click.option('--rejects', type=click.File('w'), default='-',
+              help='Where rejected rows are reported as JSON lines, stdout by default.')
+@with_appcontext
+def import_command(kind, path, file_format, batch_size, rejects):
+    """Bulk import venues, artists or shows from a CSV or JSONL file.
+
+    Rows are validated with the rules of VenueForm, ArtistForm and ShowForm. Shows reference their
+    artist and venue by artist_name/venue_name, or by artist_id/venue_id in rows without a name.
+    """
+    file_format = file_format or ('csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl')
+    importer = Importer(batch_size, rejects)
+    importer.run(kind, read_rows(path, file_format))
+    response_cache.clear()
+    click.echo('Imported {} {}, rejected {} rows.'.format(importer.inserted, kind, importer.rejected), err=True)
@@ -0,0 +1,165 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import Response, before_render_template, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Timing record of the request being served by the current thread, None outside requests
+current_timing = ContextVar('current_timing', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class RequestTiming(object):
+    __slots__ = ('started', 'queries', 'db_time', 'slowest_time', 'slowest_statement', 'render_time',
+                 'render_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.render_time = 0.0
+        self.render_started = None
+
+
+class Histogram(object):
+    # Cumulative-bucket histogram per label value, in the shape of the Prometheus exposition format
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, label, value):
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def exposition(self):
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} histogram'.format(self.name)]
+        for label, (counts, total, count) in sorted(self.series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(self.name, label, bound, bucket_count))
+            lines.append('{}_bucket{{endpoint="{}",le="+Inf"}} {}'.format(self.name, label, count))
+            lines.append('{}_sum{{endpoint="{}"}} {}'.format(self.name, label, round(total, 6)))
+            lines.append('{}_count{{endpoint="{}"}} {}'.format(self.name, label, count))
+        return lines
+
+
+class RequestMetrics(object):
+    # Per-request SQL and template timing, reported in a Server-Timing header and aggregated per endpoint
+    # at /metrics. Aggregates live in the worker process, each worker exposes its own series
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.histograms = [
+            Histogram('fyyur_request_duration_seconds', 'Time spent serving the request.', DURATION_BUCKETS),
+            Histogram('fyyur_request_db_seconds', 'Time spent executing SQL statements.', DURATION_BUCKETS),
+            Histogram('fyyur_request_render_seconds', 'Time spent rendering templates.', DURATION_BUCKETS),
+            Histogram('fyyur_request_queries', 'Number of SQL statements executed.', QUERY_COUNT_BUCKETS),
+        ]
+        self.slow_query_seconds = 0.5
+        self.logger = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self.slow_query_seconds = app.config.get('METRICS_SLOW_QUERY_MS', 500) / 1000
+        self.logger = app.logger
+
+        event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+        before_render_template.connect(self.before_render, app)
+        template_rendered.connect(self.after_render, app)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.clear_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    # SQLAlchemy engine events
+
+    @staticmethod
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_timing.get() is not None:
+            conn.info['query_started'] = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        timing = current_timing.get()
+        started = conn.info.pop('query_started', None)
+        if timing is None or started is None:
+            return
+        elapsed = time.perf_counter() - started
+        timing.queries += 1
+        timing.db_time += elapsed
+        if elapsed > timing.slowest_time:
+            timing.slowest_time = elapsed
+            timing.slowest_statement = statement
+
+    # Flask template signals
+
+    @staticmethod
+    def before_render(sender, template, context, **extra):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.render_started = time.perf_counter()
+
+    @staticmethod
+    def after_render(sender, template, context, **extra):
+        timing = current_timing.get()
+        if timing is not None and timing.render_started is not None:
+            timing.render_time += time.perf_counter() - timing.render_started
+            timing.render_started = None
+
+    # Request lifecycle
+
+    @staticmethod
+    def start_request():
+        current_timing.set(RequestTiming())
+
+    def finish_request(self, response):
+        timing = current_timing.get()
+        if timing is None or request.endpoint == 'metrics':
+            return response
+        total = time.perf_counter() - timing.started
+        response.headers['Server-Timing'] = (
+            'db;dur={:.2f};desc="{} queries", db-slowest;dur={:.2f}, render;dur={:.2f}, total;dur={:.2f}'.format(
+                timing.db_time * 1000, timing.queries, timing.slowest_time * 1000, timing.render_time * 1000,
+                total * 1000))
+
+        endpoint = request.endpoint or 'unmatched'
+        with self.lock:
+            for histogram, value in zip(self.histograms,
+                                        (total, timing.db_time, timing.render_time, timing.queries)):
+                histogram.observe(endpoint, value)
+
+        if timing.slowest_time >= self.slow_query_seconds:
+            self.logger.warning('Slow query on %s (%.0f ms): %s', endpoint, timing.slowest_time * 1000,
+                                timing.slowest_statement)
+        return response
+
+    @staticmethod
+    def clear_request(exception=None):
+        current_timing.set(None)
+
+    def metrics_view(self):
+        with self.lock:
+            lines = []
+            for histogram in self.histograms:
+                lines.extend(histogram.exposition())
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+request_metrics = RequestMetrics()
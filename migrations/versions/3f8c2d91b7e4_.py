@@ -0,0 +1,56 @@
+"""name search indexes
+
+Revision ID: 3f8c2d91b7e4
+Revises: 0b6946e414f9
+Create Date: 2026-10-18 10:12:41.208531
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8c2d91b7e4'
+down_revision = '0b6946e414f9'
+branch_labels = None
+depends_on = None
+
+SEARCHABLE_TABLES = ('venue', 'artist')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table_name in SEARCHABLE_TABLES:
+            op.execute('CREATE INDEX IF NOT EXISTS ix_{0}_name_trgm ON {0} USING gin (name gin_trgm_ops)'
+                       .format(table_name))
+    elif dialect == 'sqlite':
+        for table_name in SEARCHABLE_TABLES:
+            fts_name = table_name + '_name_fts'
+            op.execute("CREATE VIRTUAL TABLE {1} USING fts5(name, content='{0}', content_rowid='id', "
+                       "tokenize='trigram')".format(table_name, fts_name))
+            op.execute('CREATE TRIGGER {1}_ai AFTER INSERT ON {0} BEGIN '
+                       'INSERT INTO {1}(rowid, name) VALUES (new.id, new.name); END'.format(table_name, fts_name))
+            op.execute("CREATE TRIGGER {1}_ad AFTER DELETE ON {0} BEGIN "
+                       "INSERT INTO {1}({1}, rowid, name) VALUES ('delete', old.id, old.name); END"
+                       .format(table_name, fts_name))
+            op.execute("CREATE TRIGGER {1}_au AFTER UPDATE OF name ON {0} BEGIN "
+                       "INSERT INTO {1}({1}, rowid, name) VALUES ('delete', old.id, old.name); "
+                       "INSERT INTO {1}(rowid, name) VALUES (new.id, new.name); END"
+                       .format(table_name, fts_name))
+            # Index the rows that already exist
+            op.execute("INSERT INTO {0}({0}) VALUES ('rebuild')".format(fts_name))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table_name in SEARCHABLE_TABLES:
+            op.execute('DROP INDEX IF EXISTS ix_{0}_name_trgm'.format(table_name))
+    elif dialect == 'sqlite':
+        for table_name in SEARCHABLE_TABLES:
+            fts_name = table_name + '_name_fts'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS {0}_{1}'.format(fts_name, suffix))
+            op.execute('DROP TABLE IF EXISTS {0}'.format(fts_name))
@@ -0,0 +1,94 @@
+"""normalized genres
+
+Revision ID: 7a2e5b0c9d14
+Revises: 3f8c2d91b7e4
+Create Date: 2026-10-18 11:03:27.734102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2e5b0c9d14'
+down_revision = '3f8c2d91b7e4'
+branch_labels = None
+depends_on = None
+
+# Vocabulary of forms.GENRE_CHOICES at the time of this migration
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop', 'Heavy Metal',
+    'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+
+GENRE_OWNERS = (('venue', 'venue_genre', 'venue_id'), ('artist', 'artist_genre', 'artist_id'))
+
+
+def upgrade():
+    genre_table = op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for owner_table, association_table, owner_column in GENRE_OWNERS:
+        op.create_table(association_table,
+        sa.Column(owner_column, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([owner_column], [owner_table + '.id'], ),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+        sa.PrimaryKeyConstraint(owner_column, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(association_table, owner_column), association_table,
+                        ['genre_id', owner_column], unique=False)
+
+    # Backfill from the comma-joined genres columns, keeping any legacy value outside the vocabulary
+    connection = op.get_bind()
+    vocabulary = list(GENRES)
+    for owner_table, association_table, owner_column in GENRE_OWNERS:
+        for row in connection.execute(sa.text('SELECT genres FROM {} WHERE genres IS NOT NULL'.format(owner_table))):
+            for name in row.genres.split(','):
+                if name and name not in vocabulary:
+                    vocabulary.append(name)
+    op.bulk_insert(genre_table, [{'id': genre_id, 'name': name} for genre_id, name in enumerate(vocabulary, 1)])
+    if connection.dialect.name == 'postgresql':
+        op.execute("SELECT setval('genre_id_seq', (SELECT max(id) FROM genre))")
+
+    genre_ids = {name: genre_id for genre_id, name in enumerate(vocabulary, 1)}
+    for owner_table, association_table, owner_column in GENRE_OWNERS:
+        links = []
+        rows = connection.execute(sa.text('SELECT id, genres FROM {} WHERE genres IS NOT NULL'.format(owner_table)))
+        for row in rows:
+            for name in set(row.genres.split(',')):
+                if name:
+                    links.append({owner_column: row.id, 'genre_id': genre_ids[name]})
+        if links:
+            op.bulk_insert(sa.table(association_table, sa.column(owner_column), sa.column('genre_id')), links)
+        drop_genres_column(owner_table)
+
+
+def downgrade():
+    connection = op.get_bind()
+    for owner_table, association_table, owner_column in GENRE_OWNERS:
+        op.add_column(owner_table, sa.Column('genres', sa.String(length=120), nullable=True))
+        rows = connection.execute(sa.text(
+            'SELECT {0}.{1} AS owner_id, genre.name AS name FROM {0} JOIN genre ON genre.id = {0}.genre_id '
+            'ORDER BY {0}.{1}, genre.name'.format(association_table, owner_column)))
+        genres_by_owner = {}
+        for row in rows:
+            genres_by_owner.setdefault(row.owner_id, []).append(row.name)
+        for owner_id, names in genres_by_owner.items():
+            connection.execute(sa.text('UPDATE {} SET genres = :genres WHERE id = :id'.format(owner_table)),
+                               {'genres': ','.join(names), 'id': owner_id})
+        op.drop_index('ix_{}_genre_id_{}'.format(association_table, owner_column), table_name=association_table)
+        op.drop_table(association_table)
+    op.drop_table('genre')
+
+
+def drop_genres_column(table_name):
+    if op.get_bind().dialect.name == 'sqlite':
+        # Native DROP COLUMN (SQLite 3.35+) rather than batch mode, which would recreate the table
+        # and lose the name search triggers
+        op.execute('ALTER TABLE {} DROP COLUMN genres'.format(table_name))
+    else:
+        op.drop_column(table_name, 'genres')
@@ -0,0 +1,48 @@
+"""venue coordinates and spatial index
+
+Revision ID: a7c3e9f1d4b8
+Revises: f3a8d2c6b9e1
+Create Date: 2026-10-18 21:17:46.203958
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9f1d4b8'
+down_revision = 'f3a8d2c6b9e1'
+branch_labels = None
+depends_on = None
+
+POINT = ('SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude '
+         'WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL; ')
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venue', sa.Column('longitude', sa.Float(), nullable=True))
+
+    # No venue has coordinates yet, the index starts empty
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('CREATE VIRTUAL TABLE venue_location USING rtree(id, min_lat, max_lat, min_lon, max_lon)')
+        op.execute('CREATE TRIGGER venue_location_ai AFTER INSERT ON venue BEGIN '
+                   'INSERT INTO venue_location ' + POINT + 'END')
+        op.execute('CREATE TRIGGER venue_location_ad AFTER DELETE ON venue BEGIN '
+                   'DELETE FROM venue_location WHERE id = OLD.id; END')
+        op.execute('CREATE TRIGGER venue_location_au AFTER UPDATE OF latitude, longitude ON venue BEGIN '
+                   'DELETE FROM venue_location WHERE id = OLD.id; INSERT INTO venue_location ' + POINT + 'END')
+    else:
+        op.execute('CREATE INDEX ix_venue_location ON venue USING gist (point(longitude, latitude)) '
+                   'WHERE deleted_at IS NULL')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('venue_location_ai', 'venue_location_ad', 'venue_location_au'):
+            op.execute('DROP TRIGGER IF EXISTS {}'.format(trigger))
+        op.execute('DROP TABLE IF EXISTS venue_location')
+    else:
+        op.execute('DROP INDEX IF EXISTS ix_venue_location')
+    op.drop_column('venue', 'longitude')
+    op.drop_column('venue', 'latitude')
@@ -0,0 +1,56 @@
+"""show surrogate key and start_time indexes
+
+Revision ID: c41d7e8a2b63
+Revises: 7a2e5b0c9d14
+Create Date: 2026-10-18 11:47:09.516320
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e8a2b63'
+down_revision = '7a2e5b0c9d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite cannot change a primary key in place, rebuild the table with ids assigned in start_time order
+        op.execute('CREATE TABLE show_new (id INTEGER NOT NULL PRIMARY KEY, '
+                   'artist_id INTEGER NOT NULL REFERENCES artist (id), '
+                   'venue_id INTEGER NOT NULL REFERENCES venue (id), '
+                   'start_time DATETIME NOT NULL)')
+        op.execute('INSERT INTO show_new (artist_id, venue_id, start_time) '
+                   'SELECT artist_id, venue_id, start_time FROM show ORDER BY start_time')
+        op.execute('DROP TABLE show')
+        op.execute('ALTER TABLE show_new RENAME TO show')
+    else:
+        op.drop_constraint('show_pkey', 'show', type_='primary')
+        op.execute('ALTER TABLE "show" ADD COLUMN id SERIAL PRIMARY KEY')
+
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    # Fails if an artist has played the same venue more than once, which the old key cannot represent
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
+
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('CREATE TABLE show_old (artist_id INTEGER NOT NULL REFERENCES artist (id), '
+                   'venue_id INTEGER NOT NULL REFERENCES venue (id), '
+                   'start_time DATETIME NOT NULL, '
+                   'PRIMARY KEY (artist_id, venue_id))')
+        op.execute('INSERT INTO show_old (artist_id, venue_id, start_time) '
+                   'SELECT artist_id, venue_id, start_time FROM show')
+        op.execute('DROP TABLE show')
+        op.execute('ALTER TABLE show_old RENAME TO show')
+    else:
+        op.drop_column('show', 'id')
+        op.create_primary_key('show_pkey', 'show', ['artist_id', 'venue_id'])
@@ -0,0 +1,36 @@
+"""upcoming show counters
+
+Revision ID: d5f1a9c3e7b2
+Revises: c41d7e8a2b63
+Create Date: 2026-10-18 14:41:52.207315
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f1a9c3e7b2'
+down_revision = 'c41d7e8a2b63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artist', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Initial counts, later kept up to date by the app and the counters refresh command. Show times are
+    # naive local times, compared with the local time of the migration rather than the database clock
+    for table_name, show_fk in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        op.get_bind().execute(sa.text(
+            'UPDATE {0} SET upcoming_shows_count = (SELECT count(*) FROM "show" '
+            'WHERE "show".{1} = {0}.id AND "show".start_time > :now)'.format(table_name, show_fk)),
+            {'now': datetime.now()})
+
+
+def downgrade():
+    op.drop_column('artist', 'upcoming_shows_count')
+    op.drop_column('venue', 'upcoming_shows_count')
@@ -0,0 +1,99 @@
+"""show end_time and double booking checks
+
+Revision ID: e2b7c4f9a1d6
+Revises: d5f1a9c3e7b2
+Create Date: 2026-10-18 16:05:31.842117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7c4f9a1d6'
+down_revision = 'd5f1a9c3e7b2'
+branch_labels = None
+depends_on = None
+
+MAX_MINUTES = 720
+
+# Existing shows last two hours, cut short where the next show of their venue or artist starts, so the
+# history already stored passes the booking checks. Double bookings starting at the same time are reported
+NEXT_STARTS = ('lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_venue_start, '
+               'lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id) AS next_artist_start')
+
+
+# Shows starting at the same time as another show of their venue or artist would be cut to no length at all
+SAME_STARTS = ('SELECT DISTINCT this.id FROM "show" AS this JOIN "show" AS other ON other.id != this.id '
+               'AND other.start_time = this.start_time '
+               'AND (other.venue_id = this.venue_id OR other.artist_id = this.artist_id) ORDER BY this.id')
+
+
+def upgrade():
+    # No end time keeps both shows of a double booking valid, they are reported instead of being given one
+    same_start_ids = [row[0] for row in op.get_bind().execute(sa.text(SAME_STARTS))]
+    if same_start_ids:
+        raise RuntimeError('Shows {} start at the same time as another show of their venue or artist. Move or '
+                           'delete the double bookings, then upgrade again.'
+                           .format(', '.join(str(show_id) for show_id in same_start_ids)))
+
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite cannot add a NOT NULL column without a constant default, rebuild the table. Datetimes are
+        # text, the two hour end keeps the fraction of seconds of its start so the three values compare
+        two_hours = "strftime('%Y-%m-%d %H:%M:%S', start_time, '+120 minutes') || substr(start_time, 20)"
+        op.execute('CREATE TABLE show_new (id INTEGER NOT NULL PRIMARY KEY, '
+                   'artist_id INTEGER NOT NULL REFERENCES artist (id), '
+                   'venue_id INTEGER NOT NULL REFERENCES venue (id), '
+                   'start_time DATETIME NOT NULL, '
+                   'end_time DATETIME NOT NULL)')
+        op.execute('INSERT INTO show_new (id, artist_id, venue_id, start_time, end_time) '
+                   'SELECT id, artist_id, venue_id, start_time, '
+                   'min({0}, coalesce(next_venue_start, {0}), coalesce(next_artist_start, {0})) '
+                   'FROM (SELECT id, artist_id, venue_id, start_time, {1} FROM show)'.format(two_hours, NEXT_STARTS))
+        op.execute('DROP TABLE show')
+        op.execute('ALTER TABLE show_new RENAME TO show')
+        op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+        op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+        op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+        checks = (
+            "SELECT RAISE(ABORT, 'show is longer than {0} minutes') "
+            "WHERE NEW.end_time < NEW.start_time OR datetime(NEW.end_time) > datetime(NEW.start_time, '+{0} minutes'); "
+            .format(MAX_MINUTES))
+        for owner in ('venue', 'artist'):
+            checks += (
+                "SELECT RAISE(ABORT, '{0} is already booked at that time') WHERE EXISTS (SELECT 1 FROM show "
+                "WHERE {0}_id = NEW.{0}_id AND id IS NOT NEW.id AND start_time > datetime(NEW.start_time, '-{1} minutes') "
+                "AND start_time < NEW.end_time AND end_time > NEW.start_time); ".format(owner, MAX_MINUTES))
+        op.execute('CREATE TRIGGER show_booking_bi BEFORE INSERT ON show BEGIN {}END'.format(checks))
+        op.execute('CREATE TRIGGER show_booking_bu BEFORE UPDATE OF venue_id, artist_id, start_time, end_time ON show '
+                   'BEGIN {}END'.format(checks))
+    else:
+        op.add_column('show', sa.Column('end_time', sa.DateTime(), nullable=True))
+        op.execute('UPDATE "show" SET end_time = least(start_time + interval \'2 hours\', next_venue_start, '
+                   'next_artist_start) FROM (SELECT id, {0} FROM "show") AS next_starts '
+                   'WHERE next_starts.id = "show".id'.format(NEXT_STARTS))
+        op.alter_column('show', 'end_time', nullable=False)
+
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute('ALTER TABLE "show" ADD CONSTRAINT ck_show_duration '
+                   "CHECK (end_time >= start_time AND end_time <= start_time + interval '{} minutes')"
+                   .format(MAX_MINUTES))
+        for owner in ('venue', 'artist'):
+            op.execute('ALTER TABLE "show" ADD CONSTRAINT ex_show_{0}_id_booking '
+                       'EXCLUDE USING gist ({0}_id WITH =, tsrange(start_time, end_time) WITH &&)'.format(owner))
+
+    op.create_index('ix_venue_state_city', 'venue', ['state', 'city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_state_city', table_name='venue')
+
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS show_booking_bi')
+        op.execute('DROP TRIGGER IF EXISTS show_booking_bu')
+    else:
+        op.drop_constraint('ex_show_artist_id_booking', 'show')
+        op.drop_constraint('ex_show_venue_id_booking', 'show')
+        op.drop_constraint('ck_show_duration', 'show')
+    op.drop_column('show', 'end_time')
@@ -0,0 +1,66 @@
+"""soft deletion of venues and artists
+
+Revision ID: f3a8d2c6b9e1
+Revises: e2b7c4f9a1d6
+Create Date: 2026-10-18 18:42:09.517305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d2c6b9e1'
+down_revision = 'e2b7c4f9a1d6'
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text('deleted_at IS NULL')
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.add_column('artist', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    # Partial indexes over the rows that are not deleted, (state, city, name) replaces (state, city)
+    op.drop_index('ix_venue_state_city', table_name='venue')
+    op.create_index('ix_venue_live_state_city_name', 'venue', ['state', 'city', 'name'], unique=False,
+                    sqlite_where=LIVE, postgresql_where=LIVE)
+    op.create_index('ix_venue_live_id', 'venue', ['id'], unique=False, sqlite_where=LIVE, postgresql_where=LIVE)
+    op.create_index('ix_artist_live_id', 'artist', ['id'], unique=False, sqlite_where=LIVE, postgresql_where=LIVE)
+    if op.get_bind().dialect.name == 'postgresql':
+        for table_name in ('venue', 'artist'):
+            op.execute('DROP INDEX IF EXISTS ix_{0}_name_trgm'.format(table_name))
+            op.execute('CREATE INDEX ix_{0}_name_trgm ON {0} USING gin (name gin_trgm_ops) '
+                       'WHERE deleted_at IS NULL'.format(table_name))
+
+    op.create_table('deletion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('requested_at', sa.DateTime(), nullable=False),
+    sa.Column('shows_total', sa.Integer(), nullable=True),
+    sa.Column('shows_purged', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'owner_id', name='uq_deletion_kind_owner_id')
+    )
+
+
+def downgrade():
+    # Venues and artists deleted but not purged yet come back
+    op.drop_table('deletion')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        for table_name in ('venue', 'artist'):
+            op.execute('DROP INDEX IF EXISTS ix_{0}_name_trgm'.format(table_name))
+            op.execute('CREATE INDEX ix_{0}_name_trgm ON {0} USING gin (name gin_trgm_ops)'.format(table_name))
+    op.drop_index('ix_artist_live_id', table_name='artist')
+    op.drop_index('ix_venue_live_id', table_name='venue')
+    op.drop_index('ix_venue_live_state_city_name', table_name='venue')
+    op.create_index('ix_venue_state_city', 'venue', ['state', 'city'], unique=False)
+
+    op.drop_column('artist', 'deleted_at')
+    op.drop_column('venue', 'deleted_at')
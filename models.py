@@ -1,28 +1,99 @@
-from app import db
-from forms import *
+import calendar
+import math
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import DDL, and_, case, column, event, exists, func, literal_column, or_, select, table, tuple_, update
+from sqlalchemy.orm import contains_eager, selectinload
+
+from extensions import db
 
 
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
 
+# Genres are normalized into one row per genre name, linked to venues and artists through association
+# tables. The (genre_id, *_id) indexes serve the genre filters on /venues and /artists
+venue_genre = db.Table(
+    'venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_venue_genre_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genre = db.Table(
+    'artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_artist_genre_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), unique=True, nullable=False)
+
+    @staticmethod
+    def from_names(names):
+        # Genre rows for the given names, restricted to the form vocabulary. Rows missing for a
+        # vocabulary name (e.g. a choice added to GENRE_CHOICES after the migration) are created
+        from forms import GENRE_CHOICES
+
+        vocabulary = [name for name, label in GENRE_CHOICES if name in names]
+        genres = Genre.query.filter(Genre.name.in_(vocabulary)).all()
+        existing_names = {genre.name for genre in genres}
+        for name in vocabulary:
+            if name not in existing_names:
+                genre = Genre(name=name)
+                db.session.add(genre)
+                genres.append(genre)
+
+        return genres
+
+
+def live_index(name, *columns):
+    # Partial index over the venues or artists that are not soft-deleted, the only rows listings and searches
+    # read. Queries use it when they filter on deleted_at IS NULL
+    predicate = db.text('deleted_at IS NULL')
+    return db.Index(name, *columns, sqlite_where=predicate, postgresql_where=predicate)
+
+
 class Venue(db.Model):
     __tablename__ = 'venue'
+    # (state, city, name) is the /venues order and serves the area lookups of the availability search, id the
+    # keyset pages of the API
+    __table_args__ = (
+        live_index('ix_venue_live_state_city_name', 'state', 'city', 'name'),
+        live_index('ix_venue_live_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
+    # WGS 84 degrees, from the venue form, the importer or `flask geocode`. Indexed by venue_location_ddl()
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     phone = db.Column(db.String(120), unique=True)
-    genres = db.Column((db.String(120)))
+    genres = db.relationship('Genre', secondary=venue_genre, order_by='Genre.name', lazy=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     is_looking_talent = db.Column(db.Boolean(), default=False)
     seeking_description = db.Column(db.String(250))
+    # Maintained by the Show events and the counters refresh command, see refresh_upcoming_shows_counts()
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set by the delete view, the venue is hidden at once and removed with its shows by `flask deletions purge`
+    deleted_at = db.Column(db.DateTime)
     shows = db.relationship('Show', back_populates='venue', lazy=True)
 
+    @property
+    def genre_names(self):
+        return [genre.name for genre in self.genres]
+
     def future_shows(self):
         upcoming_shows = []
 
@@ -39,37 +110,149 @@ class Venue(db.Model):
                 past_shows.append(show)
         return past_shows
 
+    # The *_with_join helpers split past and upcoming shows in SQL and eager load each show's
+    # artist through the same join, so reading show.artist afterwards costs no extra query
     def future_shows_with_join(self):
-        future_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id == self.id).filter(
-            Show.start_time > datetime.now()).all()
-
-        return future_shows_query
+        return db.session.scalars(owner_shows_statement(Show.venue_id, Show.artist, self.id, upcoming=True)).all()
 
     def past_shows_with_join(self):
-        past_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id == self.id).filter(
-            Show.start_time < datetime.now()).all()
+        return db.session.scalars(owner_shows_statement(Show.venue_id, Show.artist, self.id, upcoming=False)).all()
+
+    @staticmethod
+    def live(venue_id):
+        # The venue unless it does not exist or was deleted
+        return Venue.query.filter_by(id=venue_id, deleted_at=None).first()
+
+    @staticmethod
+    def detail_statement(venue_id):
+        # The venue with its genres loaded up front, for sessions that cannot lazy load (asgi.py)
+        return select(Venue).options(selectinload(Venue.genres)) \
+            .where(Venue.id == venue_id, Venue.deleted_at.is_(None))
 
-        return past_shows_query
+    def detail(self):
+        # Dict shape of the venue page, shared by the HTML view and the JSON API. Past and future shows
+        # come from the join helpers
+        return self.detail_from(self.future_shows_with_join(), self.past_shows_with_join())
+
+    def detail_from(self, venue_future_shows, venue_past_shows):
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "genres": self.genre_names,
+            "address": self.address,
+            "city": self.city,
+            "state": self.state,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "phone": self.phone,
+            "website": self.website_link,
+            "facebook_link": self.facebook_link,
+            "seeking_talent": self.is_looking_talent,
+            "seeking_description": self.seeking_description,
+            "image_link": self.image_link if self.image_link else "",
+            "past_shows_count": len(venue_past_shows),
+            "past_shows": [],
+            "upcoming_shows_count": len(venue_future_shows),
+            "upcoming_shows": [],
+        }
+
+        # show.artist was eager loaded by the join, no per-show query here
+        for show in venue_past_shows:
+            data['past_shows'].append({
+                "show_id": show.id,
+                "artist_id": show.artist_id,
+                "artist_name": show.artist.name,
+                "artist_image_link": show.artist.image_link,
+                "start_time": show.start_time
+            })
+        for show in venue_future_shows:
+            data['upcoming_shows'].append({
+                "show_id": show.id,
+                "artist_id": show.artist_id,
+                "artist_name": show.artist.name,
+                "artist_image_link": show.artist.image_link,
+                "start_time": show.start_time
+            })
+
+        return data
+
+    @staticmethod
+    def with_upcoming_shows_count(genre=None):
+        return db.session.execute(Venue.listing_statement(genre)).all()
+
+    @staticmethod
+    def listing_statement(genre=None):
+        # Every venue with its stored number of upcoming shows, ordered so that venues sharing a city
+        # and state are adjacent and can be grouped into areas in Python
+        statement = select(Venue.id, Venue.name, Venue.city, Venue.state,
+                           Venue.upcoming_shows_count.label('num_upcoming_shows')) \
+            .where(Venue.deleted_at.is_(None))
+        if genre:
+            statement = statement.join(venue_genre, venue_genre.c.venue_id == Venue.id) \
+                .join(Genre, and_(Genre.id == venue_genre.c.genre_id, Genre.name == genre))
+
+        return statement.order_by(Venue.state, Venue.city, Venue.name)
+
+    @staticmethod
+    def page(after_id=None, per_page=100):
+        # Keyset page of venues by id with their upcoming show counts, plus whether a next page exists
+        page_query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state,
+                                      Venue.upcoming_shows_count.label('num_upcoming_shows')) \
+            .filter(Venue.deleted_at.is_(None))
+        if after_id:
+            page_query = page_query.filter(Venue.id > after_id)
+        rows = page_query.order_by(Venue.id).limit(per_page + 1).all()
+
+        return rows[:per_page], len(rows) > per_page
+
+    @staticmethod
+    def search(term):
+        return search_by_name(Venue, term)
+
+    @staticmethod
+    def near_filters(args, default_radius, max_radius):
+        # near_venues_statement() arguments from ?lat=&lon=&radius= query string arguments, the radius in miles.
+        # Raises ValueError on a missing, malformed or out of range value
+        filters = {
+            'latitude': float(args.get('lat', '')),
+            'longitude': float(args.get('lon', '')),
+            'radius': float(args.get('radius') or default_radius),
+        }
+        if not (-90 <= filters['latitude'] <= 90 and -180 <= filters['longitude'] <= 180
+                and 0 < filters['radius'] <= max_radius):
+            raise ValueError('coordinates or radius out of range')
+
+        return filters
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    # id is the /artists order and the keyset order of the API pages
+    __table_args__ = (
+        live_index('ix_artist_live_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120), unique=True)
-    genres = db.Column((db.String(120)))
+    genres = db.relationship('Genre', secondary=artist_genre, order_by='Genre.name', lazy=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     is_looking_venues = db.Column(db.Boolean(), default=False)
     seeking_description = db.Column(db.String(250))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    deleted_at = db.Column(db.DateTime)
     shows = db.relationship('Show', back_populates='artist', lazy=True)
 
+    @property
+    def genre_names(self):
+        return [genre.name for genre in self.genres]
+
     def future_shows(self):
         upcoming_shows = []
 
@@ -86,24 +269,573 @@ class Artist(db.Model):
                 past_shows.append(show)
         return past_shows
 
+    # Same loading strategy as Venue: the show's venue is eager loaded through the join
     def future_shows_with_join(self):
-        future_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id == self.id).filter(
-            Show.start_time > datetime.now()).all()
-
-        return future_shows_query
+        return db.session.scalars(owner_shows_statement(Show.artist_id, Show.venue, self.id, upcoming=True)).all()
 
     def past_shows_with_join(self):
-        past_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id == self.id).filter(
-            Show.start_time < datetime.now()).all()
-        return past_shows_query
+        return db.session.scalars(owner_shows_statement(Show.artist_id, Show.venue, self.id, upcoming=False)).all()
+
+    @staticmethod
+    def live(artist_id):
+        return Artist.query.filter_by(id=artist_id, deleted_at=None).first()
+
+    @staticmethod
+    def detail_statement(artist_id):
+        return select(Artist).options(selectinload(Artist.genres)) \
+            .where(Artist.id == artist_id, Artist.deleted_at.is_(None))
+
+    def detail(self):
+        # Dict shape of the artist page, shared by the HTML view and the JSON API. Past and future shows
+        # come from the join helpers
+        return self.detail_from(self.future_shows_with_join(), self.past_shows_with_join())
+
+    def detail_from(self, artist_future_shows, artist_past_shows):
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "genres": self.genre_names,
+            "city": self.city,
+            "state": self.state,
+            "phone": self.phone,
+            "seeking_venue": self.is_looking_venues,
+            "seeking_description": self.seeking_description,
+            "image_link": self.image_link,
+            "facebook_link": self.facebook_link,
+            "website": self.website_link,
+            "past_shows_count": len(artist_past_shows),
+            "past_shows": [],
+            "upcoming_shows_count": len(artist_future_shows),
+            "upcoming_shows": [],
+        }
+
+        # show.venue was eager loaded by the join, no per-show query here
+        for show in artist_past_shows:
+            data['past_shows'].append({
+                "show_id": show.id,
+                "venue_id": show.venue_id,
+                "venue_name": show.venue.name,
+                "venue_image_link": show.venue.image_link,
+                "start_time": show.start_time
+            })
+        for show in artist_future_shows:
+            data['upcoming_shows'].append({
+                "show_id": show.id,
+                "venue_id": show.venue_id,
+                "venue_name": show.venue.name,
+                "venue_image_link": show.venue.image_link,
+                "start_time": show.start_time
+            })
+
+        return data
+
+    @staticmethod
+    def search(term):
+        return search_by_name(Artist, term)
+
+    @staticmethod
+    def page(after_id=None, per_page=100):
+        # Keyset page of artists by id with their upcoming show counts, plus whether a next page exists
+        page_query = db.session.query(Artist.id, Artist.name, Artist.city, Artist.state,
+                                      Artist.upcoming_shows_count.label('num_upcoming_shows')) \
+            .filter(Artist.deleted_at.is_(None))
+        if after_id:
+            page_query = page_query.filter(Artist.id > after_id)
+        rows = page_query.order_by(Artist.id).limit(per_page + 1).all()
+
+        return rows[:per_page], len(rows) > per_page
+
+    @staticmethod
+    def listing(genre=None):
+        return db.session.execute(Artist.listing_statement(genre)).all()
+
+    @staticmethod
+    def listing_statement(genre=None):
+        statement = select(Artist.id, Artist.name).where(Artist.deleted_at.is_(None))
+        if genre:
+            statement = statement.join(artist_genre, artist_genre.c.artist_id == Artist.id) \
+                .join(Genre, and_(Genre.id == artist_genre.c.genre_id, Genre.name == genre))
+
+        return statement.order_by(Artist.id)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 
+# Shows last DEFAULT_SHOW_DURATION unless booked otherwise, and never longer than MAX_SHOW_DURATION. The
+# bound keeps overlap checks to an index range scan: a show overlapping a slot starts less than
+# MAX_SHOW_DURATION before the slot does
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+MAX_SHOW_DURATION = timedelta(hours=12)
+
+
 class Show(db.Model):
     __tablename__ = 'show'
-    artist_id = db.Column('artist_id', db.Integer, db.ForeignKey('artist.id'), primary_key=True)
-    venue_id = db.Column('venue_id', db.Integer, db.ForeignKey('venue.id'), primary_key=True)
+    # (venue_id, start_time) and (artist_id, start_time) turn the upcoming/past splits of a venue or artist
+    # into index range scans, (start_time, id) serves the /shows keyset ordering
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # active_history keeps the previous venue/artist of a moved show for recount_show_owners()
+    artist_id = db.column_property(db.Column('artist_id', db.Integer, db.ForeignKey('artist.id'), nullable=False),
+                                   active_history=True)
+    venue_id = db.column_property(db.Column('venue_id', db.Integer, db.ForeignKey('venue.id'), nullable=False),
+                                  active_history=True)
     start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
     venue = db.relationship('Venue', back_populates='shows')
     artist = db.relationship('Artist', back_populates='shows')
+
+    @staticmethod
+    def listing_filters(args):
+        # listing_statement() filters from query string arguments: ?upcoming=1&city=&state=&from=&to= with dates
+        # as YYYY-MM-DD and an inclusive end date. Raises ValueError on a malformed date
+        filters = {
+            'upcoming_only': args.get('upcoming') == '1',
+            'city': args.get('city'),
+            'state': args.get('state'),
+        }
+        if args.get('from'):
+            filters['start_date'] = date.fromisoformat(args['from'])
+        if args.get('to'):
+            filters['end_date'] = date.fromisoformat(args['to']) + timedelta(days=1)
+
+        return filters
+
+    @staticmethod
+    def listing_statement(upcoming_only=False, city=None, state=None, start_date=None, end_date=None):
+        # Only the columns pages/shows.html renders, with venue and artist joined in the same query,
+        # ordered by the (start_time, id) key the /shows cursor pages over. Shows of a deleted venue or
+        # artist are left out until they are purged
+        statement = select(Show.id, Show.start_time, Show.end_time, Show.artist_id, Show.venue_id,
+                           Venue.name.label('venue_name'),
+                           Artist.name.label('artist_name'),
+                           Artist.image_link.label('artist_image_link')) \
+            .join(Show.venue).join(Show.artist) \
+            .where(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None))
+
+        if upcoming_only:
+            statement = statement.where(Show.start_time > datetime.now())
+        if city:
+            statement = statement.where(Venue.city == city)
+        if state:
+            statement = statement.where(Venue.state == state)
+        if start_date:
+            statement = statement.where(Show.start_time >= start_date)
+        if end_date:
+            statement = statement.where(Show.start_time < end_date)
+
+        return statement.order_by(Show.start_time, Show.id)
+
+    @staticmethod
+    def encode_cursor(show):
+        return '{}_{}'.format(show.start_time.isoformat(), show.id)
+
+    @staticmethod
+    def decode_cursor(cursor):
+        # Raises ValueError on a malformed cursor
+        start_time, show_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(start_time), int(show_id)
+
+    @staticmethod
+    def listing_page(after=None, per_page=30, **filters):
+        rows = db.session.execute(Show.listing_page_statement(after, per_page, **filters)).all()
+        return rows[:per_page], len(rows) > per_page
+
+    @staticmethod
+    def listing_page_statement(after=None, per_page=30, **filters):
+        # Keyset pagination: seek past the last key of the previous page instead of using OFFSET,
+        # so every page costs the same single query. One extra row tells whether a next page exists
+        statement = Show.listing_statement(**filters)
+        if after:
+            statement = statement.where(tuple_(Show.start_time, Show.id) > tuple_(*after))
+        return statement.limit(per_page + 1)
+
+
+# ----------------------------------------------------------------------------#
+# Show lists.
+# ----------------------------------------------------------------------------#
+
+def owner_shows_statement(show_fk, counterpart, owner_id, upcoming):
+    # Upcoming (soonest first) or past (latest first) shows of one venue or artist, with the counterpart
+    # relationship (Show.artist or Show.venue) eager loaded through the join. Shows with a deleted
+    # counterpart are left out
+    statement = select(Show).join(counterpart).options(contains_eager(counterpart)) \
+        .where(show_fk == owner_id, counterpart.property.mapper.class_.deleted_at.is_(None))
+    if upcoming:
+        return statement.where(Show.start_time > datetime.now()).order_by(Show.start_time)
+    return statement.where(Show.start_time < datetime.now()).order_by(Show.start_time.desc())
+
+
+# ----------------------------------------------------------------------------#
+# Bookings.
+# ----------------------------------------------------------------------------#
+
+def overlapping(start_time, end_time):
+    # Condition on Show matching the shows that overlap [start_time, end_time). The lower start_time bound
+    # makes it a range scan of the (venue_id, start_time) or (artist_id, start_time) index
+    return and_(Show.start_time > start_time - MAX_SHOW_DURATION, Show.start_time < end_time,
+                Show.end_time > start_time)
+
+
+def available_venues_statement(state, start_time, end_time, city=None):
+    # Venues of a state, or of one of its cities, without a show overlapping [start_time, end_time): one
+    # query, an index range scan of venue (state, city, name) with an anti-join probing the show index per venue
+    statement = select(Venue.id, Venue.name, Venue.city, Venue.state, Venue.address) \
+        .where(Venue.state == state, Venue.deleted_at.is_(None)) \
+        .where(~exists().where(Show.venue_id == Venue.id, overlapping(start_time, end_time)))
+    if city:
+        statement = statement.where(Venue.city == city)
+    return statement.order_by(Venue.city, Venue.name)
+
+
+class Bookings(object):
+    # The shows of some venues and artists between two times, loaded with one query, to check many new
+    # bookings against them and against each other in memory. The database rejects overlapping bookings as
+    # well (see show_booking_ddl()), this check names the conflicts before inserting
+
+    def __init__(self, venue_ids, artist_ids, start_time, end_time):
+        self.intervals = {}
+        statement = select(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time).where(
+            or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)), overlapping(start_time, end_time))
+        for show in db.session.execute(statement):
+            self.add(show.venue_id, show.artist_id, show.start_time, show.end_time)
+
+    def add(self, venue_id, artist_id, start_time, end_time):
+        self.intervals.setdefault(('venue', venue_id), []).append((start_time, end_time))
+        self.intervals.setdefault(('artist', artist_id), []).append((start_time, end_time))
+
+    def conflicts(self, venue_id, artist_id, start_time, end_time):
+        # 'venue' and/or 'artist' when either is already booked during [start_time, end_time)
+        return [owner for owner, owner_id in (('venue', venue_id), ('artist', artist_id))
+                if any(start < end_time and end > start_time
+                       for start, end in self.intervals.get((owner, owner_id), ()))]
+
+
+# A recurring booking lists at most MAX_OCCURRENCES shows, two years of weekly shows
+MAX_OCCURRENCES = 104
+
+
+def recurrence(start_time, frequency=None, count=None, until=None):
+    # Start times of a show repeated 'weekly' or 'monthly' (on the same day of the month, the last day of
+    # shorter months), count times or up to the date until, the first show included. At most
+    # MAX_OCCURRENCES unless count says otherwise
+    if not frequency:
+        return [start_time]
+    starts = []
+    while len(starts) < (count or MAX_OCCURRENCES):
+        if frequency == 'weekly':
+            start = start_time + timedelta(weeks=len(starts))
+        else:
+            year, month = divmod(start_time.month - 1 + len(starts), 12)
+            year, month = start_time.year + year, month + 1
+            start = start_time.replace(year=year, month=month,
+                                       day=min(start_time.day, calendar.monthrange(year, month)[1]))
+        if until and start.date() > until:
+            break
+        starts.append(start)
+    return starts
+
+
+def show_booking_ddl():
+    # DDL rejecting shows that overlap another show of their venue or artist, or that last longer than
+    # MAX_SHOW_DURATION. PostgreSQL gets btree_gist exclusion constraints on the show time ranges, SQLite
+    # triggers running the same index range scans as overlapping(). Migration e2b7c4f9a1d6 creates the same
+    # objects on existing databases
+    max_minutes = int(MAX_SHOW_DURATION.total_seconds() // 60)
+    statements = [
+        DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'),
+        DDL('ALTER TABLE "show" ADD CONSTRAINT ck_show_duration '
+            "CHECK (end_time >= start_time AND end_time <= start_time + interval '{} minutes')"
+            .format(max_minutes)).execute_if(dialect='postgresql'),
+    ]
+    for owner in ('venue', 'artist'):
+        statements.append(DDL(
+            'ALTER TABLE "show" ADD CONSTRAINT ex_show_{0}_id_booking '
+            'EXCLUDE USING gist ({0}_id WITH =, tsrange(start_time, end_time) WITH &&)'
+            .format(owner)).execute_if(dialect='postgresql'))
+
+    # Datetimes are stored as text on SQLite, datetime() normalizes both sides of the duration check
+    checks = (
+        "SELECT RAISE(ABORT, 'show is longer than {0} minutes') "
+        "WHERE NEW.end_time < NEW.start_time OR datetime(NEW.end_time) > datetime(NEW.start_time, '+{0} minutes'); "
+        .format(max_minutes))
+    for owner in ('venue', 'artist'):
+        checks += (
+            "SELECT RAISE(ABORT, '{0} is already booked at that time') WHERE EXISTS (SELECT 1 FROM show "
+            "WHERE {0}_id = NEW.{0}_id AND id IS NOT NEW.id AND start_time > datetime(NEW.start_time, '-{1} minutes') "
+            "AND start_time < NEW.end_time AND end_time > NEW.start_time); ".format(owner, max_minutes))
+    statements += [
+        DDL('CREATE TRIGGER show_booking_bi BEFORE INSERT ON show BEGIN {}END'.format(checks))
+        .execute_if(dialect='sqlite'),
+        DDL('CREATE TRIGGER show_booking_bu BEFORE UPDATE OF venue_id, artist_id, start_time, end_time ON show '
+            'BEGIN {}END'.format(checks)).execute_if(dialect='sqlite'),
+    ]
+    return statements
+
+
+for statement in show_booking_ddl():
+    event.listen(Show.__table__, 'after_create', statement)
+
+
+# ----------------------------------------------------------------------------#
+# Calendars.
+# ----------------------------------------------------------------------------#
+
+def calendar_days_statement(show_fk, owner_id, start_time, end_time):
+    # (day, shows_count, first_start_time) of each day with shows of one venue or artist in [start_time,
+    # end_time), counted by the database from a range scan of its (owner, start_time) index. Shows of a
+    # deleted venue or artist are not counted
+    day = func.date(Show.start_time, type_=db.Date)
+    return select(day.label('day'), func.count().label('shows_count'),
+                  func.min(Show.start_time).label('first_start_time')) \
+        .join(Show.artist).join(Show.venue) \
+        .where(show_fk == owner_id, Show.start_time >= start_time, Show.start_time < end_time,
+               Venue.deleted_at.is_(None), Artist.deleted_at.is_(None)) \
+        .group_by(day).order_by(day)
+
+
+def calendar_events_statement(show_fk, owner_id, start_time, end_time):
+    # The shows of one venue or artist starting in [start_time, end_time), with both names and the venue
+    # address, for the iCalendar feeds
+    return select(Show.id, Show.start_time, Show.end_time, Show.venue_id, Show.artist_id,
+                  Artist.name.label('artist_name'), Venue.name.label('venue_name'),
+                  Venue.address, Venue.city, Venue.state) \
+        .join(Show.artist).join(Show.venue) \
+        .where(show_fk == owner_id, Show.start_time >= start_time, Show.start_time < end_time,
+               Venue.deleted_at.is_(None), Artist.deleted_at.is_(None)) \
+        .order_by(Show.start_time, Show.id)
+
+
+# ----------------------------------------------------------------------------#
+# Venue locations.
+# ----------------------------------------------------------------------------#
+
+# Miles per degree of latitude, and per degree of longitude at the equator
+MILES_PER_DEGREE = 69.09
+
+
+def near_venues_statement(latitude, longitude, radius, limit=50):
+    # Venues within radius miles of (latitude, longitude), nearest first, with their stored number of upcoming
+    # shows and their distance_squared in square miles, in one query. The spatial index of the dialect narrows
+    # the venues down to the bounding box of the circle, distances are computed for those only, on a flat
+    # projection around the center: within a few hundred miles they are off by well under 1%. Boxes are not
+    # wrapped around the antimeridian
+    miles_per_lon_degree = MILES_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+    south, north = latitude - radius / MILES_PER_DEGREE, latitude + radius / MILES_PER_DEGREE
+    west, east = longitude - radius / miles_per_lon_degree, longitude + radius / miles_per_lon_degree
+    north_south = (Venue.latitude - latitude) * MILES_PER_DEGREE
+    east_west = (Venue.longitude - longitude) * miles_per_lon_degree
+    distance_squared = north_south * north_south + east_west * east_west
+
+    statement = select(Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.latitude,
+                       Venue.longitude, Venue.upcoming_shows_count.label('num_upcoming_shows'),
+                       distance_squared.label('distance_squared')) \
+        .where(Venue.deleted_at.is_(None))
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        # Range query on the R*Tree, joined back to the venues by id
+        location = table('venue_location', column('id'), column('min_lat'), column('max_lat'),
+                         column('min_lon'), column('max_lon'))
+        statement = statement.join(location, location.c.id == Venue.id) \
+            .where(location.c.max_lat >= south, location.c.min_lat <= north,
+                   location.c.max_lon >= west, location.c.min_lon <= east)
+    elif dialect == 'postgresql':
+        # Box containment, answered from the GiST index on point(longitude, latitude)
+        statement = statement.where(func.point(Venue.longitude, Venue.latitude)
+                                    .op('<@')(func.box(func.point(west, south), func.point(east, north))))
+    else:
+        statement = statement.where(Venue.latitude.between(south, north), Venue.longitude.between(west, east))
+
+    return statement.where(distance_squared <= radius * radius).order_by(distance_squared, Venue.id).limit(limit)
+
+
+def venue_location_ddl():
+    # DDL creating the spatial index of the venue coordinates. PostgreSQL gets a GiST index on the built-in
+    # point type, no PostGIS needed for boxes and plain distances. SQLite gets an R*Tree virtual table kept in
+    # step with the venue table by triggers, holding the venues that have coordinates. Migration
+    # a7c3e9f1d4b8 creates the same objects on existing databases
+    point = "SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude " \
+            "WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL; "
+    return [
+        DDL('CREATE INDEX ix_venue_location ON venue USING gist (point(longitude, latitude)) '
+            'WHERE deleted_at IS NULL').execute_if(dialect='postgresql'),
+        DDL('CREATE VIRTUAL TABLE venue_location USING rtree(id, min_lat, max_lat, min_lon, max_lon)')
+        .execute_if(dialect='sqlite'),
+        DDL('CREATE TRIGGER venue_location_ai AFTER INSERT ON venue BEGIN '
+            'INSERT INTO venue_location ' + point + 'END').execute_if(dialect='sqlite'),
+        DDL('CREATE TRIGGER venue_location_ad AFTER DELETE ON venue BEGIN '
+            'DELETE FROM venue_location WHERE id = OLD.id; END').execute_if(dialect='sqlite'),
+        DDL('CREATE TRIGGER venue_location_au AFTER UPDATE OF latitude, longitude ON venue BEGIN '
+            'DELETE FROM venue_location WHERE id = OLD.id; INSERT INTO venue_location ' + point + 'END')
+        .execute_if(dialect='sqlite'),
+    ]
+
+
+for statement in venue_location_ddl():
+    event.listen(Venue.__table__, 'after_create', statement)
+event.listen(Venue.__table__, 'after_drop',
+             DDL('DROP TABLE IF EXISTS venue_location').execute_if(dialect='sqlite'))
+
+
+# ----------------------------------------------------------------------------#
+# Upcoming show counts.
+# ----------------------------------------------------------------------------#
+
+def live_counterpart(model):
+    # A show counts for its venue while its artist is not deleted, and for its artist while its venue is not
+    counterpart, counterpart_fk = (Artist, Show.artist_id) if model is Venue else (Venue, Show.venue_id)
+    return exists().where(counterpart.id == counterpart_fk, counterpart.deleted_at.is_(None))
+
+
+def upcoming_shows_counts_since(model, show_fk, since, now):
+    # Query of (id, stored count, shows starting after since, shows starting after now) per row of model,
+    # counted by an outer join on the model's shows starting after since
+    return db.session.query(model.id, model.upcoming_shows_count, func.count(Show.start_time),
+                            func.count(case((Show.start_time > now, Show.start_time)))) \
+        .outerjoin(Show, and_(show_fk == model.id, Show.start_time > since, live_counterpart(model))) \
+        .group_by(model.id)
+
+
+# The upcoming_shows_count columns of Venue and Artist are a read model of the show table. Adding or removing
+# a show through the ORM recounts its venue and artist (see the Show events below), bulk loads recount the
+# rows they touched, and the scheduled counters refresh command recounts the owners of shows that have
+# started since its last runs
+
+def refresh_upcoming_shows_counts(model, show_fk, ids=None):
+    # UPDATE statement recounting upcoming_shows_count for the given ids of model, every row when ids is
+    # None. Each count is a correlated range scan of the (*_id, start_time) index, probing the primary key of
+    # the counterpart of each show for a deletion
+    upcoming_shows_count = select(func.count()).select_from(Show.__table__) \
+        .where(show_fk == model.id, Show.start_time > datetime.now(), live_counterpart(model)) \
+        .scalar_subquery()
+    statement = update(model).values(upcoming_shows_count=upcoming_shows_count)
+    if ids is not None:
+        statement = statement.where(model.id.in_(ids))
+    return statement.execution_options(synchronize_session=False)
+
+
+def recount_show_owners(mapper, connection, show):
+    # Recounts the venue and artist of a show inserted, deleted or moved in this flush, including the ones
+    # it was moved away from
+    state = db.inspect(show)
+    venue_ids = {show.venue_id, *state.attrs.venue_id.history.deleted} - {None}
+    artist_ids = {show.artist_id, *state.attrs.artist_id.history.deleted} - {None}
+    connection.execute(refresh_upcoming_shows_counts(Venue, Show.venue_id, venue_ids))
+    connection.execute(refresh_upcoming_shows_counts(Artist, Show.artist_id, artist_ids))
+
+
+for show_event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Show, show_event, recount_show_owners)
+
+
+# ----------------------------------------------------------------------------#
+# Deletions.
+# ----------------------------------------------------------------------------#
+
+class Deletion(db.Model):
+    # A venue or artist soft-deleted by its delete view, and the progress of `flask deletions purge` removing
+    # its shows in batches. The row is kept once the purge has finished
+    __tablename__ = 'deletion'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'owner_id', name='uq_deletion_kind_owner_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # 'venue' or 'artist', and its id
+    kind = db.Column(db.String(10), nullable=False)
+    owner_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String, nullable=False)
+    requested_at = db.Column(db.DateTime, nullable=False)
+    # Shows left when the purge started, and the ones deleted so far
+    shows_total = db.Column(db.Integer)
+    shows_purged = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @staticmethod
+    def request(kind, owner):
+        # Hides owner (a Venue or an Artist) from every listing and queues its purge, in the caller's transaction.
+        # Its upcoming shows stop counting for the artists or venues they book, which are recounted at once.
+        # The row keeps its unique name until the purge deletes it
+        owner.deleted_at = datetime.now()
+        deletion = Deletion(kind=kind, owner_id=owner.id, name=owner.name, requested_at=owner.deleted_at)
+        db.session.add(deletion)
+        db.session.flush()
+        counterpart, show_fk, counterpart_fk = (Artist, Show.venue_id, Show.artist_id) if kind == 'venue' else \
+            (Venue, Show.artist_id, Show.venue_id)
+        db.session.execute(refresh_upcoming_shows_counts(counterpart, counterpart_fk, select(counterpart_fk).where(
+            show_fk == owner.id, Show.start_time > owner.deleted_at)))
+        return deletion
+
+
+# ----------------------------------------------------------------------------#
+# Name search.
+# ----------------------------------------------------------------------------#
+
+# Trigram tokens need at least three characters, shorter terms fall back to a plain LIKE scan
+MIN_INDEXED_SEARCH_TERM = 3
+
+
+def search_by_name(model, term):
+    return db.session.execute(search_statement(model, term)).all()
+
+
+def search_statement(model, term):
+    # Partial, case-insensitive name search served by the name search index of the dialect, ranked
+    # by similarity, with each match's stored number of upcoming shows. Deleted rows are left out
+    statement = select(model.id, model.name, model.upcoming_shows_count.label('num_upcoming_shows')) \
+        .where(model.deleted_at.is_(None))
+    if not term:
+        return statement.order_by(model.name)
+
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        # ILIKE is answered from the partial pg_trgm GIN index, similarity() ranks the matches
+        statement = statement.where(model.name.ilike('%' + term + '%')) \
+            .order_by(func.similarity(model.name, term).desc(), model.name)
+    elif dialect == 'sqlite' and len(term) >= MIN_INDEXED_SEARCH_TERM:
+        # MATCH on the FTS5 trigram table, bm25 rank orders the matches (lower is better)
+        fts_name = model.__tablename__ + '_name_fts'
+        fts = table(fts_name, literal_column('rowid'))
+        statement = statement.join(fts, literal_column(fts_name + '.rowid') == model.id) \
+            .where(literal_column(fts_name).op('MATCH')('"' + term.replace('"', '""') + '"')) \
+            .order_by(literal_column(fts_name + '.rank'), model.name)
+    else:
+        statement = statement.where(model.name.ilike('%' + term + '%')).order_by(model.name)
+
+    return statement
+
+
+def name_search_index_ddl(table_name):
+    # DDL creating the name search index of a table on the dialect it applies to. The same statements
+    # are issued by the migrations that add the indexes to existing databases. The trigram index leaves out
+    # deleted rows, the FTS5 table holds every name and deleted rows are filtered after the MATCH
+    fts_name = table_name + '_name_fts'
+    return [
+        DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+        DDL('CREATE INDEX IF NOT EXISTS ix_{0}_name_trgm ON {0} USING gin (name gin_trgm_ops) '
+            'WHERE deleted_at IS NULL'.format(table_name)).execute_if(dialect='postgresql'),
+        DDL("CREATE VIRTUAL TABLE {1} USING fts5(name, content='{0}', content_rowid='id', tokenize='trigram')"
+            .format(table_name, fts_name)).execute_if(dialect='sqlite'),
+        DDL('CREATE TRIGGER {1}_ai AFTER INSERT ON {0} BEGIN '
+            'INSERT INTO {1}(rowid, name) VALUES (new.id, new.name); END'
+            .format(table_name, fts_name)).execute_if(dialect='sqlite'),
+        DDL("CREATE TRIGGER {1}_ad AFTER DELETE ON {0} BEGIN "
+            "INSERT INTO {1}({1}, rowid, name) VALUES ('delete', old.id, old.name); END"
+            .format(table_name, fts_name)).execute_if(dialect='sqlite'),
+        DDL("CREATE TRIGGER {1}_au AFTER UPDATE OF name ON {0} BEGIN "
+            "INSERT INTO {1}({1}, rowid, name) VALUES ('delete', old.id, old.name); "
+            "INSERT INTO {1}(rowid, name) VALUES (new.id, new.name); END"
+            .format(table_name, fts_name)).execute_if(dialect='sqlite'),
+    ]
+
+
+for searchable in (Venue, Artist):
+    for statement in name_search_index_ddl(searchable.__tablename__):
+        event.listen(searchable.__table__, 'after_create', statement)
+    event.listen(searchable.__table__, 'after_drop',
+                 DDL('DROP TABLE IF EXISTS {}_name_fts'.format(searchable.__tablename__)).execute_if(dialect='sqlite'))
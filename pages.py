@@ -0,0 +1,45 @@
+from flask import Blueprint, render_template, request
+
+pages = Blueprint('pages', __name__)
+
+
+# ----------------------------------------------------------------------------#
+# Page rendering.
+# ----------------------------------------------------------------------------#
+
+# The read-only pages are rendered from query results by helpers shared by the blueprint views and the
+# async views of asgi.py, which fetch the same rows through an async engine
+
+def render_search(template, search_rows):
+    response = {
+        'count': len(search_rows),
+        'data': []
+    }
+
+    for row in search_rows:
+        response['data'].append({
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows
+        })
+
+    return render_template(template, results=response, search_term=request.form.get('search_term', ''))
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+@pages.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+@pages.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@pages.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
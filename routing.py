@@ -0,0 +1,79 @@
+import inspect
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+PRIMARY_COOKIE = 'read_primary_until'
+
+
+class RoutingSession(Session):
+    # db.session class sending the statements of replica-read views to the replica bind. Flushes and every
+    # other request keep the primary
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('read_replica'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter(object):
+    # Routes the views decorated with reads() to the replica bind when one is configured. Goes above
+    # response_cache.cached, whose cache fills read from the primary. A commit made while serving a request
+    # pins that browser to the primary for REPLICA_STICKY_SECONDS with a cookie, so the page it is
+    # redirected to shows the change even if the replica lags behind
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.sticky_seconds = 10
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {})
+        if not self.enabled:
+            return
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 10)
+
+        event.listen(RoutingSession, 'after_commit', self.after_commit)
+        app.after_request(self.pin_to_primary)
+
+    def reads(self, view):
+        # Also wraps the coroutine views of asgi.py, which pick their async engine from the same flag
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_replica_view(*args, **kwargs):
+                self.route_reads()
+                return await view(*args, **kwargs)
+
+            return async_replica_view
+
+        @wraps(view)
+        def replica_view(*args, **kwargs):
+            self.route_reads()
+            return view(*args, **kwargs)
+
+        return replica_view
+
+    def route_reads(self):
+        if self.enabled and request.cookies.get(PRIMARY_COOKIE, type=float, default=0) <= time.time():
+            g.read_replica = True
+
+    @staticmethod
+    def after_commit(session):
+        if has_request_context():
+            g.committed = True
+
+    def pin_to_primary(self, response):
+        if g.get('committed'):
+            response.set_cookie(PRIMARY_COOKIE, str(time.time() + self.sticky_seconds),
+                                max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+replica_router = ReplicaRouter()
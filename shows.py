@@ -0,0 +1,148 @@
+import sys
+from datetime import timedelta
+
+from flask import (Blueprint, Response, abort, current_app, flash, render_template, request,
+                   stream_with_context, url_for)
+from sqlalchemy import insert
+
+from cache import response_cache
+from exporter import MIMETYPES, SHOW_COLUMNS, export_lines
+from extensions import db
+from models import Artist, Bookings, Show, Venue, recurrence, refresh_upcoming_shows_counts
+from routing import replica_router
+
+shows = Blueprint('shows', __name__)
+
+
+# ----------------------------------------------------------------------------#
+# Page rendering.
+# ----------------------------------------------------------------------------#
+
+def shows_listing_args():
+    # (filters, cursor) of a /shows request, a malformed date or cursor is a 400
+    try:
+        filters = Show.listing_filters(request.args)
+        after = Show.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        abort(400)
+    return filters, after
+
+
+def render_shows(page, has_next):
+    data = []
+    for show in page:
+        data.append({
+            "show_id": show.id,
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time
+        })
+
+    next_url = None
+    if has_next:
+        next_args = request.args.to_dict()
+        next_args['cursor'] = Show.encode_cursor(page[-1])
+        next_url = url_for('shows.index', **next_args)
+
+    return render_template('pages/shows.html', shows=data, next_url=next_url)
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+@shows.route('/shows')
+@replica_router.reads
+def index():
+    # displays list of shows at /shows, one page per request keyed by the last show of the previous page
+    filters, after = shows_listing_args()
+    return render_shows(*Show.listing_page(after=after, per_page=current_app.config['SHOWS_PER_PAGE'], **filters))
+
+
+@shows.route('/shows.<any(csv, jsonl):file_format>')
+@replica_router.reads
+def export(file_format):
+    # the whole filtered show history as a download, streamed from the database as it is written
+    try:
+        filters = Show.listing_filters(request.args)
+    except ValueError:
+        abort(400)
+
+    lines = export_lines(Show.listing_statement(**filters), SHOW_COLUMNS, file_format)
+    return Response(stream_with_context(lines), mimetype=MIMETYPES[file_format],
+                    headers={'Content-Disposition': 'attachment; filename=shows.' + file_format})
+
+
+@shows.route('/shows/create')
+def create_form():
+    from forms import ShowForm
+
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@shows.route('/shows/create', methods=['POST'])
+def create_submission():
+    from forms import ShowForm
+
+    # called to create new shows in the db, upon submitting new show listing form
+    # TODO: insert form data as a new Show record in the db, instead
+    form = ShowForm(request.form)
+    if not form.validate():
+        return render_template('forms/new_show.html', form=form)
+    try:
+        artist_id = int(form.artist_id.data)
+        venue_id = int(form.venue_id.data)
+        duration = timedelta(minutes=form.duration.data)
+        starts = recurrence(form.start_time.data, form.repeat.data, form.repeat_count.data, form.repeat_until.data)
+        # Deleted venues and artists take no new bookings while their shows are purged
+        if Venue.live(venue_id) is None or Artist.live(artist_id) is None:
+            raise LookupError('no venue {} or artist {}'.format(venue_id, artist_id))
+
+        # Every show of the series is checked against the venue and artist bookings of the whole season,
+        # loaded with one query, and against the other shows of the series
+        bookings = Bookings({venue_id}, {artist_id}, starts[0], starts[-1] + duration)
+        records, conflicts = [], []
+        for start_time in starts:
+            record = {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time,
+                      'end_time': start_time + duration}
+            booked = bookings.conflicts(**record)
+            if booked:
+                conflicts.append((start_time, booked))
+            else:
+                bookings.add(**record)
+                records.append(record)
+        if not records or (conflicts and not form.skip_conflicts.data):
+            return render_template('forms/new_show.html', form=form, conflicts=conflicts, occurrences=len(starts))
+
+        # One bulk INSERT in one transaction. Bulk inserts skip the Show events, the venue and the artist are
+        # recounted once
+        db.session.execute(insert(Show), records)
+        db.session.execute(refresh_upcoming_shows_counts(Venue, Show.venue_id, {venue_id}))
+        db.session.execute(refresh_upcoming_shows_counts(Artist, Show.artist_id, {artist_id}))
+        db.session.commit()
+        response_cache.invalidate('venues', 'venue:{}'.format(venue_id), 'artist:{}'.format(artist_id))
+        if len(records) == 1:
+            flash('Show was successfully listed!')
+        else:
+            flash('{} shows were successfully listed!'.format(len(records)))
+        if conflicts:
+            flash('Skipped the dates already booked: {}'.format(
+                ', '.join(start_time.strftime('%Y-%m-%d %H:%M') for start_time, booked in conflicts)))
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash('An error occurred. Show could not be listed.')
+
+    finally:
+        db.session.close()
+    # on successful db insert, flash success
+
+    # TODO: on unsuccessful db insert, flash an error instead.
+    # e.g.,
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    return render_template('pages/home.html')
@@ -0,0 +1,264 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+import click
+from flask.cli import FlaskGroup
+from sqlalchemy import literal, select, union_all
+
+from extensions import db
+
+# Names are found by the prefix of any of their first MAX_WORDS words
+MAX_WORDS = 4
+
+# Prefixes matching more keys than this (the short ones) keep their ranked matches until the index changes
+RANKED_CACHE_KEYS = 256
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())
+
+
+def index_keys(text):
+    # The whole normalized name and its tails starting at each following word: 'the wild sax band',
+    # 'wild sax band', 'sax band', ...
+    name = normalize(text)
+    keys = [name] if name else []
+    position = name.find(' ')
+    while position != -1 and len(keys) < MAX_WORDS:
+        keys.append(name[position + 1:])
+        position = name.find(' ', position + 1)
+    return keys
+
+
+def serving():
+    # Whether create_app() is called to serve requests: by a WSGI or ASGI server or `flask run`, and not
+    # by another flask command such as `flask db`
+    context = click.get_current_context(silent=True)
+    if context is None or not isinstance(context.find_root().command, FlaskGroup):
+        return True
+    return context.info_name == 'run'
+
+
+class SuggestIndex(object):
+    # In-memory typeahead over venue names, artist names and cities, one per process. The index keys are
+    # kept sorted next to the entry each one points to, so a prefix is two bisections and a short walk
+    # away, without the database. Loaded in the background when the app is served, kept current by the
+    # create, edit and delete views of this process, and reloaded every SUGGEST_RELOAD_SECONDS for the others
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_names = 0
+        self.max_limit = 50
+        self.reload_seconds = 0
+        # Entries are (kind, id, name, (city, state), upcoming shows) tuples, ('city', None, city, (city, state),
+        # 0) for cities
+        self.keys = []
+        self.entries = []
+        # kind -> id -> entry of each indexed venue and artist
+        self.names = {'venue': {}, 'artist': {}}
+        # (city, state) -> [entry, number of venues and artists there]
+        self.cities = {}
+        # prefix -> its best max_limit entries, for the prefixes matching more than RANKED_CACHE_KEYS keys
+        self.ranked = {}
+        self.loaded_at = None
+        self.reloading = False
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_names = app.config.get('SUGGEST_MAX_NAMES', 100000)
+        self.max_limit = app.config.get('SUGGEST_MAX_LIMIT', 50)
+        self.reload_seconds = app.config.get('SUGGEST_RELOAD_SECONDS', 300)
+        if app.config.get('SUGGEST_PRELOAD', True) and serving():
+            # Held until the load is over, so that the first requests wait for it instead of loading again
+            self.load_lock.acquire()
+            self.reloading = True
+            threading.Thread(target=self.preload, daemon=True).start()
+
+    # ------------------------------------------------------------------------#
+    # Queries.
+    # ------------------------------------------------------------------------#
+
+    def suggest(self, text, limit=10):
+        # The limit best venues, artists and cities with a word starting with text: the names equal to text,
+        # then the names starting with it, then the names with a later word starting with it, each group by
+        # upcoming shows, most first, then by name
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        self.ensure_loaded()
+        with self.lock:
+            found = self.ranked.get(prefix)
+            if found is None or limit > self.max_limit:
+                found = self.rank(prefix, max(limit, self.max_limit))
+        found = found[:limit]
+
+        return [{'type': kind, 'id': entry_id, 'name': name} if kind != 'city' else
+                {'type': kind, 'name': name, 'state': area[1]} for kind, entry_id, name, area, shows in found]
+
+    def rank(self, prefix, limit):
+        # The best limit entries with a key starting with prefix, called with the lock held
+        ranks = {}
+        start = position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            key, entry = self.keys[position], self.entries[position]
+            name = normalize(entry[2])
+            rank = (0 if name == prefix else 1 if name == key else 2, -entry[4], name)
+            if entry not in ranks or rank < ranks[entry]:
+                ranks[entry] = rank
+            position += 1
+        found = heapq.nsmallest(limit, ranks, key=ranks.get)
+        if position - start > RANKED_CACHE_KEYS:
+            self.ranked[prefix] = found
+        return found
+
+    def __len__(self):
+        return len(self.names['venue']) + len(self.names['artist'])
+
+    def ensure_loaded(self):
+        if self.loaded_at is None:
+            with self.load_lock:
+                if self.loaded_at is None:
+                    self.load()
+        elif time.monotonic() - self.loaded_at > self.reload_seconds and not self.reloading:
+            self.reloading = True
+            threading.Thread(target=self.reload, daemon=True).start()
+
+    # ------------------------------------------------------------------------#
+    # Loading.
+    # ------------------------------------------------------------------------#
+
+    def preload(self):
+        try:
+            self.reload()
+        except Exception:
+            # Left to the first request, e.g. while the database is not migrated yet
+            self.app.logger.exception('The typeahead index could not be loaded at startup')
+        finally:
+            self.load_lock.release()
+
+    def reload(self):
+        try:
+            with self.app.app_context():
+                self.load()
+                db.session.remove()
+        finally:
+            self.reloading = False
+
+    def load(self):
+        self.build(self.rows())
+
+    def rows(self):
+        # (kind, id, name, city, state, upcoming shows) of the venues and artists together, the most booked
+        # first so the least booked of either kind are left out when there are more than SUGGEST_MAX_NAMES
+        from models import Artist, Venue
+
+        kinds = union_all(*[
+            select(literal(kind).label('kind'), model.id, model.name, model.city, model.state,
+                   model.upcoming_shows_count.label('shows')).where(model.deleted_at.is_(None))
+            for kind, model in (('venue', Venue), ('artist', Artist))
+        ]).subquery()
+        statement = select(kinds).order_by(kinds.c.shows.desc(), kinds.c.kind, kinds.c.id).limit(self.max_names)
+        for row in db.session.execute(statement):
+            yield row.kind, row.id, row.name, row.city, row.state, row.shows
+
+    def build(self, rows):
+        # Builds the whole index aside from (kind, id, name, city, state, upcoming shows) rows, sorted once, and
+        # swaps it in. Views of this process committing while a reload runs may be missed until the next one
+        names, cities = {'venue': {}, 'artist': {}}, {}
+        count = 0
+        for kind, entry_id, name, city, state, shows in rows:
+            if count >= self.max_names:
+                break
+            names[kind][entry_id] = (kind, entry_id, name, self.count_area(cities, city, state), shows or 0)
+            count += 1
+
+        pairs = [(key, entry) for kind in names for entry in names[kind].values() for key in index_keys(entry[2])]
+        pairs += [(key, entry) for entry, owners in cities.values() for key in index_keys(entry[2])]
+        pairs.sort(key=lambda pair: pair[0])
+        with self.lock:
+            self.keys = [key for key, entry in pairs]
+            self.entries = [entry for key, entry in pairs]
+            self.names, self.cities = names, cities
+            self.ranked = {}
+            self.loaded_at = time.monotonic()
+
+    # ------------------------------------------------------------------------#
+    # Incremental updates.
+    # ------------------------------------------------------------------------#
+
+    def put(self, kind, entry_id, name, city, state):
+        # Adds or renames a venue or artist after its creation or edit was committed, an edit keeps the
+        # upcoming shows count it was loaded with
+        if self.loaded_at is None:
+            return
+        with self.lock:
+            if entry_id not in self.names[kind] and len(self) >= self.max_names:
+                return
+            shows = self.names[kind][entry_id][4] if entry_id in self.names[kind] else 0
+            self.discard(kind, entry_id)
+            cities_count = len(self.cities)
+            entry = (kind, entry_id, name, self.count_area(self.cities, city, state), shows)
+            self.names[kind][entry_id] = entry
+            self.insert(entry)
+            if len(self.cities) > cities_count:
+                self.insert(self.cities[entry[3]][0])
+
+    def remove(self, kind, entry_id):
+        if self.loaded_at is None:
+            return
+        with self.lock:
+            self.discard(kind, entry_id)
+
+    def discard(self, kind, entry_id):
+        entry = self.names[kind].pop(entry_id, None)
+        if entry is None:
+            return
+        self.delete(entry)
+        if entry[3] is not None:
+            self.cities[entry[3]][1] -= 1
+            if not self.cities[entry[3]][1]:
+                self.delete(self.cities.pop(entry[3])[0])
+
+    @staticmethod
+    def count_area(cities, city, state):
+        # One more venue or artist in (city, state), returns the (city, state) tuple shared by their entries
+        if not city:
+            return None
+        indexed = cities.get((city, state))
+        if indexed is None:
+            area = (city, state)
+            indexed = cities[area] = [('city', None, city, area, 0), 0]
+        indexed[1] += 1
+        return indexed[0][3]
+
+    def insert(self, entry):
+        for key in index_keys(entry[2]):
+            self.forget(key)
+            position = bisect_left(self.keys, key)
+            self.keys.insert(position, key)
+            self.entries.insert(position, entry)
+
+    def delete(self, entry):
+        for key in index_keys(entry[2]):
+            self.forget(key)
+            position = bisect_left(self.keys, key)
+            while position < len(self.keys) and self.keys[position] == key:
+                if self.entries[position] is entry:
+                    del self.keys[position]
+                    del self.entries[position]
+                    break
+                position += 1
+
+    def forget(self, key):
+        # Drops the ranked matches of the prefixes of a key added or removed
+        for end in range(1, len(key) + 1):
+            self.ranked.pop(key[:end], None)
+
+
+suggestions = SuggestIndex()
@@ -0,0 +1,83 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import MemoryBackend
+
+
+# ----------------------------------------------------------------------------#
+# Fragment cache.
+# ----------------------------------------------------------------------------#
+
+class FragmentCacheExtension(Extension):
+    # {% cache key, ... %}...{% endcache %} renders its body once per key and template and serves the stored
+    # HTML afterwards. Keys must cover everything the body renders, entries are never invalidated and only
+    # leave the per-process LRU when it is full:
+    #
+    #     {% cache show.show_id, show.start_time, show.artist_name, show.artist_image_link %}
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super(FragmentCacheExtension, self).__init__(environment)
+        environment.extend(fragment_cache=MemoryBackend(10000))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [nodes.Const(parser.name)]
+        while parser.stream.current.type != 'block_end':
+            if len(key) > 1:
+                parser.stream.expect('comma')
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('cached_fragment', [nodes.List(key)]), [], [], body) \
+            .set_lineno(lineno)
+
+    def cached_fragment(self, key, caller):
+        # ASCII unit separator between the parts, it does not occur in names or links
+        key = '\x1f'.join(str(part) for part in key)
+        fragment = self.environment.fragment_cache.get(key)
+        if fragment is None:
+            fragment = Markup(caller())
+            self.environment.fragment_cache.set(key, fragment, float('inf'))
+        return fragment
+
+
+# ----------------------------------------------------------------------------#
+# Template setup.
+# ----------------------------------------------------------------------------#
+
+class Templating(object):
+    # Compiled templates are written to a bytecode cache shared by every worker and the next deploy's cold
+    # start, and every page template is compiled at startup instead of on its first request
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        environment = app.jinja_env
+        environment.add_extension(FragmentCacheExtension)
+        environment.fragment_cache.max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000)
+
+        directory = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            environment.bytecode_cache = FileSystemBytecodeCache(directory)
+        if app.config.get('TEMPLATE_WARMUP', True):
+            self.warm_up(app)
+
+    @staticmethod
+    def warm_up(app):
+        # Loads every template into the environment's template cache, from the bytecode cache when it is
+        # current and by compiling it otherwise
+        environment = app.jinja_env
+        names = environment.list_templates(filter_func=lambda name: name.endswith('.html'))
+        for name in names:
+            environment.get_template(name)
+        return names
+
+
+templating = Templating()
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app modules live at the repository root, and config.py reads DATABASE_URL when it is first imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WORK_DIR = tempfile.mkdtemp(prefix='fyyur-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'fyyur.db')
+
+
+class TestConfig(object):
+    # config.py with the response cache off and its files in the temporary directory, no CSRF tokens and no
+    # typeahead index loaded before the tables exist
+    def __init__(self):
+        import config
+
+        for name in dir(config):
+            if name.isupper():
+                setattr(self, name, getattr(config, name))
+        self.RESPONSE_CACHE_ENABLED = False
+        self.RESPONSE_CACHE_DIR = os.path.join(WORK_DIR, 'cache')
+        self.TEMPLATE_BYTECODE_CACHE_DIR = os.path.join(WORK_DIR, 'cache', 'jinja')
+        self.TEMPLATE_WARMUP = False
+        self.SUGGEST_PRELOAD = False
+        self.WTF_CSRF_ENABLED = False
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    from extensions import db
+
+    app = create_app(TestConfig())
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_counter(app):
+    # Number of statements sent to the database since the last reset
+    from sqlalchemy import event
+
+    from extensions import db
+
+    counter = {'queries': 0}
+
+    def count(*args):
+        counter['queries'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    yield counter
+    event.remove(db.engine, 'before_cursor_execute', count)
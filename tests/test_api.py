@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Artist, Genre, Show, Venue
+
+
+@pytest.fixture
+def catalog(app):
+    # Five venues and five artists, each artist booked at every venue at one of two start times per week, so
+    # shows share start times
+    app.config.update(API_PAGE_SIZE=2, API_MAX_PAGE_SIZE=3)
+    venues = [Venue(name='Hall {}'.format(number), city='New York', state='NY',
+                    address='{} Broadway'.format(number), phone='555-100-{:04d}'.format(number),
+                    genres=Genre.from_names(['Jazz'])) for number in range(5)]
+    artists = [Artist(name='Band {}'.format(number), city='New York', state='NY',
+                      phone='555-200-{:04d}'.format(number), genres=Genre.from_names(['Jazz']))
+               for number in range(5)]
+    week = (datetime.now() + timedelta(days=7)).replace(hour=20, minute=0, second=0, microsecond=0)
+    for number, venue in enumerate(venues):
+        for offset, artist in enumerate(artists):
+            start = week + timedelta(days=7 * ((number + offset) % 5), hours=offset % 2 * 2 - 2)
+            db.session.add(Show(venue=venue, artist=artist, start_time=start, end_time=start + timedelta(hours=1)))
+    db.session.commit()
+
+
+def walk(client, url):
+    # Every item of a collection, following the next links
+    items = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        items += response.get_json()['data']
+        url = response.get_json()['next']
+    return items
+
+
+def test_etag_answers_a_matching_request_with_an_empty_304(client, catalog):
+    response = client.get('/api/venues/1')
+    etag = response.headers['ETag']
+    assert response.status_code == 200 and not etag.startswith('W/')
+
+    unchanged = client.get('/api/venues/1', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304 and unchanged.get_data() == b''
+
+    db.session.get(Venue, 1).name = 'Hall Zero'
+    db.session.commit()
+    changed = client.get('/api/venues/1', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.get_json()['name'] == 'Hall Zero'
+    assert changed.headers['ETag'] != etag
+
+    # Errors carry no ETag
+    assert 'ETag' not in client.get('/api/venues/99').headers
+
+
+@pytest.mark.parametrize('limit, count', [(None, 2), ('1', 1), ('3', 3), ('500', 3), ('0', 1), ('-4', 1)])
+def test_limit_is_capped(client, catalog, limit, count):
+    query_string = {} if limit is None else {'limit': limit}
+    for collection in ('venues', 'artists', 'shows'):
+        response = client.get('/api/' + collection, query_string=query_string)
+        assert len(response.get_json()['data']) == count
+
+
+def test_next_links_walk_every_item_once(client, catalog):
+    venues = walk(client, '/api/venues')
+    assert [venue['id'] for venue in venues] == [1, 2, 3, 4, 5]
+    assert [artist['name'] for artist in walk(client, '/api/artists?limit=3')] == \
+        ['Band 0', 'Band 1', 'Band 2', 'Band 3', 'Band 4']
+
+    shows = walk(client, '/api/shows?limit=3')
+    expected = db.session.query(Show.id).order_by(Show.start_time, Show.id).all()
+    assert [show['id'] for show in shows] == [show.id for show in expected]
+
+    # The next links keep the other arguments
+    response = client.get('/api/shows', query_string={'limit': 1, 'upcoming': 1})
+    assert 'limit=1' in response.get_json()['next'] and 'upcoming=1' in response.get_json()['next']
+
+    # The last page has no next link
+    assert client.get('/api/venues', query_string={'after': 4}).get_json() == {
+        'data': [{'id': 5, 'name': 'Hall 4', 'city': 'New York', 'state': 'NY', 'num_upcoming_shows': 5}],
+        'next': None}
+
+
+@pytest.mark.parametrize('url', [
+    '/api/venues?after=five',
+    '/api/artists?after=1.5',
+    '/api/shows?cursor=five',
+    '/api/shows?cursor=2030-01-01T20:00:00_five',
+    '/api/shows?cursor=tomorrow_5',
+    '/api/shows?from=tomorrow',
+])
+def test_malformed_cursors_are_bad_requests(client, catalog, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,113 @@
+import asyncio
+import importlib
+import re
+import sys
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+import pytest
+
+import conftest
+from extensions import db
+from models import Artist, Genre, Show, Venue
+
+
+@pytest.fixture
+def application(app, monkeypatch):
+    # asgi.py builds its own app from config.py as it is imported, here from the test config instead. Both
+    # apps use the same database file
+    import app as app_module
+
+    create_app = app_module.create_app
+    monkeypatch.setattr(app_module, 'create_app', lambda: create_app(conftest.TestConfig()))
+    sys.modules.pop('asgi', None)
+    asgi = importlib.import_module('asgi')
+    yield asgi
+    sys.modules.pop('asgi', None)
+
+
+@pytest.fixture
+def bookings(app):
+    venue = Venue(name='Square Hall', city='New York', state='NY', address='1 Broadway', phone='555-100-0000',
+                  genres=Genre.from_names(['Jazz']))
+    artist = Artist(name='Red Band', city='New York', state='NY', phone='555-200-0000',
+                    genres=Genre.from_names(['Jazz', 'Folk']))
+    other_venue = Venue(name='Harbor Hall', city='Boston', state='MA', address='1 Harbor Street',
+                        phone='555-100-0001', genres=Genre.from_names(['Rock']))
+    other_artist = Artist(name='Blue Band', city='Boston', state='MA', phone='555-200-0001',
+                          genres=Genre.from_names(['Folk']))
+    for days, booked_venue, booked in ((-30, venue, artist), (-2, venue, other_artist), (3, venue, artist),
+                                       (10, other_venue, other_artist), (40, venue, artist)):
+        start = (datetime.now() + timedelta(days=days)).replace(microsecond=0)
+        db.session.add(Show(venue=booked_venue, artist=booked, start_time=start, end_time=start + timedelta(hours=2)))
+    db.session.commit()
+    return venue.id, artist.id
+
+
+async def asgi_request(application, method, path, query_string=b'', body=b''):
+    scope = {'type': 'http', 'method': method, 'path': path, 'root_path': '', 'query_string': query_string,
+             'http_version': '1.1', 'scheme': 'http', 'server': ('localhost', 80), 'client': ('127.0.0.1', 1),
+             'headers': [(b'host', b'localhost')]}
+    if body:
+        scope['headers'] += [(b'content-type', b'application/x-www-form-urlencoded'),
+                             (b'content-length', str(len(body)).encode('ascii'))]
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    start, response_body = messages
+    return start['status'], dict((name.decode(), value.decode()) for name, value in start['headers']), \
+        response_body['body']
+
+
+def server_timing_metrics(header):
+    # Metric names and query counts, the durations differ from one request to the next
+    return re.sub(r'dur=[0-9.]+', 'dur', header)
+
+
+def test_async_views_match_their_sync_views(application, client, bookings):
+    venue_id, artist_id = bookings
+    routes = [
+        ('GET', '/venues', {}),
+        ('GET', '/venues', {'genre': 'Jazz'}),
+        ('GET', '/venues/{}'.format(venue_id), {}),
+        ('GET', '/venues/999', {}),
+        ('POST', '/venues/search', {'search_term': 'hall'}),
+        ('GET', '/artists', {}),
+        ('GET', '/artists', {'genre': 'Jazz'}),
+        ('GET', '/artists/{}'.format(artist_id), {}),
+        ('POST', '/artists/search', {'search_term': 'band'}),
+        ('GET', '/shows', {}),
+        ('GET', '/shows', {'upcoming': '1', 'state': 'NY'}),
+        ('GET', '/shows', {'cursor': 'not-a-cursor'}),
+    ]
+    assert all(application.match_async_view({'path': path, 'method': method}) for method, path, args in routes)
+
+    async def serve_all():
+        try:
+            return [await asgi_request(application.application, method, path,
+                                       *((urlencode(args).encode(),) if method == 'GET'
+                                         else (b'', urlencode(args).encode())))
+                    for method, path, args in routes]
+        finally:
+            for engine in application.engines.values():
+                await engine.dispose()
+
+    for (method, path, args), (status, headers, body) in zip(routes, asyncio.run(serve_all())):
+        if method == 'GET':
+            expected = client.get(path, query_string=args)
+        else:
+            expected = client.post(path, data=args)
+        assert (status, body) == (expected.status_code, expected.get_data()), (method, path, args)
+        assert headers['content-type'] == expected.headers['Content-Type']
+        if path == '/venues/999':
+            # The async view of a missing venue has run its show queries alongside the lookup, the sync view
+            # stops after the lookup
+            continue
+        assert server_timing_metrics(headers['server-timing']) == \
+            server_timing_metrics(expected.headers['Server-Timing']), (method, path, args)
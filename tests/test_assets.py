@@ -0,0 +1,15 @@
+import assets
+
+
+def test_bundles_drop_the_source_map_references_of_their_sources(tmp_path, monkeypatch):
+    (tmp_path / 'a.min.js').write_text('var a=1;\n//# sourceMappingURL=a.min.js.map\n')
+    (tmp_path / 'b.min.js').write_text('var b=2;\n//@ sourceMappingURL=b.min.js.map')
+    (tmp_path / 'c.min.css').write_text('a{color:red}\n/*# sourceMappingURL=c.min.css.map */\n')
+    monkeypatch.setattr(assets, 'BUNDLES', {'main.js': ('a.min.js', 'b.min.js'), 'main.css': ('c.min.css',)})
+
+    script = assets.bundle(str(tmp_path), 'main.js').decode('utf-8')
+    stylesheet = assets.bundle(str(tmp_path), 'main.css').decode('utf-8')
+
+    assert 'sourceMappingURL' not in script + stylesheet
+    assert 'var a=1;' in script and 'var b=2;' in script
+    assert 'a{color:red}' in stylesheet
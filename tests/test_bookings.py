@@ -0,0 +1,159 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import conftest
+from extensions import db
+from models import Artist, Genre, Show, Venue
+
+
+@pytest.fixture
+def catalog(app):
+    for number, (name, city) in enumerate((('Blue Hall', 'New York'), ('Green Hall', 'New York'),
+                                            ('Red Hall', 'Buffalo'))):
+        db.session.add(Venue(name=name, city=city, state='NY', address='{} Main Street'.format(number + 1),
+                             phone='555-100-{:04d}'.format(number), genres=Genre.from_names(['Jazz'])))
+    for number, name in enumerate(('Red Band', 'Blue Band')):
+        db.session.add(Artist(name=name, city='New York', state='NY', phone='555-200-{:04d}'.format(number),
+                              genres=Genre.from_names(['Jazz'])))
+    db.session.commit()
+
+
+def add_show(venue_id, artist_id, start_time, hours=2):
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+                        end_time=start_time + timedelta(hours=hours)))
+    db.session.commit()
+
+
+EIGHT_PM = datetime(2031, 5, 1, 20)
+
+
+@pytest.mark.parametrize('venue_id, artist_id, start_time, message', [
+    (1, 2, EIGHT_PM + timedelta(hours=1), 'venue is already booked at that time'),
+    (2, 1, EIGHT_PM - timedelta(hours=1), 'artist is already booked at that time'),
+    (2, 2, EIGHT_PM, None),
+])
+def test_overlapping_shows_of_a_venue_or_an_artist_are_rejected(catalog, venue_id, artist_id, start_time, message):
+    add_show(1, 1, EIGHT_PM)
+
+    if message is None:
+        add_show(venue_id, artist_id, start_time)
+        return
+    with pytest.raises(IntegrityError, match=message):
+        add_show(venue_id, artist_id, start_time)
+    db.session.rollback()
+
+
+def test_back_to_back_shows_are_accepted(catalog):
+    add_show(1, 1, EIGHT_PM)
+    add_show(1, 2, EIGHT_PM + timedelta(hours=2))
+    add_show(2, 1, EIGHT_PM - timedelta(hours=2))
+
+    assert Show.query.count() == 3
+
+
+def test_moving_a_show_onto_another_is_rejected(catalog):
+    add_show(1, 1, EIGHT_PM)
+    add_show(1, 2, EIGHT_PM + timedelta(hours=3))
+
+    show = Show.query.filter_by(artist_id=2).one()
+    show.start_time, show.end_time = EIGHT_PM + timedelta(hours=1), EIGHT_PM + timedelta(hours=3)
+    with pytest.raises(IntegrityError, match='venue is already booked at that time'):
+        db.session.commit()
+    db.session.rollback()
+
+
+@pytest.mark.parametrize('hours', [-1, 13])
+def test_shows_longer_than_twelve_hours_or_ending_before_they_start_are_rejected(catalog, hours):
+    with pytest.raises(IntegrityError, match='show is longer than 720 minutes'):
+        add_show(1, 1, EIGHT_PM, hours)
+    db.session.rollback()
+
+
+def available(client, **query):
+    response = client.get('/api/venues/available', query_string=query)
+    return response.status_code, response.get_json()
+
+
+def test_available_venues_leave_out_the_booked_ones(client, catalog):
+    add_show(1, 1, EIGHT_PM)
+
+    status, body = available(client, state='NY', start='2031-05-01T21:00', end='2031-05-01T23:00')
+    assert status == 200
+    assert [venue['name'] for venue in body['data']] == ['Red Hall', 'Green Hall']
+
+    status, body = available(client, state='NY', city='New York', start='2031-05-01T22:00',
+                             end='2031-05-01T23:00')
+    assert [venue['name'] for venue in body['data']] == ['Blue Hall', 'Green Hall']
+
+
+@pytest.mark.parametrize('query', [
+    {'state': 'NY', 'start': '2031-05-01T21:00'},
+    {'state': 'NY', 'start': 'tonight', 'end': '2031-05-01T23:00'},
+    {'start': '2031-05-01T21:00', 'end': '2031-05-01T23:00'},
+    {'state': 'NY', 'start': '2031-05-01T23:00', 'end': '2031-05-01T21:00'},
+])
+def test_available_venues_need_a_state_and_a_time_range(client, catalog, query):
+    assert available(client, **query)[0] == 400
+
+
+# ----------------------------------------------------------------------------#
+# Migration e2b7c4f9a1d6, end times of the shows already stored.
+# ----------------------------------------------------------------------------#
+
+@pytest.fixture
+def before_end_times(tmp_path):
+    # A database migrated up to the revision before show end times. SQLite leaves the show foreign keys
+    # unchecked, the shows need no venue or artist rows
+    from app import create_app
+
+    config = conftest.TestConfig()
+    config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(str(tmp_path), 'migrated.db')
+    migrated = create_app(config)
+    with migrated.app_context():
+        # The first revision replaces the table of the project template
+        db.session.execute(text('CREATE TABLE todos (id INTEGER PRIMARY KEY)'))
+        db.session.commit()
+        result = upgrade(migrated, 'd5f1a9c3e7b2')
+        assert result.exit_code == 0, result.output
+        yield migrated
+        db.session.remove()
+
+
+def upgrade(migrated, revision):
+    return migrated.test_cli_runner().invoke(args=['db', 'upgrade', revision])
+
+
+def add_stored_show(show_id, venue_id, artist_id, start_time):
+    db.session.execute(text('INSERT INTO show (id, venue_id, artist_id, start_time) VALUES (:id, :venue_id, '
+                            ':artist_id, :start_time)'),
+                       {'id': show_id, 'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time})
+    db.session.commit()
+
+
+def test_stored_shows_end_two_hours_later_or_when_the_next_one_starts(before_end_times):
+    add_stored_show(1, 1, 1, EIGHT_PM)
+    add_stored_show(2, 1, 2, EIGHT_PM + timedelta(hours=1))
+    add_stored_show(3, 2, 2, EIGHT_PM + timedelta(hours=5))
+
+    result = upgrade(before_end_times, 'e2b7c4f9a1d6')
+
+    assert result.exit_code == 0, result.output
+    ends = db.session.execute(text('SELECT id, end_time FROM show ORDER BY id')).all()
+    assert [(show_id, str(end_time)) for show_id, end_time in ends] == [
+        (1, '2031-05-01 21:00:00'), (2, '2031-05-01 23:00:00'), (3, '2031-05-02 03:00:00')]
+
+
+def test_stored_shows_starting_together_are_reported(before_end_times):
+    add_stored_show(1, 1, 1, EIGHT_PM)
+    add_stored_show(2, 1, 2, EIGHT_PM)
+    add_stored_show(3, 2, 2, EIGHT_PM + timedelta(hours=5))
+
+    result = upgrade(before_end_times, 'e2b7c4f9a1d6')
+
+    assert result.exit_code != 0
+    assert 'Shows 1, 2 start at the same time' in result.output
+    assert db.session.execute(text('SELECT count(*) FROM show')).scalar() == 3
@@ -0,0 +1,27 @@
+from flask import Flask
+
+from cache import ResponseCache
+
+
+def worker_cache(tmp_path):
+    app = Flask(__name__)
+    app.config.update(RESPONSE_CACHE_ENABLED=True, RESPONSE_CACHE_BACKEND='memory',
+                      RESPONSE_CACHE_DIR=str(tmp_path), RESPONSE_CACHE_POLL_SECONDS=0)
+    return ResponseCache(app)
+
+
+def test_invalidations_reach_the_memory_of_other_processes(tmp_path):
+    worker, command = worker_cache(tmp_path), worker_cache(tmp_path)
+    worker.backend.set('venues|', 'listing', float('inf'))
+    worker.backend.set('venue:1|', 'detail', float('inf'))
+
+    command.invalidate('venues')
+    worker.sync()
+
+    assert worker.backend.get('venues|') is None
+    assert worker.backend.get('venue:1|') == 'detail'
+
+    command.clear()
+    worker.sync()
+
+    assert worker.backend.get('venue:1|') is None
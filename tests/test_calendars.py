@@ -0,0 +1,57 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from extensions import db
+from models import Artist, Genre, Show, Venue
+
+
+@pytest.fixture
+def booked_venue(app):
+    start = datetime.now() + timedelta(days=7)
+    venue = Venue(name='Blue Hall', city='New York', state='NY', address='1 Main Street', phone='555-100-0000',
+                  genres=Genre.from_names(['Jazz']))
+    artist = Artist(name='Red Band', city='New York', state='NY', phone='555-200-0000',
+                    genres=Genre.from_names(['Jazz']))
+    db.session.add(Show(venue=venue, artist=artist, start_time=start, end_time=start + timedelta(hours=2)))
+    db.session.commit()
+
+
+class AnHourLater(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.now(tz) + timedelta(hours=1)
+
+
+def feed_stamp(response):
+    return re.search(r'^DTSTAMP:(\S+)\r$', response.get_data(as_text=True), re.M).group(1)
+
+
+@pytest.mark.parametrize('month', ['0001-01', '0001-12', '9999-01', '9999-12', '2030-13', 'soon'])
+def test_calendar_months_out_of_range_are_bad_requests(client, booked_venue, month):
+    assert client.get('/venues/1/calendar?month=' + month).status_code == 400
+
+
+def test_calendar_months_next_to_the_range_render(client, booked_venue):
+    assert client.get('/venues/1/calendar?month=0002-01').status_code == 200
+    assert client.get('/venues/1/calendar?month=9998-12').status_code == 200
+
+
+def test_feed_is_stamped_with_its_generation_time_in_utc(client, booked_venue):
+    before = datetime.now(timezone.utc).replace(microsecond=0)
+    response = client.get('/venues/1/calendar.ics')
+    after = datetime.now(timezone.utc)
+
+    assert before <= datetime.strptime(feed_stamp(response), '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc) <= after
+
+
+def test_feed_etag_does_not_change_with_its_stamp(client, booked_venue, monkeypatch):
+    first = client.get('/venues/1/calendar.ics')
+
+    monkeypatch.setattr('calendars.datetime', AnHourLater)
+    later = client.get('/venues/1/calendar.ics')
+
+    assert feed_stamp(later) != feed_stamp(first)
+    assert later.headers['ETag'] == first.headers['ETag']
+    assert client.get('/venues/1/calendar.ics', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Artist, Genre, Show, Venue
+
+
+@pytest.fixture
+def catalog(app):
+    db.session.add(Venue(name='Blue Hall', city='New York', state='NY', address='1 Main Street',
+                         phone='555-100-0000', genres=Genre.from_names(['Jazz'])))
+    db.session.add(Artist(name='Red Band', city='New York', state='NY', phone='555-200-0000',
+                          genres=Genre.from_names(['Jazz'])))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+def test_edit_form_of_a_deleted_row_is_not_found(client, catalog, kind):
+    assert client.get('/{}/1/edit'.format(kind)).status_code == 200
+
+    assert client.delete('/{}/1'.format(kind)).status_code < 400
+
+    assert client.get('/{}/1/edit'.format(kind)).status_code == 404
+    assert client.get('/{}/2/edit'.format(kind)).status_code == 404
+
+
+def upcoming_counts(client, kind):
+    return {row['name']: row['num_upcoming_shows'] for row in client.get('/api/' + kind).get_json()['data']}
+
+
+@pytest.mark.parametrize('kind, other', [('venues', 'artists'), ('artists', 'venues')])
+def test_deleting_one_side_recounts_the_other_at_once(app, client, catalog, kind, other):
+    db.session.add(Venue(name='Green Hall', city='New York', state='NY', address='2 Main Street',
+                         phone='555-100-0001', genres=Genre.from_names(['Jazz'])))
+    db.session.add(Artist(name='Blue Band', city='New York', state='NY', phone='555-200-0001',
+                          genres=Genre.from_names(['Jazz'])))
+    start = datetime.now() + timedelta(days=7)
+    for venue_id, artist_id, days in ((1, 1, 0), (1, 2, 1), (2, 1, 2)):
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start + timedelta(days=days),
+                            end_time=start + timedelta(days=days, hours=2)))
+    db.session.commit()
+
+    client.delete('/{}/1'.format(kind))
+
+    expected = {'artists': {'Red Band': 1, 'Blue Band': 0}, 'venues': {'Blue Hall': 1, 'Green Hall': 0}}
+    assert upcoming_counts(client, other) == expected[other]
+    check = app.test_cli_runner().invoke(args=['counters', 'check'])
+    assert '0 counters differ.' in check.output
+
+    purge = app.test_cli_runner().invoke(args=['deletions', 'purge'])
+    assert purge.exit_code == 0, purge.output
+    assert upcoming_counts(client, other) == expected[other]
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Artist, Genre, Show, Venue
+
+
+def add_catalog(venue_names, artist_names):
+    for number, name in enumerate(venue_names):
+        db.session.add(Venue(name=name, city='New York', state='NY', address='{} Main Street'.format(number + 1),
+                             phone='555-100-{:04d}'.format(number), image_link='https://example.com/v.jpg',
+                             facebook_link='https://facebook.com/v', website_link='https://example.com',
+                             genres=Genre.from_names(['Jazz'])))
+    for number, name in enumerate(artist_names):
+        db.session.add(Artist(name=name, city='New York', state='NY', phone='555-200-{:04d}'.format(number),
+                              image_link='https://example.com/a.jpg', facebook_link='https://facebook.com/a',
+                              website_link='https://example.com', genres=Genre.from_names(['Jazz'])))
+    db.session.commit()
+
+
+def round_trip(app, tmp_path):
+    # Exports the catalog and the shows, loads them into an emptied database and returns the import output
+    runner = app.test_cli_runner()
+    for kind in ('venues', 'artists', 'shows'):
+        result = runner.invoke(args=['export', kind, '--output', str(tmp_path / (kind + '.csv'))])
+        assert result.exit_code == 0, result.output
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    outputs = {}
+    for kind in ('venues', 'artists', 'shows'):
+        result = runner.invoke(args=['import', kind, str(tmp_path / (kind + '.csv'))])
+        assert result.exit_code == 0, result.output
+        outputs[kind] = result.output
+    return outputs
+
+
+def show_rows():
+    return [(show.venue.name, show.artist.name, show.start_time, show.end_time)
+            for show in Show.query.order_by(Show.start_time).all()]
+
+
+def test_exported_shows_keep_their_length(app, tmp_path):
+    add_catalog(['Blue Hall'], ['Red Band', 'Green Band'])
+    start = datetime(2031, 5, 1, 20)
+    for offset, artist_id in ((0, 1), (1, 2)):
+        db.session.add(Show(venue_id=1, artist_id=artist_id, start_time=start + timedelta(hours=offset),
+                            end_time=start + timedelta(hours=offset + 1)))
+    db.session.commit()
+    exported = show_rows()
+
+    outputs = round_trip(app, tmp_path)
+
+    assert 'Imported 2 shows, rejected 0 rows.' in outputs['shows']
+    assert show_rows() == exported
+
+
+def test_shows_without_duration_get_the_default_length(app, tmp_path):
+    add_catalog(['Blue Hall'], ['Red Band'])
+    path = tmp_path / 'shows.csv'
+    path.write_text('venue_name,artist_name,start_time,duration\nBlue Hall,Red Band,2031-05-01 20:00:00,\n')
+
+    result = app.test_cli_runner().invoke(args=['import', 'shows', str(path)])
+
+    assert 'Imported 1 shows, rejected 0 rows.' in result.output
+    show = Show.query.one()
+    assert show.end_time - show.start_time == timedelta(hours=2)
+
+
+def test_shows_follow_their_venue_and_artist_across_an_id_gap(app, tmp_path):
+    # The first venue and artist are gone, the re-imported catalog is numbered from 1 again
+    add_catalog(['Gone Hall', 'Blue Hall', 'Green Hall'], ['Gone Band', 'Red Band', 'Yellow Band'])
+    for model in (Venue, Artist):
+        db.session.delete(db.session.get(model, 1))
+    db.session.add(Show(venue_id=2, artist_id=3, start_time=datetime(2031, 5, 1, 20),
+                        end_time=datetime(2031, 5, 1, 22)))
+    db.session.commit()
+    exported = show_rows()
+
+    outputs = round_trip(app, tmp_path)
+
+    assert 'Imported 1 shows, rejected 0 rows.' in outputs['shows']
+    assert db.session.get(Venue, 2).name == 'Green Hall'
+    assert show_rows() == exported
+
+
+def test_shows_booked_during_the_import_reject_only_their_clashing_rows(app, tmp_path, monkeypatch):
+    # Another request books Red Band right after the importer has checked the batch, the database rejects the
+    # batch and it is inserted again row by row
+    import importer
+
+    add_catalog(['Blue Hall', 'Green Hall'], ['Red Band', 'Green Band'])
+    check_batch = importer.Bookings.__init__
+    concurrent = []
+
+    def book_after_the_check(bookings, *args):
+        check_batch(bookings, *args)
+        if not concurrent:
+            concurrent.append(Show(venue_id=2, artist_id=1, start_time=datetime(2031, 5, 1, 21),
+                                   end_time=datetime(2031, 5, 1, 23)))
+            db.session.add(concurrent[0])
+            db.session.flush()
+
+    monkeypatch.setattr(importer.Bookings, '__init__', book_after_the_check)
+    path = tmp_path / 'shows.csv'
+    path.write_text('venue_name,artist_name,start_time,duration\n'
+                    'Blue Hall,Red Band,2031-05-01 20:00:00,120\n'
+                    'Blue Hall,Green Band,2031-05-02 20:00:00,120\n'
+                    'Blue Hall,Red Band,2031-05-03 20:00:00,120\n')
+
+    result = app.test_cli_runner().invoke(args=['import', 'shows', str(path)])
+
+    assert result.exit_code == 0, result.output
+    assert 'Imported 2 shows, rejected 1 rows.' in result.output
+    assert '"line": 2, "errors": {"artist": ["already booked at that time"]}' in result.output
+    assert sorted((show.venue_id, show.artist_id, show.start_time.day) for show in Show.query) == [
+        (1, 1, 3), (1, 2, 2), (2, 1, 1)]
+    assert db.session.get(Venue, 1).upcoming_shows_count == 2
@@ -0,0 +1,103 @@
+from datetime import date, datetime
+
+import pytest
+
+from cache import response_cache
+from extensions import db
+from models import MAX_OCCURRENCES, Artist, Bookings, Genre, Show, Venue, recurrence
+
+
+@pytest.fixture
+def catalog(app):
+    db.session.add(Venue(name='Blue Hall', city='New York', state='NY', address='1 Main Street',
+                         phone='555-100-0000', genres=Genre.from_names(['Jazz'])))
+    db.session.add(Venue(name='Green Hall', city='New York', state='NY', address='2 Main Street',
+                         phone='555-100-0001', genres=Genre.from_names(['Jazz'])))
+    db.session.add(Artist(name='Red Band', city='New York', state='NY', phone='555-200-0000',
+                          genres=Genre.from_names(['Jazz'])))
+    db.session.commit()
+
+
+@pytest.fixture
+def invalidated(monkeypatch):
+    page_keys = []
+    monkeypatch.setattr(response_cache, 'invalidate', lambda *keys: page_keys.extend(keys))
+    return page_keys
+
+
+def book(client, **fields):
+    form = {'venue_id': '1', 'artist_id': '1', 'start_time': '2031-01-31 20:00:00', 'duration': '120'}
+    form.update({name: str(value) for name, value in fields.items()})
+    return client.post('/shows/create', data=form).get_data(as_text=True)
+
+
+def starts():
+    return [show.start_time for show in Show.query.order_by(Show.start_time)]
+
+
+def upcoming_counts():
+    return db.session.get(Venue, 1).upcoming_shows_count, db.session.get(Artist, 1).upcoming_shows_count
+
+
+def test_monthly_shows_fall_back_to_the_last_day_of_shorter_months():
+    assert recurrence(datetime(2031, 1, 31, 20), 'monthly', 4) == [
+        datetime(2031, 1, 31, 20), datetime(2031, 2, 28, 20), datetime(2031, 3, 31, 20), datetime(2031, 4, 30, 20)]
+    assert recurrence(datetime(2031, 11, 30, 20), 'monthly', until=date(2032, 2, 29))[-1] == datetime(2032, 2, 29, 20)
+
+
+def test_series_are_capped_at_max_occurrences():
+    assert len(recurrence(datetime(2031, 1, 1, 20), 'weekly')) == MAX_OCCURRENCES
+    assert recurrence(datetime(2031, 1, 1, 20), 'weekly', until=date(2031, 1, 15))[-1] == datetime(2031, 1, 15, 20)
+
+
+def test_bookings_check_the_shows_of_a_series_against_each_other(catalog):
+    bookings = Bookings({1}, {1}, datetime(2031, 1, 1), datetime(2031, 2, 1))
+    bookings.add(1, 1, datetime(2031, 1, 10, 20), datetime(2031, 1, 10, 22))
+
+    assert bookings.conflicts(2, 1, datetime(2031, 1, 10, 21), datetime(2031, 1, 10, 23)) == ['artist']
+    assert bookings.conflicts(1, 2, datetime(2031, 1, 10, 18), datetime(2031, 1, 10, 20, 30)) == ['venue']
+    assert bookings.conflicts(1, 1, datetime(2031, 1, 10, 22), datetime(2031, 1, 11)) == []
+
+
+def test_a_monthly_series_is_inserted_at_once_and_counted(client, catalog, invalidated):
+    page = book(client, repeat='monthly', repeat_count=4)
+
+    assert '4 shows were successfully listed!' in page
+    assert starts() == [datetime(2031, 1, 31, 20), datetime(2031, 2, 28, 20), datetime(2031, 3, 31, 20),
+                        datetime(2031, 4, 30, 20)]
+    assert upcoming_counts() == (4, 4)
+    assert set(invalidated) == {'venues', 'venue:1', 'artist:1'}
+
+
+@pytest.mark.parametrize('fields, error', [
+    ({'repeat': 'weekly', 'repeat_until': '2034-01-01'}, 'At most {} shows'.format(MAX_OCCURRENCES)),
+    ({'repeat': 'weekly', 'repeat_count': MAX_OCCURRENCES + 1},
+     'Number must be between 1 and {}'.format(MAX_OCCURRENCES)),
+    ({'repeat': 'weekly', 'repeat_until': '2031-01-30'}, 'The last date is before the first show.'),
+    ({'repeat': 'monthly'}, 'Give the number of shows or the date of the last one.'),
+])
+def test_invalid_series_list_no_show(client, catalog, invalidated, fields, error):
+    assert error in book(client, **fields)
+    assert starts() == []
+    assert invalidated == []
+
+
+def test_a_series_with_a_booked_date_lists_no_show(client, catalog, invalidated):
+    book(client, venue_id=2, start_time='2031-02-14 21:00:00')
+
+    page = book(client, repeat='weekly', repeat_count=3)
+
+    assert '1 of the 3 dates are already booked, no show was listed' in page
+    assert starts() == [datetime(2031, 2, 14, 21)]
+    assert upcoming_counts() == (0, 1)
+
+
+def test_a_series_can_skip_its_booked_dates(client, catalog, invalidated):
+    book(client, venue_id=2, start_time='2031-02-14 21:00:00')
+
+    page = book(client, repeat='weekly', repeat_count=3, skip_conflicts='y')
+
+    assert '2 shows were successfully listed!' in page
+    assert 'Skipped the dates already booked: 2031-02-14 20:00' in page
+    assert starts() == [datetime(2031, 1, 31, 20), datetime(2031, 2, 7, 20), datetime(2031, 2, 14, 21)]
+    assert upcoming_counts() == (2, 3)
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+import conftest
+from extensions import db
+from models import Genre, Venue
+from routing import PRIMARY_COOKIE, REPLICA_BIND
+
+
+@pytest.fixture
+def replica_app():
+    yield make_replica_app
+    # Flask-SQLAlchemy keeps a metadata per bind it has seen, which the other tests' apps would not have
+    db.metadatas.pop(REPLICA_BIND, None)
+
+
+def make_replica_app(**settings):
+    # The test config with a second SQLite database as the replica, both holding venue 1 under a different name
+    from app import create_app
+
+    config = conftest.TestConfig()
+    config.SQLALCHEMY_BINDS = {REPLICA_BIND: {'url': 'sqlite:///' + os.path.join(conftest.WORK_DIR, 'replica.db')}}
+    for name, value in settings.items():
+        setattr(config, name, value)
+    app = create_app(config)
+    with app.app_context():
+        for engine, name in ((db.engines[None], 'Primary Hall'), (db.engines[REPLICA_BIND], 'Replica Hall')):
+            db.metadata.drop_all(engine)
+            db.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(Venue.__table__.insert(), {
+                    'id': 1, 'name': name, 'city': 'New York', 'state': 'NY', 'address': '1 Broadway',
+                    'phone': '555-100-0000', 'genres': Genre.from_names(['Jazz'])})
+    return app
+
+
+@pytest.fixture
+def replica_client(replica_app):
+    # Without an app context around the requests, so each request gets its own session as in production
+    return replica_app().test_client()
+
+
+def venue_names(app, bind_key):
+    with app.app_context(), db.engines[bind_key].connect() as connection:
+        return connection.execute(text('SELECT name FROM venue ORDER BY id')).scalars().all()
+
+
+def test_reads_go_to_the_replica(replica_client):
+    assert 'Replica Hall' in replica_client.get('/venues/1').get_data(as_text=True)
+    assert 'Replica Hall' in replica_client.get('/venues').get_data(as_text=True)
+    assert 'Replica Hall' in replica_client.post('/venues/search', data={'search_term': 'hall'}).get_data(
+        as_text=True)
+    # Views not marked as replica reads keep the primary
+    assert 'Primary Hall' in replica_client.get('/venues/1/edit').get_data(as_text=True)
+
+
+def test_a_write_pins_the_browser_to_the_primary(replica_client):
+    response = replica_client.post('/venues/1/edit', data={
+        'name': 'Square Garden Hall', 'city': 'New York', 'state': 'NY', 'address': '1 Broadway',
+        'phone': '555-100-0000', 'genres': 'Jazz'})
+    assert response.status_code == 302
+    assert PRIMARY_COOKIE in response.headers['Set-Cookie']
+    assert venue_names(replica_client.application, None) == ['Square Garden Hall']
+    assert venue_names(replica_client.application, REPLICA_BIND) == ['Replica Hall']
+
+    # The redirect reads the change back from the primary, another browser still reads the replica
+    assert 'Square Garden Hall' in replica_client.get(response.headers['Location']).get_data(as_text=True)
+    assert 'Replica Hall' in replica_client.application.test_client().get('/venues/1').get_data(as_text=True)
+
+    # Reads go back to the replica once the cookie has expired
+    replica_client.set_cookie(PRIMARY_COOKIE, '0')
+    assert 'Replica Hall' in replica_client.get('/venues/1').get_data(as_text=True)
+
+
+def test_cache_fills_read_from_the_primary(replica_app):
+    client = replica_app(RESPONSE_CACHE_ENABLED=True).test_client()
+    assert 'Primary Hall' in client.get('/venues/1').get_data(as_text=True)
+    assert 'Primary Hall' in client.get('/venues').get_data(as_text=True)
+    # Uncached replica reads are unaffected
+    assert 'Replica Hall' in client.post('/venues/search', data={'search_term': 'hall'}).get_data(as_text=True)
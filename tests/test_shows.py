@@ -0,0 +1,70 @@
+import html
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Artist, Genre, Show, Venue
+
+ROW = re.compile(r'<a href="/artists/(\d+)">.*?<a href="/venues/(\d+)">', re.S)
+NEXT = re.compile(r'<a href="([^"]+)"><button[^>]*>Next</button></a>')
+
+
+@pytest.fixture
+def same_start_shows(app):
+    # Four venues each booking a different one of four artists at each of three start times, twelve shows
+    # over pages of five so the page breaks fall between shows starting at the same time
+    app.config['SHOWS_PER_PAGE'] = 5
+    venues = [Venue(name='Hall {}'.format(number), city='New York', state='NY',
+                    address='{} Broadway'.format(number), phone='555-100-{:04d}'.format(number),
+                    genres=Genre.from_names(['Jazz'])) for number in range(4)]
+    artists = [Artist(name='Band {}'.format(number), city='New York', state='NY',
+                      phone='555-200-{:04d}'.format(number), genres=Genre.from_names(['Jazz']))
+               for number in range(4)]
+    first = (datetime.now() + timedelta(days=7)).replace(hour=20, minute=0, second=0, microsecond=250000)
+    for slot in range(3):
+        start = first + timedelta(days=slot)
+        # Added out of id order within each start time
+        for number in reversed(range(4)):
+            db.session.add(Show(venue=venues[number], artist=artists[(number + slot) % 4], start_time=start,
+                                end_time=start + timedelta(hours=2)))
+    db.session.commit()
+
+
+def walk(client, url):
+    # (artist id, venue id) of every listed show, following the Next buttons
+    rows, pages = [], 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.get_data(as_text=True)
+        rows += [(int(artist_id), int(venue_id)) for artist_id, venue_id in ROW.findall(page)]
+        next_link = NEXT.search(page)
+        url = html.unescape(next_link.group(1)) if next_link else None
+        pages += 1
+    return rows, pages
+
+
+def test_pages_list_every_show_once_in_start_time_order(client, same_start_shows):
+    rows, pages = walk(client, '/shows')
+    expected = db.session.query(Show.artist_id, Show.venue_id).order_by(Show.start_time, Show.id).all()
+    assert rows == [tuple(show) for show in expected]
+    assert len(set(rows)) == 12 and pages == 3
+
+    # The filters are kept from page to page
+    rows, pages = walk(client, '/shows?upcoming=1&state=NY')
+    assert len(set(rows)) == 12 and pages == 3
+
+
+def test_cursor_round_trips_through_the_listing_page(app, same_start_shows):
+    page, has_next = Show.listing_page(per_page=5)
+    after = Show.decode_cursor(Show.encode_cursor(page[-1]))
+    assert after == (page[-1].start_time, page[-1].id)
+    next_page, has_next = Show.listing_page(after=after, per_page=5)
+    assert has_next and not {show.id for show in page} & {show.id for show in next_page}
+
+
+@pytest.mark.parametrize('cursor', ['five', '2030-01-01T20:00:00_five', 'tomorrow_5', '_'])
+def test_malformed_cursor_is_a_bad_request(client, same_start_shows, cursor):
+    assert client.get('/shows', query_string={'cursor': cursor}).status_code == 400
@@ -0,0 +1,104 @@
+import pytest
+
+import conftest
+from extensions import db
+from models import Artist, Genre, Venue
+from suggest import SuggestIndex, suggestions
+
+
+@pytest.fixture
+def index():
+    index = SuggestIndex()
+    index.max_names, index.reload_seconds = 100, float('inf')
+    index.build([
+        ('venue', 1, 'Jazz Hall', 'New York', 'NY', 1),
+        ('venue', 2, 'The Jazz Room', 'New York', 'NY', 20),
+        ('artist', 1, 'Jazzy Club', 'Boston', 'MA', 9),
+        ('artist', 2, 'Jazz', 'Boston', 'MA', 0),
+    ])
+    return index
+
+
+def names(found):
+    return [match['name'] for match in found]
+
+
+def test_matches_are_ranked_by_match_then_upcoming_shows(index):
+    assert names(index.suggest('jazz')) == ['Jazz', 'Jazzy Club', 'Jazz Hall', 'The Jazz Room']
+    assert names(index.suggest('JAZZ', limit=2)) == ['Jazz', 'Jazzy Club']
+    assert index.suggest('bos') == [{'type': 'city', 'name': 'Boston', 'state': 'MA'}]
+
+
+def test_put_adds_and_renames_keeping_the_upcoming_shows(index):
+    index.put('venue', 3, 'Blue Note', 'Chicago', 'IL')
+    index.put('venue', 2, 'Blues Room', 'New York', 'NY')
+
+    assert names(index.suggest('blue')) == ['Blues Room', 'Blue Note']
+    assert 'The Jazz Room' not in names(index.suggest('jazz'))
+    assert names(index.suggest('chi')) == ['Chicago']
+
+
+def test_remove_drops_a_city_with_its_last_name(index):
+    index.remove('artist', 1)
+    assert names(index.suggest('bos')) == ['Boston']
+
+    index.remove('artist', 2)
+    assert index.suggest('bos') == []
+    assert ('Boston', 'MA') not in index.cities
+
+    index.remove('venue', 1)
+    assert names(index.suggest('new')) == ['New York']
+    assert index.cities[('New York', 'NY')][1] == 1
+
+
+def test_ranked_matches_of_short_prefixes_follow_edits():
+    index = SuggestIndex()
+    index.max_names, index.reload_seconds = 1000, float('inf')
+    index.build([('artist', number, 'Act {}'.format(number), None, None, number) for number in range(400)])
+    assert names(index.suggest('a', limit=1)) == ['Act 399']
+
+    index.put('artist', 399, 'Zed', None, None)
+    assert names(index.suggest('a', limit=1)) == ['Act 398']
+    index.remove('artist', 398)
+    assert names(index.suggest('a', limit=1)) == ['Act 397']
+
+
+def add_booked(model, name, number, shows):
+    db.session.add(model(name=name, city='New York', state='NY', address='1 Main Street',
+                         phone='555-{}-{:04d}'.format(100 if model is Venue else 200, number),
+                         genres=Genre.from_names(['Jazz']), upcoming_shows_count=shows)
+                   if model is Venue else
+                   model(name=name, city='New York', state='NY', phone='555-200-{:04d}'.format(number),
+                         genres=Genre.from_names(['Jazz']), upcoming_shows_count=shows))
+
+
+def test_names_over_the_bound_are_the_least_booked_of_either_kind(app):
+    for number, shows in enumerate((5, 4, 3)):
+        add_booked(Venue, 'Hall {}'.format(number), number, shows)
+    for number, shows in enumerate((6, 1, 0)):
+        add_booked(Artist, 'Band {}'.format(number), number, shows)
+    db.session.commit()
+    app.config['SUGGEST_MAX_NAMES'] = 3
+    suggestions.init_app(app)
+
+    suggestions.load()
+
+    assert sorted(suggestions.names['venue']) == [1, 2]
+    assert sorted(suggestions.names['artist']) == [1]
+
+
+def test_index_is_loaded_in_the_background_as_the_app_starts(app, query_counter):
+    from app import create_app
+
+    add_booked(Artist, 'Band', 0, 2)
+    db.session.commit()
+    config = conftest.TestConfig()
+    config.SUGGEST_PRELOAD = True
+    create_app(config)
+    # Released by the background load once it is over
+    with suggestions.load_lock:
+        pass
+
+    query_counter['queries'] = 0
+    assert names(suggestions.suggest('ban')) == ['Band']
+    assert query_counter['queries'] == 0
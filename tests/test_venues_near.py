@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import text
+
+from cache import response_cache
+from extensions import db
+from models import Genre, Venue
+
+# Latitude degrees per mile
+MILE = 1 / 69.09
+
+
+@pytest.fixture
+def venues(app):
+    # Along the meridian through Times Square, 0, 2, 5 and 30 miles north of it
+    for number, (name, miles) in enumerate((('Square Hall', 0), ('Park Hall', 2), ('River Hall', 5),
+                                            ('Far Hall', 30))):
+        db.session.add(Venue(name=name, city='New York', state='NY', address='{} Broadway'.format(number + 1),
+                             phone='555-100-{:04d}'.format(number), genres=Genre.from_names(['Jazz']),
+                             latitude=40.758 + miles * MILE, longitude=-73.9855))
+    db.session.add(Venue(name='Nowhere Hall', city='Albany', state='NY', address='1 State Street',
+                         phone='555-100-0009', genres=Genre.from_names(['Jazz'])))
+    db.session.commit()
+
+
+def near(client, **query):
+    response = client.get('/api/venues/near', query_string=dict({'lat': 40.758, 'lon': -73.9855}, **query))
+    assert response.status_code == 200
+    return [(venue['name'], round(venue['distance'])) for venue in response.get_json()['data']]
+
+
+def test_venues_within_the_radius_come_nearest_first(client, venues):
+    assert near(client, radius=10) == [('Square Hall', 0), ('Park Hall', 2), ('River Hall', 5)]
+    assert near(client, radius=3) == [('Square Hall', 0), ('Park Hall', 2)]
+    assert near(client, lat=40.758 + 6 * MILE, radius=2) == [('River Hall', 1)]
+
+    page = client.get('/venues/near', query_string={'lat': 40.758, 'lon': -73.9855, 'radius': 3})
+    assert 'Venues within 3 miles: 2' in page.get_data(as_text=True)
+
+
+def test_moved_and_deleted_venues_follow_the_spatial_index(client, venues):
+    far = Venue.query.filter_by(name='Far Hall').one()
+    far.latitude = 40.758 + 1 * MILE
+    db.session.commit()
+    far_id = far.id
+    assert near(client, radius=3) == [('Square Hall', 0), ('Far Hall', 1), ('Park Hall', 2)]
+
+    client.delete('/venues/{}'.format(far_id))
+    assert near(client, radius=3) == [('Square Hall', 0), ('Park Hall', 2)]
+
+    db.session.execute(text('DELETE FROM venue WHERE id = :id'), {'id': far_id})
+    db.session.commit()
+    assert db.session.execute(text('SELECT id FROM venue_location ORDER BY id')).scalars().all() == [1, 2, 3]
+
+    nowhere = Venue.query.filter_by(name='Nowhere Hall').one()
+    nowhere.latitude, nowhere.longitude = 40.758, -73.9855 + 0.5 * MILE
+    db.session.commit()
+    assert [name for name, distance in near(client, radius=1)] == ['Square Hall', 'Nowhere Hall']
+
+
+@pytest.mark.parametrize('query', [
+    {'lat': None},
+    {'lon': 'west'},
+    {'lat': 91},
+    {'lon': -181},
+    {'radius': 0},
+    {'radius': 501},
+])
+def test_missing_or_out_of_range_coordinates_are_bad_requests(client, venues, query):
+    query = {name: value for name, value in dict({'lat': 40.758, 'lon': -73.9855}, **query).items()
+             if value is not None}
+    assert client.get('/api/venues/near', query_string=query).status_code == 400
+    assert client.get('/venues/near', query_string=query).status_code == 400
+
+
+def test_geocoding_fills_in_missing_coordinates_and_invalidates_the_venue_pages(app, venues, tmp_path,
+                                                                                monkeypatch):
+    page_keys = []
+    monkeypatch.setattr(response_cache, 'invalidate', lambda *keys: page_keys.extend(keys))
+    places = tmp_path / 'places.csv'
+    places.write_text('city,state,latitude,longitude\nalbany,NY,42.6526,-73.7562\nNew York,NY,0,0\n')
+
+    result = app.test_cli_runner().invoke(args=['geocode', str(places)])
+
+    assert 'Geocoded 1 venues in 1 cities, 0 cities not found.' in result.output
+    nowhere = Venue.query.filter_by(name='Nowhere Hall').one()
+    assert (nowhere.latitude, nowhere.longitude) == (42.6526, -73.7562)
+    assert page_keys == ['venue:{}'.format(nowhere.id)]
+    assert Venue.query.filter_by(name='Square Hall').one().latitude == 40.758
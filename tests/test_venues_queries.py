@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Artist, Genre, Show, Venue
+
+
+def add_venues(count):
+    # count more venues, two per city, each with an upcoming show of the same artist
+    artist = Artist.query.first() or Artist(name='Red Band', city='New York', state='NY', phone='555-200-0000',
+                                            genres=Genre.from_names(['Jazz']))
+    first = Venue.query.count()
+    for number in range(first, first + count):
+        venue = Venue(name='Hall {}'.format(number), city='City {}'.format(number // 2), state='NY',
+                      address='{} Main Street'.format(number), phone='555-100-{:04d}'.format(number),
+                      genres=Genre.from_names(['Jazz']))
+        start = datetime.now() + timedelta(days=30 + number)
+        db.session.add(Show(venue=venue, artist=artist, start_time=start, end_time=start + timedelta(hours=2)))
+    db.session.commit()
+    db.session.expire_all()
+
+
+def venues_page_queries(client, query_counter):
+    query_counter['queries'] = 0
+    response = client.get('/venues')
+    assert response.status_code == 200
+    return query_counter['queries'], response.get_data(as_text=True)
+
+
+def test_venues_page_queries_do_not_grow_with_venues(client, query_counter):
+    add_venues(4)
+    few, page = venues_page_queries(client, query_counter)
+    assert 'Hall 3' in page
+
+    add_venues(36)
+    many, page = venues_page_queries(client, query_counter)
+    assert 'Hall 39' in page and 'City 19' in page
+
+    assert few > 0 and many == few
@@ -0,0 +1,303 @@
+import math
+import re
+import sys
+from itertools import groupby
+
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+
+from cache import response_cache
+from calendars import feed_response, render_calendar, render_feed
+from extensions import db
+from models import Deletion, Genre, Show, Venue, near_venues_statement
+from pages import render_search
+from routing import replica_router
+from suggest import suggestions
+
+venues = Blueprint('venues', __name__)
+
+
+# ----------------------------------------------------------------------------#
+# Cache invalidation.
+# ----------------------------------------------------------------------------#
+
+def invalidate_venue_pages(venue_id):
+    # The venue listing, the venue page and the pages of artists listing the venue in their shows
+    artist_ids = [row.artist_id for row in db.session.query(Show.artist_id).filter_by(venue_id=venue_id).distinct()]
+    response_cache.invalidate('venues', 'venue:{}'.format(venue_id),
+                              *['artist:{}'.format(artist_id) for artist_id in artist_ids])
+
+
+# ----------------------------------------------------------------------------#
+# Page rendering.
+# ----------------------------------------------------------------------------#
+
+def render_venues(venue_rows):
+    # Venue rows arrive sorted by state and city, so consecutive rows sharing a city and state form one area
+    data = []
+    for (city, state), area_venues in groupby(venue_rows, key=lambda venue: (venue.city, venue.state)):
+        data.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows,
+            } for venue in area_venues]
+        })
+    return render_template('pages/venues.html', areas=data)
+
+
+def render_near(venue_rows, radius):
+    data = []
+    for venue in venue_rows:
+        data.append({
+            "id": venue.id,
+            "name": venue.name,
+            "city": venue.city,
+            "state": venue.state,
+            "distance": math.sqrt(venue.distance_squared),
+            "num_upcoming_shows": venue.num_upcoming_shows,
+        })
+    return render_template('pages/venues_near.html', venues=data, radius=radius)
+
+
+def render_venue(venue, future_shows, past_shows):
+    data = []
+    if venue:
+        data = venue.detail_from(future_shows, past_shows)
+        # The cached page goes stale when its first upcoming show becomes a past show
+        if data['upcoming_shows']:
+            response_cache.expire_at(data['upcoming_shows'][0]['start_time'])
+
+    return render_template('pages/show_venue.html', venue=data)
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+@venues.route('/venues')
+@replica_router.reads
+@response_cache.cached('venues')
+def index():
+    # TODO: replace with real venues data.
+    #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
+
+    #       Venues come back from a single query of their stored upcoming show counts, sorted by
+    #       state and city
+    return render_venues(Venue.with_upcoming_shows_count(genre=request.args.get('genre')))
+
+
+@venues.route('/venues/search', methods=['POST'])
+@replica_router.reads
+def search():
+    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for Hop should return "The Musical Hop".
+
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    search_venue_name = request.form.get('search_term', '')
+    # Ranked matches from the name search index with their stored upcoming show counts
+    return render_search('pages/search_venues.html', Venue.search(search_venue_name))
+
+
+@venues.route('/venues/near')
+@replica_router.reads
+def near():
+    # the venues within ?radius= miles of ?lat=&lon=, nearest first, from one query on the spatial index
+    try:
+        filters = Venue.near_filters(request.args, current_app.config['VENUES_NEAR_RADIUS'],
+                                     current_app.config['VENUES_NEAR_MAX_RADIUS'])
+    except ValueError:
+        abort(400)
+    rows = db.session.execute(near_venues_statement(limit=current_app.config['VENUES_NEAR_LIMIT'], **filters))
+    return render_near(rows, filters['radius'])
+
+
+@venues.route('/venues/<int:venue_id>')
+@replica_router.reads
+@response_cache.cached('venue:{venue_id}')
+def detail(venue_id):
+    # shows the venue page with the given venue_id
+    # TODO: replace with real venue data from the venues table, using venue_id
+
+    venue = Venue.live(venue_id)
+    if not venue:
+        return render_venue(None, [], [])
+    return render_venue(venue, venue.future_shows_with_join(), venue.past_shows_with_join())
+
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+@venues.route('/venues/<int:venue_id>/calendar')
+@replica_router.reads
+@response_cache.cached('venue:{venue_id}', variant='calendar')
+def calendar(venue_id):
+    # bookings per day of ?month=YYYY-MM
+    venue = Venue.live(venue_id)
+    if not venue:
+        abort(404)
+    return render_calendar(Show.venue_id, venue_id, venue.name, url_for('venues.detail', venue_id=venue_id),
+                           url_for('venues.calendar_feed', venue_id=venue_id))
+
+
+@venues.route('/venues/<int:venue_id>/calendar.ics')
+@replica_router.reads
+def calendar_feed(venue_id):
+    return feed_response(venue_feed(venue_id=venue_id))
+
+
+@response_cache.cached('venue:{venue_id}', variant='ics')
+def venue_feed(venue_id):
+    venue = Venue.live(venue_id)
+    if not venue:
+        abort(404)
+    return render_feed(Show.venue_id, venue_id, venue.name)
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@venues.route('/venues/create', methods=['GET'])
+def create_form():
+    from forms import VenueForm
+
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@venues.route('/venues/create', methods=['POST'])
+def create_submission():
+    from forms import VenueForm
+
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    venue_form = VenueForm(request.form)
+    # Regex to validate name
+    if bool(re.fullmatch('[A-Za-z]{2,25}( [A-Za-z]{2,25})?', venue_form.name.data)):
+        try:
+            new_venue = Venue(
+                name=venue_form.name.data,
+                genres=Genre.from_names(venue_form.genres.data),
+                address=venue_form.address.data,
+                latitude=venue_form.latitude.data,
+                longitude=venue_form.longitude.data,
+                city=venue_form.city.data,
+                state=venue_form.state.data,
+                phone=venue_form.phone.data,
+                facebook_link=venue_form.facebook_link.data,
+                image_link=venue_form.image_link.data,
+                website_link=venue_form.website_link.data,
+                is_looking_talent=venue_form.seeking_talent.data,
+                seeking_description=venue_form.seeking_description.data)
+
+            db.session.add(new_venue)
+            db.session.commit()
+            invalidate_venue_pages(new_venue.id)
+            suggestions.put('venue', new_venue.id, new_venue.name, new_venue.city, new_venue.state)
+            flash('Venue ' + request.form['name'] + ' was successfully listed!')
+        except:
+            db.session.rollback()
+            print(sys.exc_info())
+            flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+        finally:
+            db.session.close()
+    else:
+        flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+        flash('An error occurred. Name Format is not Correct')
+
+
+    # on successful db insert, flash success
+    # flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    # TODO: on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    return render_template('pages/home.html')
+
+
+@venues.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete(venue_id):
+    # TODO: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+    #       Soft delete: the venue leaves every page at once, its shows are removed in small batches by
+    #       `flask deletions purge`
+    venue = Venue.live(venue_id)
+    if not venue:
+        abort(404)
+    name = venue.name
+    try:
+        Deletion.request('venue', venue)
+        db.session.commit()
+        # The artists listing shows the counts recounted by the deletion
+        invalidate_venue_pages(venue_id)
+        response_cache.invalidate('artists')
+        suggestions.remove('venue', venue_id)
+        flash('Venue ' + name + ' was successfully Deleted!')
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash('An error occurred. Venue ' + name + ' could not be Deleted.')
+    finally:
+        db.session.close()
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return redirect(url_for('pages.index'), code=303)
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@venues.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit(venue_id):
+    from forms import VenueForm
+
+    venue = Venue.live(venue_id)
+    if not venue:
+        abort(404)
+    form = VenueForm(obj=venue)
+    form.genres.data = venue.genre_names
+    # TODO: populate form with values from venue with ID <venue_id>
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@venues.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_submission(venue_id):
+    from forms import VenueForm
+
+    # TODO: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    form = VenueForm(request.form)
+    regex = re.compile("^([a-zA-Z]{2,}\s[a-zA-Z]{1,}'?-?[a-zA-Z]{2,}\s?([a-zA-Z]{1,})?)", re.I)
+    if bool(regex.match(form.name.data)):
+        try:
+            venue = Venue.live(venue_id)
+            venue.name = form.name.data
+            venue.address = form.address.data
+            venue.latitude = form.latitude.data
+            venue.longitude = form.longitude.data
+            venue.genres = Genre.from_names(form.genres.data)
+            venue.city = form.city.data
+            venue.state = form.state.data
+            venue.phone = form.phone.data
+            venue.facebook_link = form.facebook_link.data
+            venue.image_link = form.image_link.data
+            venue.website_link = form.website_link.data
+            venue.is_looking_talent = form.seeking_talent.data
+            venue.seeking_description = form.seeking_description.data
+            db.session.commit()
+            invalidate_venue_pages(venue_id)
+            suggestions.put('venue', venue_id, venue.name, venue.city, venue.state)
+            flash('Venue ' + request.form['name'] + ' was successfully updated!')
+        except:
+            db.session.rollback()
+            print(sys.exc_info())
+            flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated!')
+        finally:
+            db.session.close()
+    else:
+        flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated!')
+        flash('An error occurred. Name Format is not Correct')
+
+    return redirect(url_for('venues.detail', venue_id=venue_id))